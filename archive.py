@@ -0,0 +1,118 @@
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_ARCHIVE = "output/solutions.db"
+
+ROLES = ("survivor", "winner")
+
+
+def reference(path, digest):
+    """Leaderboard reference to an archived solution: '<archive file>#<digest>'."""
+    return f"{path}#{digest}"
+
+
+class SolutionArchive:
+    """Survivors and winners of every problem in a single SQLite file.
+
+    Rows are keyed by problem and source digest, so a survivor carried over
+    several generations is stored once with its best fitness. Each call to
+    store() is one transaction, however many candidates it writes.
+    """
+
+    def __init__(self, path=DEFAULT_ARCHIVE, timeout=30):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=timeout, isolation_level=None,
+                                     check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS solutions ("
+            " problem TEXT NOT NULL, digest TEXT NOT NULL, code TEXT NOT NULL,"
+            " fitness REAL NOT NULL, generation INTEGER NOT NULL, role TEXT NOT NULL,"
+            " updated REAL NOT NULL, PRIMARY KEY (problem, digest))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS solutions_digest ON solutions(digest)")
+
+    @property
+    def persistent(self):
+        """Whether references into this archive outlive the process."""
+        return self.path != ":memory:"
+
+    def store(self, problem, candidates, role="survivor"):
+        """Archives candidates for problem; returns their references in order.
+
+        A winner is never demoted back to survivor by a later store().
+        """
+        if role not in ROLES:
+            raise ValueError(f"Unknown archive role '{role}', expected one of {ROLES}")
+        candidates = list(candidates)
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO solutions (problem, digest, code, fitness, generation, role, updated)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)"
+                    " ON CONFLICT (problem, digest) DO UPDATE SET"
+                    "  fitness = max(fitness, excluded.fitness),"
+                    "  generation = min(generation, excluded.generation),"
+                    "  role = CASE WHEN role = 'winner' THEN role ELSE excluded.role END,"
+                    "  updated = excluded.updated",
+                    [(problem, c.digest, c.code, c.fitness, c.generation, role, now)
+                     for c in candidates]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [reference(self.path, c.digest) for c in candidates]
+
+    def get(self, ref):
+        """Source code for a reference (or bare digest), None if it isn't archived."""
+        digest = ref.rpartition("#")[2]
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT code FROM solutions WHERE digest = ? LIMIT 1", (digest,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def solutions(self, problem=None, role=None):
+        """Archived entries as dicts, best first, optionally filtered."""
+        query = "SELECT problem, digest, code, fitness, generation, role FROM solutions"
+        clauses, params = [], []
+        if problem is not None:
+            clauses.append("problem = ?")
+            params.append(problem)
+        if role is not None:
+            clauses.append("role = ?")
+            params.append(role)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY fitness DESC, updated ASC"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [
+            {"problem": problem, "digest": digest, "code": code, "fitness": fitness,
+             "generation": generation, "role": role}
+            for problem, digest, code, fitness, generation, role in rows
+        ]
+
+    def export(self, output_dir, role="winner"):
+        """Writes archived solutions out as <digest>.py files; returns the paths."""
+        os.makedirs(output_dir, exist_ok=True)
+        paths = []
+        for entry in self.solutions(role=role):
+            path = os.path.join(output_dir, f"{entry['digest'][:16]}.py")
+            with open(path, "w", encoding="utf-8") as file:
+                file.write(entry["code"])
+            paths.append(path)
+        return paths
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,248 @@
+"""End-to-end benchmark of the evolution pipeline against local stand-ins.
+
+Runs process_problems against benchmarks.mock_server (emulated Azure
+endpoint), or the in-process local LLM backend with --backend local, and
+the subprocess sandbox, then reports per-stage latency percentiles,
+problems/min and evaluations/sec. Results are written as JSON so runs on
+different commits can be compared. Cold start (a fresh interpreter
+importing the pipeline, and `cli.py --help`) is timed as well.
+
+Usage: python -m benchmarks.bench_pipeline [--problems 12] [--workers 4] [--latency 0.05]
+                                           [--backend mock|local] [--stream] [--speculation 2]
+                                           [--output bench.json] [--compare previous.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import process_problems
+import requests
+from benchmarks.mock_server import MockChatServer
+from rate_limit import AdaptiveRateLimiter, CircuitBreaker, RequestScheduler
+from prompts.mutations import mutation
+from prompts.mutations.client import ChatClient, LocalChatClient, set_client
+from telemetry import tracer
+
+STAGES = ["generate_population", "select_survivors", "mutate_survivors",
+          "generate_solution", "execute_code"]
+
+
+def percentile(samples, p):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+def summarize(samples):
+    return {
+        "count": len(samples),
+        "mean_ms": sum(samples) / len(samples) * 1000 if samples else 0.0,
+        "p50_ms": percentile(samples, 0.50) * 1000,
+        "p90_ms": percentile(samples, 0.90) * 1000,
+        "p99_ms": percentile(samples, 0.99) * 1000,
+    }
+
+
+@contextmanager
+def timed_stages(module, names):
+    """Wraps module-level functions to record their wall time per call."""
+    timings = {name: [] for name in names}
+    lock = threading.Lock()
+    originals = {name: getattr(module, name) for name in names}
+
+    def wrap(name, func):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with lock:
+                    timings[name].append(time.perf_counter() - start)
+        return timed
+
+    for name, func in originals.items():
+        setattr(module, name, wrap(name, func))
+    try:
+        yield timings
+    finally:
+        for name, func in originals.items():
+            setattr(module, name, func)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (subprocess.CalledProcessError, OSError):
+        return None
+
+
+# Fresh-interpreter commands timed for cold start, run from the repository root
+COLD_START = {
+    "import_pipeline": [sys.executable, "-c", "import process_problems"],
+    "cli_help": [sys.executable, "cli.py", "--help"],
+}
+
+
+def cold_start(runs=3, root=None):
+    """Median wall time (ms) of each COLD_START command in a new process."""
+    root = root or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results = {}
+    for name, cmd in COLD_START.items():
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            subprocess.run(cmd, cwd=root, check=True, capture_output=True)
+            samples.append(time.perf_counter() - start)
+        results[name] = statistics.median(samples) * 1000
+    return results
+
+
+def synthetic_problems(count, source="problems/problems.txt"):
+    base = process_problems.load_problems(source)
+    return [f"{base[i % len(base)]} (variant {i})" for i in range(count)]
+
+
+def run_benchmark(problems=12, workers=4, generations=3, latency=0.05, jitter=0.0,
+                  rate_429=0.0, seed=0, batch=True, server_rpm=None, client_rpm=6000,
+                  backend="mock", stream=False, speculation=0):
+    """Runs the pipeline once and returns the result dict.
+
+    backend "mock" talks HTTP to a MockChatServer; "local" uses the
+    in-process LocalChatClient (no sockets, no 429s) with the same latency.
+    """
+    tmpdir = tempfile.mkdtemp(prefix="bench_")
+    server = None
+    mutation.set_batch_generation(batch)
+    mutation.set_streaming(stream)
+    process_problems.configure_speculation(speculation)
+    if backend == "local":
+        client = LocalChatClient(latency=latency, jitter=jitter, seed=seed)
+    else:
+        server = MockChatServer(latency=latency, jitter=jitter, rate_429=rate_429, seed=seed,
+                                requests_per_minute=server_rpm).start()
+        scheduler = RequestScheduler(AdaptiveRateLimiter(requests_per_minute=client_rpm), CircuitBreaker(),
+                                     retry_exceptions=(requests.exceptions.ConnectionError,
+                                                       requests.exceptions.Timeout))
+        client = ChatClient(endpoint=server.url, api_key="bench", pool_size=max(4, workers * 2),
+                            scheduler=scheduler)
+    set_client(client)
+    mutation.configure_cache("off")
+    process_problems.configure_fitness_cache(None)
+    process_problems.configure_archive(os.path.join(tmpdir, "solutions.db"))
+    process_problems.configure_sandbox("subprocess")
+
+    try:
+        with timed_stages(process_problems, STAGES) as timings:
+            start = time.perf_counter()
+            process_problems.run_problems(
+                synthetic_problems(problems), workers=workers, rate_per_minute=0,
+                generations=generations,
+                leaderboard_file=os.path.join(tmpdir, "leaderboard.db"))
+            elapsed = time.perf_counter() - start
+    finally:
+        process_problems.close_sandbox()
+        if server:
+            server.stop()
+        set_client(None)
+        mutation.set_streaming(False)
+        process_problems.configure_speculation(0)
+
+    evaluations = len(timings["execute_code"])
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {"problems": problems, "workers": workers, "generations": generations,
+                   "latency": latency, "jitter": jitter, "rate_429": rate_429, "seed": seed,
+                   "batch": batch, "server_rpm": server_rpm, "client_rpm": client_rpm,
+                   "backend": backend, "stream": stream, "speculation": speculation},
+        "elapsed_s": elapsed,
+        "cold_start_ms": cold_start(),
+        "problems_per_min": problems / (elapsed / 60.0),
+        "evaluations_per_sec": evaluations / elapsed,
+        "llm_requests": server.requests if server else client.requests,
+        "llm_rate_limited": server.rate_limited if server else 0,
+        "stages": {name: summarize(samples) for name, samples in timings.items()},
+        "spans": tracer.stage_summary(),
+        "counters": dict(tracer.counters),
+    }
+
+
+def compare(current, previous):
+    """Prints relative change of the headline metrics against a previous run."""
+    print(f"\nCompared with {previous.get('commit')} ({previous.get('timestamp')}):")
+    for metric in ("problems_per_min", "evaluations_per_sec"):
+        before, after = previous[metric], current[metric]
+        change = (after - before) / before * 100 if before else 0.0
+        print(f"  {metric:<22} {before:>10.2f} -> {after:>10.2f} ({change:+.1f}%)")
+    for name, after in current["cold_start_ms"].items():
+        before = previous.get("cold_start_ms", {}).get(name)
+        if before:
+            change = (after - before) / before * 100
+            print(f"  {name + ' ms':<22} {before:>10.1f} -> {after:>10.1f} ({change:+.1f}%)")
+    for name, stats in current["stages"].items():
+        before = previous["stages"].get(name, {}).get("p50_ms")
+        if before:
+            change = (stats["p50_ms"] - before) / before * 100
+            print(f"  {name + ' p50 ms':<22} {before:>10.1f} -> {stats['p50_ms']:>10.1f} ({change:+.1f}%)")
+
+
+def report(result):
+    print(f"\n{'stage':<22} {'count':>6} {'mean ms':>9} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9}")
+    for name, stats in result["stages"].items():
+        print(f"{name:<22} {stats['count']:>6} {stats['mean_ms']:>9.1f} {stats['p50_ms']:>9.1f} "
+              f"{stats['p90_ms']:>9.1f} {stats['p99_ms']:>9.1f}")
+    print(f"\nproblems/min: {result['problems_per_min']:.2f}  "
+          f"evaluations/sec: {result['evaluations_per_sec']:.2f}  "
+          f"LLM requests: {result['llm_requests']} ({result['llm_rate_limited']} rate limited)")
+    print("cold start: " + "  ".join(f"{name} {ms:.0f} ms" for name, ms in result["cold_start_ms"].items()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--problems", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--generations", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock endpoint latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fraction of requests answered 429")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-batch", action="store_true", help="Disable `n`-batched generation")
+    parser.add_argument("--server-rpm", type=int, default=None,
+                        help="Requests per minute the mock endpoint enforces (429 beyond it)")
+    parser.add_argument("--client-rpm", type=float, default=6000,
+                        help="Starting request budget of the client's adaptive limiter")
+    parser.add_argument("--backend", choices=("mock", "local"), default="mock",
+                        help="mock: HTTP mock server; local: in-process stand-in model")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream single-solution requests with early abort")
+    parser.add_argument("--speculation", type=int, default=0,
+                        help="Mutation requests kept in flight while earlier mutants are evaluated")
+    parser.add_argument("--output", default=None, help="Write results JSON here")
+    parser.add_argument("--compare", default=None, help="Previous results JSON to compare with")
+    args = parser.parse_args(argv)
+
+    result = run_benchmark(args.problems, args.workers, args.generations, args.latency,
+                           args.jitter, args.rate_429, args.seed, batch=not args.no_batch,
+                           server_rpm=args.server_rpm, client_rpm=args.client_rpm,
+                           backend=args.backend, stream=args.stream, speculation=args.speculation)
+    report(result)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(result, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            compare(result, json.load(file))
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Per-evaluation latency of the sandbox backends.
+
+Usage: python -m benchmarks.bench_sandbox [--runs 20] [--backends subprocess docker-run docker-pool]
+"""
+import argparse
+import statistics
+import time
+
+from sandbox import BACKENDS
+
+SNIPPET = "def area(r):\n    return 3.14159 * r * r\n\nprint(area(2))\n"
+
+
+def bench_backend(name, runs, **options):
+    setup_start = time.perf_counter()
+    sandbox = BACKENDS[name](**options)
+    setup = time.perf_counter() - setup_start
+    latencies = []
+    try:
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = sandbox.run(SNIPPET)
+            latencies.append(time.perf_counter() - start)
+            if not result.success:
+                print(f"  {name}: run failed: {result.stderr.strip()[:200]}")
+    finally:
+        sandbox.close()
+    latencies.sort()
+    return {
+        "backend": name,
+        "setup_s": setup,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] * 1000,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--backends", nargs="+", default=sorted(BACKENDS), choices=sorted(BACKENDS))
+    args = parser.parse_args(argv)
+
+    print(f"{'backend':<12} {'setup s':>8} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    for name in args.backends:
+        try:
+            row = bench_backend(name, args.runs)
+        except Exception as e:
+            print(f"{name:<12} unavailable: {e}")
+            continue
+        print(f"{row['backend']:<12} {row['setup_s']:>8.2f} {row['mean_ms']:>9.1f} "
+              f"{row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
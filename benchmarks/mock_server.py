@@ -0,0 +1,203 @@
+"""Local stand-in for the Azure chat-completions endpoint.
+
+Usage: python -m benchmarks.mock_server [--port 8085] [--latency 0.2] [--rate-429 0.05]
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from prompts.mutations.client import STREAM_CHUNK_CHARS
+
+CANNED_SOLUTIONS = [
+    "def solve(x):\n    print(x)\n\nsolve(8)",
+    "import math\n\ndef area(r):\n    print(math.pi * r * r)\n\narea(2)",
+    "def largest_prime(n):\n    for i in range(n - 1, 1, -1):\n        if all(i % d for d in range(2, int(i ** 0.5) + 1)):\n            print(i)\n            return\n\nlargest_prime(100)",
+    "print(25 * 9 / 5 + 32)",
+    "def volume(s):\n    print(s ** 3)\n\nvolume(3)",
+    "print(8)",
+]
+CANNED_REPHRASE = "Given an input, compute the requested value and print it. Example: input 2, output 4."
+
+
+class MockChatServer:
+    """Threaded HTTP server answering chat-completions requests with canned content.
+
+    latency: seconds added to every response (plus up to `jitter` extra).
+    rate_429: probability of answering 429 with a Retry-After header.
+    support_n: honour the `n` parameter (several choices per response).
+    Requests with "stream": true get server-sent events, with the latency
+    spread over the chunks like a model emitting tokens.
+    requests_per_minute: enforce a sliding-window request limit and
+    advertise it in x-ratelimit-* headers, like Azure deployments do.
+    Responses are picked deterministically from the request body, so a run
+    against the same seed is reproducible.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, rate_429=0.0,
+                 retry_after=1, solutions=None, seed=0, support_n=True, requests_per_minute=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.solutions = solutions or CANNED_SOLUTIONS
+        self.support_n = support_n  # False emulates deployments that ignore `n`
+        self.requests_per_minute = requests_per_minute
+        self._window = deque()  # Accepted request times within the last minute
+        self.requests = 0
+        self.rate_limited = 0
+        self.aborted = 0  # Streams closed by the client before the end
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/openai/deployments/mock/chat/completions"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, like the real endpoint
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with server._lock:
+                    server.requests += 1
+                    limited = server._rng.random() < server.rate_429
+                    retry_after = server.retry_after
+                    headers = {}
+                    if server.requests_per_minute:
+                        now = time.monotonic()
+                        while server._window and now - server._window[0] >= 60:
+                            server._window.popleft()
+                        if len(server._window) >= server.requests_per_minute:
+                            limited = True
+                            retry_after = max(1, int(60 - (now - server._window[0])) + 1)
+                        elif not limited:
+                            server._window.append(now)
+                        headers = {
+                            "x-ratelimit-limit-requests": str(server.requests_per_minute),
+                            "x-ratelimit-remaining-requests": str(server.requests_per_minute - len(server._window)),
+                        }
+                    delay = server.latency + server._rng.random() * server.jitter
+                    if limited:
+                        server.rate_limited += 1
+                payload = json.loads(body or b"{}")
+                if payload.get("stream") and not limited:
+                    self._stream(server.completion(payload), delay, headers)
+                    return
+                time.sleep(delay)
+                if limited:
+                    headers["Retry-After"] = str(retry_after)
+                    self._send(429, {"error": {"code": "429", "message": "Rate limit exceeded"}}, headers)
+                    return
+                self._send(200, server.completion(payload), headers)
+
+            def _send(self, status, payload, headers=None):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _stream(self, completion, delay, headers):
+                """Sends the first choice as server-sent events, spreading delay over the chunks."""
+                content = completion["choices"][0]["message"]["content"]
+                pieces = [content[i:i + STREAM_CHUNK_CHARS]
+                          for i in range(0, len(content), STREAM_CHUNK_CHARS)]
+                events = [{"choices": [{"index": 0, "delta": {"content": piece}}]} for piece in pieces]
+                events.append({"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                try:
+                    for event in events:
+                        time.sleep(delay / len(events))
+                        self._chunk(f"data: {json.dumps(event)}\n\n")
+                    self._chunk("data: [DONE]\n\n")
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    with server._lock:
+                        server.aborted += 1  # The client abandoned the stream
+                    self.close_connection = True
+
+            def _chunk(self, text):
+                data = text.encode("utf-8")
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def completion(self, payload):
+        prompt = json.dumps(payload.get("messages", [])[-1:], sort_keys=True)
+        choices = []
+        for index in range(max(1, int(payload.get("n", 1)) if self.support_n else 1)):
+            if "Rephrase" in prompt:
+                content = CANNED_REPHRASE
+            else:
+                seed = f"{prompt}{payload.get('temperature')}{index}"
+                digest = hashlib.sha256(seed.encode("utf-8")).digest()
+                content = self.solutions[digest[0] % len(self.solutions)]
+            choices.append({"index": index, "message": {"role": "assistant", "content": content},
+                            "finish_reason": "stop"})
+        completion_tokens = sum(len(c["message"]["content"]) for c in choices) // 4
+        return {
+            "id": "mock",
+            "object": "chat.completion",
+            "choices": choices,
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": completion_tokens,
+                      "total_tokens": len(prompt) // 4 + completion_tokens},
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8085)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rpm", type=int, default=None, help="Enforced requests per minute")
+    args = parser.parse_args(argv)
+    server = MockChatServer(port=args.port, latency=args.latency, jitter=args.jitter,
+                            rate_429=args.rate_429, requests_per_minute=args.rpm)
+    print(f"Mock endpoint listening on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import threading
+
+
+def problem_key(index, problem):
+    """Identifies a problem by its position in the source and its text."""
+    return f"{index}:{hashlib.sha1(problem.encode('utf-8')).hexdigest()[:12]}"
+
+
+class CheckpointJournal:
+    """Append-only JSONL journal of per-problem and per-generation progress.
+
+    Records are flushed and fsynced as they are written, so after a crash
+    the journal can be replayed to skip finished problems and to restart
+    unfinished ones from their last completed generation.
+    """
+
+    def __init__(self, path, source=None, resume=False):
+        self.path = path
+        self.source = source
+        self.done = set()
+        self.states = {}  # key -> latest generation record
+        self._next_offsets = {}  # index -> byte offset of the following problem
+        self._lock = threading.Lock()
+
+        resuming = resume and os.path.exists(path)
+        if resuming:
+            self._replay()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "a" if resuming else "w", encoding="utf-8")
+        if not resuming:
+            self._append({"type": "run", "source": source})
+
+    def _replay(self):
+        with open(self.path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # Torn final write from a crash
+                kind = record.get("type")
+                if kind == "run":
+                    if None not in (self.source, record.get("source")) and record["source"] != self.source:
+                        raise ValueError(
+                            f"Checkpoint {self.path} belongs to '{record['source']}', not '{self.source}'"
+                        )
+                elif kind == "generation":
+                    self.states[record["key"]] = record
+                elif kind == "done":
+                    self.done.add(record["key"])
+                    self.states.pop(record["key"], None)
+                    self._next_offsets[record["index"]] = record.get("next_offset")
+
+    def resume_point(self):
+        """(index, byte offset) of the first problem not known to be finished.
+
+        Every problem before it is done, so the source can be reopened there
+        instead of being re-read from the top. Falls back to (0, 0) when the
+        offset is unknown (e.g. stdin); finished problems are still skipped
+        by key.
+        """
+        index = 0
+        while index in self._next_offsets:
+            index += 1
+        offset = self._next_offsets.get(index - 1) if index else 0
+        return (index, offset) if offset is not None else (0, 0)
+
+    def _append(self, record):
+        with self._lock:
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def is_done(self, key):
+        return key in self.done
+
+    def state(self, key):
+        """Latest generation record for an unfinished problem, or None."""
+        return self.states.get(key)
+
+    def record_generation(self, key, generation, population, best_fitness, best_solution):
+        record = {
+            "type": "generation",
+            "key": key,
+            "generation": generation,
+            "population": population,
+            "best_fitness": best_fitness,
+            "best_solution": best_solution,
+        }
+        with self._lock:
+            self.states[key] = record
+        self._append(record)
+
+    def record_done(self, key, index, best_fitness, best_solution, next_offset=None):
+        with self._lock:
+            self.done.add(key)
+            self.states.pop(key, None)
+            self._next_offsets[index] = next_offset
+        self._append({
+            "type": "done",
+            "key": key,
+            "index": index,
+            "next_offset": next_offset,
+            "best_fitness": best_fitness,
+            "best_solution": best_solution,
+        })
+
+    def close(self):
+        with self._lock:
+            self._file.close()
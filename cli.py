@@ -0,0 +1,64 @@
+"""Command-line entry point for the problem mutation processor.
+
+Usage: python cli.py run [options]                 # Evolve solutions (see `run --help`)
+       python cli.py resume [options]              # Continue from the checkpoint journal
+       python cli.py bench [options]               # Pipeline benchmark (see `bench --help`)
+       python cli.py export-leaderboard [--leaderboard leaderboard.db] [--output leaderboard.yaml]
+       python cli.py serve-queue --queue runs/queue.db [--host 0.0.0.0] [--port 8765]
+
+Each subcommand imports only what it needs, so help and leaderboard
+exports start without loading the pipeline, NumPy or the HTTP client.
+"""
+import argparse
+import os
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="cli.py", description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    # Options of these are parsed by the module that runs them
+    commands.add_parser("run", add_help=False, help="Evolve solutions for a problem source")
+    commands.add_parser("resume", add_help=False, help="Run again, resuming from the checkpoint journal")
+    commands.add_parser("bench", add_help=False, help="Benchmark the pipeline against local stand-ins")
+    export = commands.add_parser("export-leaderboard", help="Write the leaderboard store out as YAML")
+    export.add_argument("--leaderboard", default="leaderboard.db", help="Leaderboard store to read")
+    export.add_argument("--output", default="leaderboard.yaml", help="YAML file to write")
+    serve = commands.add_parser("serve-queue", help="Serve a job queue file to workers on other hosts")
+    serve.add_argument("--queue", required=True, help="SQLite queue file to serve")
+    serve.add_argument("--host", default="127.0.0.1", help="Address to listen on (0.0.0.0 for every interface)")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--lease", type=float, default=60,
+                       help="Seconds a job stays leased without a heartbeat before it is retried")
+    serve.add_argument("--token", default=os.getenv("QUEUE_TOKEN"),
+                       help="Shared secret clients must send (default: QUEUE_TOKEN)")
+    args, rest = parser.parse_known_args(argv)
+
+    if args.command in ("export-leaderboard", "serve-queue") and rest:
+        parser.error(f"unrecognized arguments: {' '.join(rest)}")
+    if args.command == "serve-queue":
+        from work_queue import QueueServer, SQLiteQueue
+        server = QueueServer(SQLiteQueue(args.queue, lease_seconds=args.lease), args.host, args.port,
+                             token=args.token)
+        print(f"Serving {args.queue} at {server.url}")
+        try:
+            server.httpd.serve_forever()
+        except KeyboardInterrupt:
+            server.stop()
+        return None
+    if args.command == "export-leaderboard":
+        from leaderboard import export_leaderboard
+        export_leaderboard(args.leaderboard, args.output)
+        print(f"Exported {args.leaderboard} to {args.output}")
+        return None
+    if args.command == "bench":
+        from benchmarks import bench_pipeline
+        return bench_pipeline.main(rest)
+
+    import process_problems
+    if args.command == "resume":
+        rest = ["--resume", *rest]
+    return process_problems.main(rest)
+
+
+if __name__ == "__main__":
+    main()
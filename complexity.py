@@ -0,0 +1,28 @@
+# Cleaned length at which the complexity score reaches zero
+MAX_REASONABLE_LENGTH = 500
+
+def clean_code(code, keep_indent=False):
+    """Remove comments, empty lines and redundant whitespace from code.
+
+    With keep_indent the leading indentation of each line is preserved, so
+    the result still identifies the program's block structure.
+    """
+    cleaned_lines = []
+    for raw_line in code.split('\n'):
+        line = raw_line.strip()
+        if line and not line.startswith('#'):
+            # Preserve only essential whitespace
+            indent = len(raw_line) - len(raw_line.lstrip()) if keep_indent else 0
+            cleaned_line = ' '.join(word for word in line.split())
+            cleaned_lines.append(' ' * indent + cleaned_line)
+    return '\n'.join(cleaned_lines)
+
+def calculate_kolmogorov_complexity(code):
+    """Calculate pure Kolmogorov complexity - simpler is better."""
+    # Remove comments and empty lines
+    cleaned_code = clean_code(code)
+
+    # Simple length-based score (shorter is better)
+    length_score = 70 * (1 - (len(cleaned_code) / MAX_REASONABLE_LENGTH))
+
+    return max(0, length_score)  # Can't go negative
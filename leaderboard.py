@@ -1,23 +1,149 @@
-import yaml
 import os
+import sqlite3
+import tempfile
+import threading
+import time
+from telemetry import traced
 
-def update_leaderboard(problem, score, solution_file, mutation_used, leaderboard_file="leaderboard.yaml", k=5):
+DEFAULT_LEADERBOARD = "leaderboard.db"
+
+
+class LeaderboardStore:
+    """Top-k leaderboard kept in SQLite.
+
+    Every update is one IMMEDIATE transaction, so concurrent workers (threads
+    or processes) serialize on SQLite's file lock and readers never see a
+    half-written board. The table is trimmed to k rows and indexed by score,
+    so an update costs O(log k).
+    """
+
+    def __init__(self, path=DEFAULT_LEADERBOARD, timeout=30):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=timeout, isolation_level=None,
+                                     check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS leaderboard ("
+            " problem TEXT PRIMARY KEY, score REAL NOT NULL, status TEXT NOT NULL,"
+            " solution_file TEXT, mutation_used INTEGER NOT NULL, output TEXT,"
+            " updated REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS leaderboard_score ON leaderboard(score)")
+
+    def update(self, problem, score, solution_file, mutation_used, k=5):
+        """Records a problem's score and drops entries that fall out of the top k."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO leaderboard"
+                    " (problem, score, status, solution_file, mutation_used, output, updated)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (problem, score,
+                     "solved" if score >= 80 else "unsolved",
+                     solution_file,
+                     int(bool(mutation_used)),
+                     "Execution successful" if score >= 80 else "Execution failed",
+                     time.time())
+                )
+                self._conn.execute(
+                    "DELETE FROM leaderboard WHERE problem IN ("
+                    " SELECT problem FROM leaderboard ORDER BY score DESC, updated ASC"
+                    " LIMIT -1 OFFSET ?)",
+                    (k,)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def top(self, k=None):
+        """Returns the leaderboard as an ordered dict of problem -> entry, best first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT problem, score, status, solution_file, mutation_used, output"
+                " FROM leaderboard ORDER BY score DESC, updated ASC LIMIT ?",
+                (-1 if k is None else k,)
+            ).fetchall()
+        return {
+            problem: {
+                "score": score,
+                "status": status,
+                "solution_file": solution_file,
+                "mutation_used": bool(mutation_used),
+                "output": output
+            }
+            for problem, score, status, solution_file, mutation_used, output in rows
+        }
+
+    def export_yaml(self, yaml_file="leaderboard.yaml"):
+        """Writes the leaderboard in the legacy YAML format, atomically."""
+        import yaml  # Only needed for the legacy format
+
+        directory = os.path.dirname(os.path.abspath(yaml_file))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".leaderboard-", suffix=".yaml")
+        try:
+            with os.fdopen(fd, "w") as file:
+                yaml.dump(self.top(), file, default_flow_style=False, sort_keys=False)
+            os.replace(tmp_path, yaml_file)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def import_yaml(self, yaml_file="leaderboard.yaml", k=5):
+        """Loads entries from a legacy leaderboard.yaml."""
+        import yaml
+
+        with open(yaml_file, "r") as file:
+            entries = yaml.safe_load(file) or {}
+        for problem, entry in entries.items():
+            self.update(problem, entry["score"], entry.get("solution_file"),
+                        entry.get("mutation_used", False), k=k)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_store(leaderboard_file=DEFAULT_LEADERBOARD):
+    """Returns the shared store for a leaderboard file."""
+    path = os.path.abspath(leaderboard_file)
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = LeaderboardStore(path)
+        return _stores[path]
+
+def close_store(leaderboard_file=DEFAULT_LEADERBOARD):
+    with _stores_lock:
+        store = _stores.pop(os.path.abspath(leaderboard_file), None)
+    if store:
+        store.close()
+
+@traced()
+def update_leaderboard(problem, score, solution_file, mutation_used, leaderboard_file=DEFAULT_LEADERBOARD, k=5):
     """Updates the leaderboard with problem scores, retaining the top k problems."""
-    leaderboard = {}
-    if os.path.exists(leaderboard_file):
-        with open(leaderboard_file, "r") as file:
-            leaderboard = yaml.safe_load(file) or {}
-
-    leaderboard[problem] = {
-        "score": score,
-        "status": "solved" if score >= 80 else "unsolved",
-        "solution_file": solution_file,
-        "mutation_used": mutation_used,
-        "output": "Execution successful" if score >= 80 else "Execution failed"
-    }
-
-    sorted_leaderboard = dict(sorted(leaderboard.items(), key=lambda item: item[1]["score"], reverse=True)[:k])
-
-    with open(leaderboard_file, "w") as file:
-        yaml.dump(sorted_leaderboard, file, default_flow_style=False)
+    get_store(leaderboard_file).update(problem, score, solution_file, mutation_used, k=k)
     print(f"Leaderboard updated for problem: '{problem}' with score {score}")
+
+def import_legacy_leaderboard(leaderboard_file=DEFAULT_LEADERBOARD, yaml_file="leaderboard.yaml"):
+    """Imports a pre-SQLite leaderboard.yaml into an empty store; returns the entries added.
+
+    Run before the first update, so the export at the end of the run
+    doesn't replace the YAML history with only the new entries.
+    """
+    store = get_store(leaderboard_file)
+    if store.top(1) or not yaml_file or not os.path.exists(yaml_file):
+        return 0
+    store.import_yaml(yaml_file)
+    count = len(store.top())
+    print(f"Imported {count} leaderboard entries from {yaml_file}")
+    return count
+
+def export_leaderboard(leaderboard_file=DEFAULT_LEADERBOARD, yaml_file="leaderboard.yaml"):
+    """Exports the leaderboard store to YAML."""
+    get_store(leaderboard_file).export_yaml(yaml_file)
@@ -0,0 +1,45 @@
+from concurrent.futures import ThreadPoolExecutor
+from telemetry import incr
+
+
+def pipelined(items, generate, evaluate, depth=2, workers=1):
+    """Runs generate(item) then evaluate(result) for every item, overlapping the stages.
+
+    Up to `depth` generate calls are in flight at once, and each result is
+    handed to one of `workers` evaluation threads as soon as it arrives,
+    so later requests go out while earlier candidates are still running.
+    Yields (item, evaluated) in item order; evaluated is None when generate
+    returned None. Closing the generator (e.g. breaking out of the loop)
+    cancels everything not started yet; calls already running finish in
+    the background and their results are dropped.
+    """
+    items = list(items)
+    generators = ThreadPoolExecutor(max_workers=max(1, depth))
+    evaluators = ThreadPoolExecutor(max_workers=max(1, workers))
+    evaluations = []
+
+    def stage(item):
+        result = generate(item)
+        if result is None:
+            return None
+        evaluation = evaluators.submit(evaluate, result)
+        evaluations.append(evaluation)
+        return evaluation
+
+    futures = [generators.submit(stage, item) for item in items]
+    consumed = 0
+    try:
+        for item, future in zip(items, futures):
+            evaluation = future.result()
+            consumed += 1
+            yield item, evaluation.result() if evaluation is not None else None
+    finally:
+        # By hand: shutdown(cancel_futures=True) needs Python 3.9
+        cancelled = sum(future.cancel() for future in futures[consumed:])
+        for evaluation in list(evaluations):
+            evaluation.cancel()
+        generators.shutdown(wait=False)
+        evaluators.shutdown(wait=False)
+        if consumed < len(futures):
+            incr("speculation_cancelled", cancelled)
+            incr("speculation_discarded", len(futures) - consumed - cancelled)
@@ -0,0 +1,82 @@
+import hashlib
+
+
+def source_digest(code):
+    """Identifies a candidate by its source, ignoring surrounding whitespace."""
+    return hashlib.sha256(code.strip().encode("utf-8")).hexdigest()
+
+
+class Candidate:
+    """One solution in a population; the code stays in memory, never on disk.
+
+    metrics holds the measured record once the candidate was evaluated.
+    """
+
+    __slots__ = ("code", "fitness", "generation", "digest", "metrics")
+
+    def __init__(self, code, fitness=0, generation=1):
+        self.code = code
+        self.fitness = fitness
+        self.generation = generation
+        self.digest = source_digest(code)
+        self.metrics = None
+
+    def to_dict(self):
+        return {"code": self.code, "fitness": self.fitness, "generation": self.generation}
+
+    @classmethod
+    def from_dict(cls, record):
+        """Builds a candidate from to_dict() output (extra keys are ignored)."""
+        return cls(record["code"], record.get("fitness", 0), record.get("generation", 1))
+
+    def __repr__(self):
+        return f"Candidate(fitness={self.fitness}, generation={self.generation}, digest={self.digest[:8]})"
+
+
+class Population:
+    """Ordered collection of candidates holding each distinct source once."""
+
+    __slots__ = ("_candidates", "_digests")
+
+    def __init__(self, candidates=()):
+        self._candidates = []
+        self._digests = set()
+        self.extend(candidates)
+
+    def add(self, candidate):
+        """Appends candidate unless its source is already present; returns whether it was added."""
+        if candidate.digest in self._digests:
+            return False
+        self._digests.add(candidate.digest)
+        self._candidates.append(candidate)
+        return True
+
+    def extend(self, candidates):
+        return sum(self.add(candidate) for candidate in candidates)
+
+    def __contains__(self, candidate):
+        return candidate.digest in self._digests
+
+    def __iter__(self):
+        return iter(self._candidates)
+
+    def __len__(self):
+        return len(self._candidates)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return Population(self._candidates[index])
+        return self._candidates[index]
+
+    def copy(self):
+        return Population(self._candidates)
+
+    def sort(self):
+        """Orders candidates by fitness, best first (stable for ties)."""
+        self._candidates.sort(key=lambda candidate: candidate.fitness, reverse=True)
+
+    def best(self):
+        return max(self._candidates, key=lambda candidate: candidate.fitness, default=None)
+
+    def to_list(self):
+        return [candidate.to_dict() for candidate in self._candidates]
@@ -0,0 +1,197 @@
+import ast
+import builtins
+import hashlib
+import subprocess
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+
+from sandbox import ExecutionResult
+
+BUILTIN_NAMES = frozenset(dir(builtins))
+OUTPUT_FUNCTIONS = frozenset({"print", "pprint"})
+OUTPUT_METHODS = frozenset({"write", "writelines", "print", "pprint"})
+OUTPUT_STREAMS = frozenset({"stdout"})
+# Code using these can define names the static check can't see
+DYNAMIC_NAMESPACE = frozenset({"exec", "eval", "globals", "locals", "vars", "__import__", "setattr"})
+# Pattern matching, Python 3.10+
+MATCH_AS = getattr(ast, "MatchAs", ())
+MATCH_STAR = getattr(ast, "MatchStar", ())
+MATCH_MAPPING = getattr(ast, "MatchMapping", ())
+
+
+def canonical_ast(tree):
+    """Hash of the AST without positions, so formatting and comments don't matter."""
+    dump = ast.dump(tree, annotate_fields=False, include_attributes=False)
+    return hashlib.sha256(dump.encode("utf-8")).hexdigest()
+
+
+def _bound_names(tree):
+    """Every name bound anywhere in the module (any scope)."""
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            names.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, ast.arg):
+            names.add(node.arg)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                names.add((alias.asname or alias.name).split(".")[0])
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            names.add(node.name)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            names.update(node.names)
+        elif isinstance(node, (MATCH_AS, MATCH_STAR)) and node.name:
+            names.add(node.name)
+        elif isinstance(node, MATCH_MAPPING) and node.rest:
+            names.add(node.rest)
+    return names
+
+
+def static_check(tree):
+    """Returns a rejection reason for code that can't produce useful output, else None.
+
+    The checks are conservative: a name counts as defined if it is bound in
+    any scope, and modules using star imports or dynamic namespaces skip
+    the undefined-name check. Any use of print, pprint or stdout counts as
+    output, not just a direct call, since they can be aliased or passed on.
+    """
+    has_output = False
+    dynamic = False
+    loaded = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call):
+            func = node.func
+            if isinstance(func, ast.Name) and func.id in DYNAMIC_NAMESPACE:
+                dynamic = True
+            elif isinstance(func, ast.Attribute) and func.attr in OUTPUT_METHODS:
+                has_output = True
+        elif isinstance(node, ast.ImportFrom):
+            if any(alias.name == "*" for alias in node.names):
+                dynamic = True
+            if any(alias.name in OUTPUT_FUNCTIONS | OUTPUT_STREAMS for alias in node.names):
+                has_output = True
+        elif isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load):
+            loaded.append(node.id)
+            if node.id in OUTPUT_FUNCTIONS | OUTPUT_STREAMS:
+                has_output = True
+        elif isinstance(node, ast.Attribute) and node.attr in OUTPUT_FUNCTIONS | OUTPUT_STREAMS:
+            has_output = True
+
+    if not has_output:
+        return "prints nothing"
+    if not dynamic:
+        defined = _bound_names(tree) | BUILTIN_NAMES
+        undefined = sorted({name for name in loaded if name not in defined})
+        if undefined:
+            return f"undefined names: {', '.join(undefined)}"
+    return None
+
+
+def _limit_resources(cpu_seconds, memory_bytes):
+    def apply():
+        import resource
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds))
+        resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+        resource.setrlimit(resource.RLIMIT_FSIZE, (1024 * 1024, 1024 * 1024))
+    return apply
+
+
+class Prescreener:
+    """Cheap checks that run before a candidate reaches the sandbox.
+
+    check() returns an ExecutionResult when the sandbox can be skipped:
+    a synthetic failure for rejected code, or the recorded result of an
+    AST-identical candidate. It returns None when the candidate should be
+    executed, after which remember() records the real result.
+
+    The optional dry run executes candidates on the host under rlimits and
+    a short timeout, outside the container, so it is off by default.
+    """
+
+    def __init__(self, dry_run=False, dry_run_timeout=1, memory_bytes=256 * 1024 * 1024,
+                 max_remembered=10000):
+        self.dry_run = dry_run
+        self.dry_run_timeout = dry_run_timeout
+        self.memory_bytes = memory_bytes
+        self.max_remembered = max_remembered
+        self.counters = {"checked": 0, "rejected_static": 0, "deduplicated": 0,
+                         "rejected_dry_run": 0, "passed": 0}
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    @property
+    def container_runs_avoided(self):
+        return (self.counters["rejected_static"] + self.counters["deduplicated"]
+                + self.counters["rejected_dry_run"])
+
+    def check(self, code):
+        self._count("checked")
+        try:
+            tree = ast.parse(code)
+        except (SyntaxError, ValueError) as e:
+            self._count("rejected_static")
+            return ExecutionResult("", f"Pre-screen: {e}", 1)
+
+        key = canonical_ast(tree)
+        with self._lock:
+            known = self._results.get(key)
+            if known is not None:
+                self._results.move_to_end(key)
+        if known is not None:
+            self._count("deduplicated")
+            return known
+
+        reason = static_check(tree)
+        if reason:
+            self._count("rejected_static")
+            return ExecutionResult("", f"Pre-screen: {reason}", 1)
+
+        if self.dry_run:
+            result = self._dry_run(code)
+            if not result.success or not result.stdout:
+                self._count("rejected_dry_run")
+                return result
+
+        self._count("passed")
+        return None
+
+    def _dry_run(self, code):
+        preexec = None
+        if sys.platform != "win32":
+            preexec = _limit_resources(self.dry_run_timeout, self.memory_bytes)
+        with tempfile.TemporaryDirectory(prefix="prescreen_") as workdir:
+            try:
+                result = subprocess.run([sys.executable, "-I", "-"], input=code, capture_output=True,
+                                        text=True, timeout=self.dry_run_timeout, cwd=workdir,
+                                        preexec_fn=preexec)
+            except subprocess.TimeoutExpired:
+                return ExecutionResult("", "Pre-screen dry run timed out", -1, timed_out=True)
+        return ExecutionResult(result.stdout.strip(), result.stderr, result.returncode)
+
+    def remember(self, code, result):
+        """Records a sandbox result so AST-identical candidates can reuse it."""
+        try:
+            key = canonical_ast(ast.parse(code))
+        except (SyntaxError, ValueError):
+            return
+        with self._lock:
+            self._results[key] = result
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_remembered:
+                self._results.popitem(last=False)
+
+    def summary(self):
+        with self._lock:
+            counters = dict(self.counters)
+        return (f"Pre-screen: {counters['checked']} checked, {counters['rejected_static']} rejected "
+                f"statically, {counters['deduplicated']} AST duplicates, "
+                f"{counters['rejected_dry_run']} failed dry run "
+                f"({self.container_runs_avoided} container runs avoided)")
@@ -1,23 +1,97 @@
 import os
 import uuid
 import time
-from dotenv import load_dotenv
+import sys
+import json
+import argparse
+import hashlib
+import socket
+import threading
+from collections import deque, namedtuple
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import subprocess
 import random
-from prompts.mutations.mutation import generate_solution, mutate_problem
-from leaderboard import update_leaderboard 
+from prompts.mutations.mutation import (
+    CACHE_MODES, DEFAULT_CACHE_PATH, batch_generation_enabled, cache_stats, configure_cache,
+    generate_solution, generate_solutions, mutate_problem, set_batch_generation, set_streaming,
+    set_stream_length_limit
+)
+from prompts.mutations.client import (
+    BACKENDS as LLM_BACKENDS, create_client, load_environment, set_client
+)
+from leaderboard import (
+    DEFAULT_LEADERBOARD, export_leaderboard, import_legacy_leaderboard, update_leaderboard
+)
+from archive import DEFAULT_ARCHIVE, SolutionArchive
+from population import Candidate, Population
+from reuse import ReuseIndex
+from cache import DiskCache, make_key
+from complexity import calculate_kolmogorov_complexity, clean_code
+from scoring import (
+    SELECTIONS, ScoringEngine, check_output, code_metrics, metrics_arrays, parse_weights,
+    select_nsga, select_top, select_tournament
+)
+import numpy as np
+from checkpoint import CheckpointJournal, problem_key
+from pipeline import pipelined
+from rate_limit import TokenBucket
+from prescreen import Prescreener
+from sandbox import BACKENDS, IMAGE, close_sandbox, configure_sandbox, get_sandbox, run_repeated
+from work_queue import DONE, FAILED, LEASED, PENDING, open_queue
+from telemetry import annotate, incr, traced, tracer
 
-# Load environment variables from .env file
-load_dotenv()
+# A problem read from a source; next_offset is the byte offset of the line after it
+ProblemRecord = namedtuple("ProblemRecord", ["index", "problem", "next_offset"])
+
+def _parse_problem(line, is_jsonl):
+    line = line.strip()
+    if not line or not is_jsonl:
+        return line
+    try:
+        record = json.loads(line)
+    except json.JSONDecodeError:
+        if is_jsonl is None:  # Sniffed from stdin, treat as plain text
+            return line
+        raise
+    if isinstance(record, dict):
+        return str(record.get("problem") or record.get("text") or "").strip()
+    return str(record).strip()
+
+def stream_problems(source="problems/problems.txt", start=(0, 0)):
+    """Lazily yields ProblemRecords from a text file, a JSONL file or stdin ("-").
+
+    JSONL lines are either strings or objects with a "problem" field. Blank
+    lines are skipped. `start` is an (index, byte offset) pair to seek to,
+    e.g. a checkpoint's resume point; it is ignored for stdin.
+    """
+    if source == "-":
+        index = 0
+        for line in sys.stdin:
+            problem = _parse_problem(line, is_jsonl=None if line.lstrip().startswith("{") else False)
+            if problem:
+                yield ProblemRecord(index, problem, None)
+                index += 1
+        return
+    
+    if not os.path.exists(source):
+        raise FileNotFoundError("The problems.txt file is missing!")
+    is_jsonl = source.endswith(".jsonl")
+    index, offset = start
+    with open(source, "rb") as file:
+        file.seek(offset)
+        for raw_line in file:
+            offset += len(raw_line)
+            problem = _parse_problem(raw_line.decode("utf-8"), is_jsonl)
+            if problem:
+                yield ProblemRecord(index, problem, offset)
+                index += 1
 
 def load_problems(file_path="problems/problems.txt"):
     """Loads problems from a text file, each line is a problem."""
-    if not os.path.exists(file_path):
-        raise FileNotFoundError("The problems.txt file is missing!")
-    with open(file_path, "r") as file:
-        problems = file.readlines()
-    return [problem.strip() for problem in problems]
+    return [record.problem for record in stream_problems(file_path)]
 
+@traced()
 def save_solution(solution, output_dir="output/"):
     """Saves a solution as a Python (.py) file in the output directory."""
     os.makedirs(output_dir, exist_ok=True)  # Create directory if it doesn’t exist
@@ -75,121 +149,416 @@ def execute_solution(file_path, problem):
         print("Execution timed out.")
         return False, "Timed out"
 
-def generate_population(problem, population_size=3):
-    """Generate initial population of solutions."""
-    population = []
-    for _ in range(population_size):
-        # Use different temperatures to encourage diversity
-        temperature = 0.3 + (random.random() * 0.4)  # Random temp between 0.3 and 0.7
-        solution = generate_solution(problem, temperature=temperature)
-        if solution:
-            file_path = save_solution(solution)
-            population.append({
-                'code': solution,
-                'file_path': file_path,
-                'fitness': 0,
-                'generation': 1
-            })
-    return population
+def generate_population(problem, population_size=3, rng=None):
+    """Generate initial population of solutions.
 
-def calculate_kolmogorov_complexity(code):
-    """Calculate pure Kolmogorov complexity - simpler is better."""
-    # Remove comments and empty lines
-    cleaned_lines = []
-    for line in code.split('\n'):
-        line = line.strip()
-        if line and not line.startswith('#'):
-            # Preserve only essential whitespace
-            indent = len(line) - len(line.lstrip())
-            cleaned_line = ' '.join(word for word in line.split())
-            cleaned_lines.append(' ' * indent + cleaned_line)
+    The whole population comes from one batched request when the endpoint
+    supports it, otherwise from one request per candidate. Identical
+    sources are kept only once.
+    """
+    rng = rng or random
+    solutions = []
+    if batch_generation_enabled():
+        temperature = 0.3 + (rng.random() * 0.4)  # Random temp between 0.3 and 0.7
+        solutions = generate_solutions(problem, population_size, temperature=temperature)
     
-    cleaned_code = '\n'.join(cleaned_lines)
+    if not batch_generation_enabled():
+        for index in range(len(solutions), population_size):
+            # Use different temperatures to encourage diversity
+            temperature = 0.3 + (rng.random() * 0.4)  # Random temp between 0.3 and 0.7
+            solution = generate_solution(problem, temperature=temperature, sample=index)
+            if solution:
+                solutions.append(solution)
     
-    # Simple length-based score (shorter is better)
-    max_reasonable_length = 500
-    length_score = 70 * (1 - (len(cleaned_code) / max_reasonable_length))
-    
-    return max(0, length_score)  # Can't go negative
+    return Population(Candidate(solution) for solution in solutions)
+
+# Bump when the measured metrics or pre-screen rules change so stale cached records are ignored
+FITNESS_VERSION = 4
+
+_fitness_cache = DiskCache(":memory:")
+
+def configure_fitness_cache(path=None, **options):
+    """Persist fitness results at path (in-memory only when path is falsy)."""
+    global _fitness_cache
+    _fitness_cache.close()
+    _fitness_cache = DiskCache(path or ":memory:", **options)
+    return _fitness_cache
+
+_archive = SolutionArchive(":memory:")
+
+def configure_archive(path=None):
+    """Persist survivors and winners at path (in-memory only when path is falsy)."""
+    global _archive
+    _archive.close()
+    _archive = SolutionArchive(path or ":memory:")
+    return _archive
+
+_reuse = None
+_reuse_k = 0
+
+def configure_reuse(k=2, index=None):
+    """Shows up to k solutions of similar solved problems when generating for a new one (0 disables).
+
+    The index starts from the winners already in the solution archive.
+    """
+    global _reuse, _reuse_k
+    _reuse_k = k
+    _reuse = (index or ReuseIndex.from_archive(_archive)) if k else None
+    return _reuse
+
+def reuse_prompt(problem):
+    """The problem statement followed by the best solutions of related problems, as examples.
+
+    They only guide generation: code written for another problem never
+    enters the population, so it can't be selected or recorded as the
+    winner unless the LLM writes it again for this one.
+    """
+    if _reuse is None:
+        return problem
+    related = _reuse.related(problem, k=_reuse_k)
+    for similarity, entry in related:
+        print(f"Showing solution of '{entry['problem']}' as an example (similarity {similarity:.2f})")
+        problem += (f"\n\nFor reference, a solution to the similar problem '{entry['problem']}'"
+                    f" (adapt it, don't copy it):\n{entry['code']}")
+    incr("reuse_examples", len(related))
+    return problem
+
+_engine = ScoringEngine()
+_selection = "truncate"
 
-def evaluate_fitness(solution_path, problem):
-    """Evaluate fitness based purely on complexity and successful execution."""
+def configure_scoring(weights=None, selection="truncate", **options):
+    """Sets the fitness weights (dict or preset/spec string) and the survivor selection method.
+
+    Streamed completions are only abandoned for length when length is scored.
+    """
+    global _engine, _selection
+    if selection not in SELECTIONS:
+        raise ValueError(f"Unknown selection '{selection}', expected one of {SELECTIONS}")
+    if isinstance(weights, str):
+        weights = parse_weights(weights)
+    _engine = ScoringEngine(weights, **options)
+    _selection = selection
+    set_stream_length_limit(_engine.length_limit)
+    return _engine
+
+_prescreener = Prescreener()
+
+def configure_prescreen(enabled=True, dry_run=False, **options):
+    """Sets up the checks run before the sandbox (None disables them)."""
+    global _prescreener
+    _prescreener = Prescreener(dry_run=dry_run, **options) if enabled else None
+    return _prescreener
+
+def fitness_key(code, problem):
+    """Cache key: hash of the normalized source plus the problem it solves."""
+    return make_key(clean_code(code, keep_indent=True), problem, version=FITNESS_VERSION)
+
+@traced()
+def measure(code, problem):
+    """Measures a candidate: size, compressibility, execution, resource and output metrics.
+
+    Records are memoized by normalized source, so unchanged code is never
+    executed twice; scores are derived from them, so changing the fitness
+    weights needs no re-execution. A failed measurement scores zero.
+    Timeouts and sandbox failures are not memoized, since a later run
+    (less loaded, or with a working sandbox) can still succeed; their
+    records are marked 'transient'.
+    """
     try:
-        with open(solution_path, 'r') as f:
-            code = f.read()
-        
-        # Complexity score (70%)
-        complexity_score = calculate_kolmogorov_complexity(code)
+        key = fitness_key(code, problem)
+        cached = _fitness_cache.get(key)
+        annotate(cache_hit=cached is not None)
+        if cached is not None:
+            return cached
         
-        # Execution score (30%) - just needs to run and produce output
-        output, success = execute_solution_safely(solution_path)
-        execution_score = 30 if success and output else 0
-            
-        return complexity_score + execution_score
+        metrics = code_metrics(code)
+        result = _prescreener.check(code) if _prescreener else None
+        annotate(prescreened=result is not None)
+        if result is None:
+            result = execute_code(code)
+            if _prescreener and not result.transient:
+                _prescreener.remember(code, result)
+        metrics.update({
+            'success': bool(result.success and result.stdout),  # Just needs to run and produce output
+            # Measured around the candidate in the sandbox when available
+            'runtime': result.wall_time or result.duration,
+            'cpu_time': result.cpu_time,
+            'peak_rss': result.peak_rss,
+            'output_bytes': result.output_bytes,
+            'output_ok': check_output(problem, result.stdout),
+            'stdout': result.stdout,
+            'returncode': result.returncode,
+        })
+        annotate(transient=result.transient)
+        if result.transient:
+            metrics['transient'] = True
+        else:
+            _fitness_cache.set(key, metrics)
+        return metrics
         
     except Exception as e:
         print(f"Fitness evaluation failed: {e}")
-        return 0
+        return failed_metrics()
 
-def select_survivors(population, problem, survival_rate=0.5):
-    """Select best solutions to survive."""
-    for solution in population:
-        solution['fitness'] = evaluate_fitness(solution['file_path'], problem)
+def failed_metrics():
+    """Record for a candidate that could not be measured; it scores zero."""
+    return {'length': _engine.max_length, 'compressed': _engine.max_compressed}
+
+@traced()
+def evaluate_fitness(code, problem):
+    """Evaluate fitness from complexity and execution, weighted by the scoring engine."""
+    return _engine.score_one(measure(code, problem))
+
+_eval_queue = None
+_eval_poll_interval = 0.05
+
+def configure_remote_evaluation(queue=None, poll_interval=0.05):
+    """Sends population evaluations through a job queue (None evaluates locally)."""
+    global _eval_queue, _eval_poll_interval
+    _eval_queue = queue
+    _eval_poll_interval = poll_interval
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+def _evaluate_remote(groups, problem):
+    """Queues one evaluation job per group and yields results as they finish.
+
+    Jobs are keyed by fitness_key, so identical code queued by any worker is
+    evaluated once (failed jobs and transient results are not reused by
+    later puts). A job that failed scores like a failed measurement. While
+    waiting, this thread runs queued evaluations
+    itself (heartbeat and failure handling as in run_worker), so a worker
+    blocked on its own population still makes progress.
+    """
+    queue = _eval_queue
+    pending = {
+        queue.put("evaluate", {"code": members[0].code, "problem": problem}, key=key): members
+        for key, members in groups.items()
+    }
+    while pending:
+        for job_id in list(pending):
+            status, result = queue.result(job_id)
+            if status in (DONE, FAILED):
+                metrics = result["metrics"] if status == DONE else failed_metrics()
+                fitness = _engine.score_one(metrics)
+                for candidate in pending.pop(job_id):
+                    candidate.metrics = metrics
+                    candidate.fitness = fitness
+                    yield candidate, fitness
+        if pending:
+            job = queue.lease(worker_name(), kinds=("evaluate",))
+            if job:
+                run_leased(queue, job)
+            else:
+                time.sleep(_eval_poll_interval)
+
+def evaluate_population(population, problem, parallelism=None):
+    """Evaluate fitness for a whole population across concurrent sandbox slots.
+
+    Yields (candidate, fitness) pairs as evaluations complete, with the
+    fitness and metrics also stored on each candidate. Sources that
+    normalize to the same code are only evaluated once. With remote evaluation configured,
+    the work is spread over every worker sharing the job queue.
+    """
+    groups = {}
+    for candidate in population:
+        groups.setdefault(fitness_key(candidate.code, problem), []).append(candidate)
+    if not groups:
+        return
+    if _eval_queue is not None:
+        yield from _evaluate_remote(groups, problem)
+        return
     
-    # Sort by fitness and keep the best ones
-    population.sort(key=lambda x: x['fitness'], reverse=True)
-    survivors_count = max(1, int(len(population) * survival_rate))
-    return population[:survivors_count]
-
-def mutate_survivors(survivors, problem, target_population_size=3, max_attempts=3):
-    """Mutate survivors with focus on simplification."""
-    new_population = survivors.copy()
+    workers = min(len(groups), parallelism or get_sandbox().slots)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(measure, members[0].code, problem): members
+            for members in groups.values()
+        }
+        for future in as_completed(futures):
+            metrics = future.result()
+            fitness = _engine.score_one(metrics)
+            for candidate in futures[future]:
+                candidate.metrics = metrics
+                candidate.fitness = fitness
+                yield candidate, fitness
+
+def select_survivors(population, problem, survival_rate=0.5, parallelism=None):
+    """Select best solutions to survive.
+
+    The generation's metrics are scored as arrays in one vectorized pass,
+    then survivors are picked by partial selection (top-k via argpartition,
+    tournament, or NSGA-style Pareto fronts over the fitness terms) rather
+    than by sorting the whole population.
+    """
+    population = Population(population)
+    for _ in evaluate_population(population, problem, parallelism):
+        pass
+    
+    candidates = list(population)
+    survivors_count = max(1, int(len(candidates) * survival_rate))
+    arrays = metrics_arrays([candidate.metrics or {} for candidate in candidates])
+    fitness = _engine.score(arrays)
+    for candidate, value in zip(candidates, fitness.tolist()):
+        candidate.fitness = value
+    
+    if _selection == "nsga":
+        chosen = select_nsga(_engine.objectives(arrays), survivors_count)
+    elif _selection == "tournament":
+        chosen = select_tournament(fitness, survivors_count, np.random.default_rng(problem_seed(problem)))
+    else:
+        chosen = select_top(fitness, survivors_count)
+    return Population(candidates[index] for index in chosen)
+
+def mutation_prompt(problem, attempt, sample=0):
+    """Progressive mutation strategies, one per attempt."""
+    if attempt == 1:
+        # Try to simplify existing solution
+        return f"Solve this problem in the simplest way possible: {problem}"
+    if attempt == 2:
+        # Try alternative approach
+        mutated_problem, _ = mutate_problem(problem, mutation_type="rephrase", sample=sample)
+        return mutated_problem or problem
+    # Completely different approach
+    return f"Write the shortest possible solution for: {problem}"
+
+# A problem stops evolving once a solution reaches this fitness
+EARLY_STOP_FITNESS = 90
+
+_speculation = 0
+
+def configure_speculation(depth=0):
+    """Keeps up to depth mutation requests in flight while earlier mutants are evaluated (0: phased rounds)."""
+    global _speculation
+    _speculation = max(0, depth)
+
+def _mutate_pipelined(population, parent, problem, target_population_size, max_attempts, parallelism,
+                      generation):
+    """mutate_survivors with attempts requested speculatively and evaluated on arrival.
+
+    No more requests are in flight than the population has open slots (and
+    never more than the speculation depth). Mutants are still accepted in
+    attempt order. Once the population is full or reaches the early stop,
+    attempts not yet sent are cancelled; requests already in flight can't
+    be, so they run to completion and their mutants are discarded.
+    """
+    def generate(attempt):
+        print(f"\nMutation attempt {attempt}")
+        temperature = 0.3 + (attempt * 0.1)  # Smaller temperature increments
+        mutated_solution = generate_solution(mutation_prompt(problem, attempt, generation),
+                                             temperature=temperature,
+                                             sample=generation)
+        if not mutated_solution:
+            return None
+        mutant = Candidate(mutated_solution, generation=parent.generation + 1)
+        return None if mutant in population else mutant  # Duplicates aren't evaluated again
+
+    def evaluate(mutant):
+        for _ in evaluate_population([mutant], problem, parallelism):
+            pass
+        return mutant
+
+    depth = min(_speculation, target_population_size - len(population))
+    attempts = pipelined(range(1, max_attempts + 1), generate, evaluate, depth=depth,
+                         workers=parallelism or get_sandbox().slots)
+    with closing(attempts):
+        for _, mutant in attempts:
+            if mutant is None:
+                continue
+            if mutant.fitness > parent.fitness and population.add(mutant):
+                print(f"Added improved solution with fitness {mutant.fitness}")
+            else:
+                print("Solution not better than parent, trying again...")
+            if len(population) >= target_population_size or mutant.fitness >= EARLY_STOP_FITNESS:
+                break
+    return population
+
+def mutate_survivors(survivors, problem, target_population_size=3, max_attempts=3, parallelism=None,
+                     generation=None):
+    """Mutate survivors with focus on simplification.
+
+    Each round generates only as many mutants as are still missing from the
+    target population and evaluates them as one batch. With speculation
+    configured, requests and evaluations are pipelined instead.
+
+    generation is the generation being bred (default: the parent's). The
+    prompts don't contain the parent's code, so it goes into the response
+    cache key: otherwise a generation that kept its parent would get the
+    previous generation's mutants back from the cache.
+    """
+    new_population = Population(survivors)
     attempts = 0
     
+    # Pick the fittest survivor as parent
+    parent = new_population.best()
+    if generation is None and parent is not None:
+        generation = parent.generation
+    if _speculation and parent is not None and len(new_population) < target_population_size:
+        return _mutate_pipelined(new_population, parent, problem, target_population_size,
+                                 max_attempts, parallelism, generation)
+    
     while len(new_population) < target_population_size and attempts < max_attempts:
-        attempts += 1
-        print(f"\nMutation attempt {attempts}")
-        
-        # Pick the fittest survivor as parent
-        parent = max(survivors, key=lambda x: x['fitness'])
-        
-        # Progressive mutation strategies
-        if attempts == 1:
-            # Try to simplify existing solution
-            mutated_problem = f"Solve this problem in the simplest way possible: {problem}"
-        elif attempts == 2:
-            # Try alternative approach
-            mutated_problem, _ = mutate_problem(problem, mutation_type="rephrase")
-        else:
-            # Completely different approach
-            mutated_problem = f"Write the shortest possible solution for: {problem}"
+        batch = []
+        for _ in range(min(target_population_size - len(new_population), max_attempts - attempts)):
+            attempts += 1
+            print(f"\nMutation attempt {attempts}")
+            
+            temperature = 0.3 + (attempts * 0.1)  # Smaller temperature increments
+            mutated_solution = generate_solution(mutation_prompt(problem, attempts, generation),
+                                                 temperature=temperature,
+                                                 sample=generation)
+            if mutated_solution:
+                mutant = Candidate(mutated_solution, generation=parent.generation + 1)
+                if mutant not in new_population:
+                    batch.append(mutant)
         
-        temperature = 0.3 + (attempts * 0.1)  # Smaller temperature increments
-        mutated_solution = generate_solution(mutated_problem, temperature=temperature)
+        for _ in evaluate_population(batch, problem, parallelism):
+            pass
         
-        if mutated_solution:
-            file_path = save_solution(mutated_solution)
-            fitness = evaluate_fitness(file_path, problem)
-            
-            # Only accept if it's simpler (higher fitness)
-            if fitness > parent['fitness']:
-                new_population.append({
-                    'code': mutated_solution,
-                    'file_path': file_path,
-                    'fitness': fitness,
-                    'generation': parent['generation'] + 1
-                })
-                print(f"Added improved solution with fitness {fitness}")
+        # Accept in attempt order, only if it's simpler (higher fitness)
+        for mutant in batch:
+            if len(new_population) >= target_population_size:
+                break
+            if mutant.fitness > parent.fitness and new_population.add(mutant):
+                print(f"Added improved solution with fitness {mutant.fitness}")
             else:
                 print("Solution not better than parent, trying again...")
     
     return new_population if new_population else survivors
 
-def build_docker_image():
-    """Build the Docker image for code execution."""
+# Files the sandbox image is built from, and the label recording their hash
+IMAGE_FILES = ("Dockerfile", ".dockerignore")
+FINGERPRINT_LABEL = "pmp.fingerprint"
+
+def image_fingerprint(files=IMAGE_FILES):
+    """Hash of the files the sandbox image is built from."""
+    digest = hashlib.sha256()
+    for path in files:
+        digest.update(path.encode("utf-8") + b"\0")
+        if os.path.exists(path):
+            with open(path, "rb") as file:
+                digest.update(file.read())
+    return digest.hexdigest()[:16]
+
+def build_docker_image(force=False):
+    """Build the Docker image for code execution, unless it is already up to date.
+
+    The image is labelled with the hash of the files it was built from, so
+    launches after the first skip the build until one of them changes.
+    """
+    fingerprint = image_fingerprint()
     try:
+        if not force:
+            current = subprocess.run(
+                ["docker", "image", "inspect", "--format",
+                 f'{{{{ index .Config.Labels "{FINGERPRINT_LABEL}" }}}}', IMAGE],
+                capture_output=True, text=True
+            )
+            if current.returncode == 0 and current.stdout.strip() == fingerprint:
+                return True
         subprocess.run(
-            ["docker", "build", "-t", "code-runner", "."],
+            ["docker", "build", "--label", f"{FINGERPRINT_LABEL}={fingerprint}", "-t", IMAGE, "."],
             check=True,
             capture_output=True
         )
@@ -198,59 +567,38 @@ def build_docker_image():
         print(f"Failed to build Docker image: {e}")
         return False
 
+_timing_runs = 1
+
+def configure_timing(runs=1):
+    """Runs each working candidate `runs` times and keeps the median timings."""
+    global _timing_runs
+    _timing_runs = max(1, runs)
+
+@traced()
+def execute_code(code):
+    """Run code in the configured sandbox, returns an ExecutionResult."""
+    sandbox = get_sandbox()
+    annotate(backend=sandbox.name)
+    return run_repeated(sandbox, code, _timing_runs)
+
+@traced()
 def execute_solution_safely(file_path):
-    """Execute solution in isolated container."""
-    container_name = f"code_runner_{uuid.uuid4().hex}"
-    
+    """Execute solution in an isolated sandbox (warm container pool or subprocess)."""
     try:
-        # Docker run with strict security constraints
-        docker_cmd = [
-            "docker", "run",
-            "--name", container_name,
-            "--rm",  # Remove container after execution
-            "--network", "none",  # No network access
-            "--memory", "100m",  # Limited memory
-            "--cpus", "0.5",  # Limited CPU
-            "--pids-limit", "50",  # Limited processes
-            "--ulimit", "nofile=64:64",  # Limited file descriptors
-            "--security-opt", "no-new-privileges",  # No privilege escalation
-            "-v", f"{os.path.abspath(file_path)}:/app/run/code.py:ro",  # Read-only mount
-            "code-runner",
-            "python", "-I", "/app/run/code.py"
-        ]
-        
-        result = subprocess.run(
-            docker_cmd,
-            capture_output=True,
-            text=True,
-            timeout=10
-        )
-        
-        return result.stdout.strip(), result.returncode == 0
-        
+        with open(file_path, "r", encoding="utf-8") as f:
+            code = f.read()
+        result = execute_code(code)
+        return result.stdout, result.success
     except Exception as e:
-        print(f"Docker execution failed: {e}, falling back to subprocess")
-        try:
-            # Fallback to subprocess with basic isolation
-            result = subprocess.run(
-                ["python", "-I", file_path],  # Isolated mode
-                capture_output=True,
-                text=True,
-                timeout=2
-            )
-            return result.stdout.strip(), result.returncode == 0
-        except Exception as sub_e:
-            return str(sub_e), False
-    finally:
-        # Always clean up container
-        try:
-            subprocess.run(["docker", "rm", "-f", container_name], 
-                         capture_output=True)
-        except:
-            pass
+        print(f"Sandbox execution failed: {e}")
+        return str(e), False
 
 def check_docker_status():
-    """Check if Docker daemon is running and accessible."""
+    """Check if Docker daemon is running and accessible.
+
+    The base image is only pulled by a build that needs it, so an
+    up-to-date image makes no network calls at start-up.
+    """
     try:
         # Check Docker daemon
         subprocess.run(
@@ -258,77 +606,446 @@ def check_docker_status():
             check=True,
             capture_output=True
         )
-        
-        # Try to pull base image
-        subprocess.run(
-            ["docker", "pull", "python:3.9-slim"],
-            check=True,
-            capture_output=True
-        )
-        
         return True
     except subprocess.CalledProcessError:
         return False
     except FileNotFoundError:  # Docker not installed
         return False
 
-def main():
-    # Check Docker status first
-    docker_available = check_docker_status()
-    if docker_available:
-        if build_docker_image():
-            print("Docker environment ready")
-        else:
-            print("WARNING: Docker available but build failed, using subprocess fallback")
-    else:
-        print("WARNING: Docker not available, using subprocess fallback")
-    
-    problems = load_problems()
-    generations = 3
+def problem_seed(problem):
+    """Stable per-problem seed so results don't depend on scheduling order."""
+    return int(hashlib.sha256(problem.encode("utf-8")).hexdigest()[:16], 16)
+
+def record_best(problem, best_fitness, best_solution, leaderboard_file=DEFAULT_LEADERBOARD):
+    """Archive a problem's best solution and record it on the leaderboard.
+
+    Without a persistent archive the winner is saved as its own file, so the
+    leaderboard never points into a database that is gone after the run.
+    """
+    solution_ref, = _archive.store(problem, [best_solution], role="winner")
+    if not _archive.persistent:
+        solution_ref = save_solution(best_solution.code)
+    if _reuse is not None:
+        _reuse.add(problem, best_solution.code, best_fitness)
+    update_leaderboard(problem, best_fitness,
+                     solution_ref,
+                     mutation_used=(best_solution.generation > 1),
+                     leaderboard_file=leaderboard_file)
+
+def process_problem(problem, generations=3, leaderboard_file=DEFAULT_LEADERBOARD,
+                    journal=None, key=None):
+    """Evolve solutions for a single problem, returns the best one (or None).
+
+    With a checkpoint journal, the population is recorded after every
+    generation and an unfinished problem resumes from its last record.
+    Each generation's survivors go to the solution archive in one write.
+    With reuse configured, the first population is generated with
+    solutions of similar problems in the prompt.
+    """
+    print(f"\nProcessing problem: {problem}")
+    state = journal.state(key) if journal else None
     
-    for problem in problems:
-        print(f"\nProcessing problem: {problem}")
-        
-        population = generate_population(problem)
+    if state:
+        print(f"Resuming from checkpoint at generation {state['generation'] + 1}")
+        population = Population(Candidate.from_dict(record) for record in state['population'])
+        best_fitness = state['best_fitness']
+        best_solution = Candidate.from_dict(state['best_solution']) if state['best_solution'] else None
+        start_gen = state['generation']
+    else:
+        rng = random.Random(problem_seed(problem))
+        population = generate_population(reuse_prompt(problem), rng=rng)
         if not population:
-            continue
-        
+            return None
         best_fitness = 0
         best_solution = None
+        start_gen = 0
+        if journal:
+            journal.record_generation(key, 0, population.to_list(), best_fitness, None)
+    
+    for gen in range(start_gen, generations):
+        print(f"\nGeneration {gen + 1}")
         
-        for gen in range(generations):
-            print(f"\nGeneration {gen + 1}")
-            
-            survivors = select_survivors(population, problem)
-            if not survivors:
-                if best_solution:
-                    survivors = [best_solution]
-                else:
-                    break
-            
-            # Log results and update best
-            for solution in survivors:
-                print(f"Solution fitness: {solution['fitness']}")
-                if solution['fitness'] > best_fitness:
-                    best_fitness = solution['fitness']
-                    best_solution = solution
-            
-            if best_fitness >= 90:
-                print(f"Found excellent solution with fitness {best_fitness}")
-                update_leaderboard(problem, best_fitness, 
-                                 best_solution['file_path'], 
-                                 mutation_used=(best_solution['generation'] > 1))
+        survivors = select_survivors(population, problem)
+        if not survivors:
+            if best_solution:
+                survivors = Population([best_solution])
+            else:
                 break
-            
-            population = mutate_survivors(survivors, problem)
-            
-        # Save best solution even if not perfect
-        if best_solution:
-            update_leaderboard(problem, best_fitness,
-                             best_solution['file_path'],
-                             mutation_used=(best_solution['generation'] > 1))
+        _archive.store(problem, survivors)
+        
+        # Log results and update best
+        for solution in survivors:
+            print(f"Solution fitness: {solution.fitness}")
+            if solution.fitness > best_fitness:
+                best_fitness = solution.fitness
+                best_solution = solution
+        
+        if best_fitness >= EARLY_STOP_FITNESS:
+            print(f"Found excellent solution with fitness {best_fitness}")
+            break
         
-        time.sleep(5)  # Rate limiting cooldown
+        population = mutate_survivors(survivors, problem, generation=gen + 1)
+        if journal:
+            journal.record_generation(key, gen + 1, population.to_list(), best_fitness,
+                                      best_solution.to_dict() if best_solution else None)
+        
+    # Save best solution even if not perfect
+    if best_solution:
+        record_best(problem, best_fitness, best_solution, leaderboard_file)
+    return best_solution
+
+def iter_results(records, workers=1, rate_per_minute=12, generations=3,
+                 leaderboard_file=DEFAULT_LEADERBOARD, journal=None):
+    """Process ProblemRecords over a bounded worker pool, yielding (record, best).
+
+    Problem starts are paced by a token bucket (replacing the old fixed
+    cooldown), at most `workers` problems evolve at once, results come back
+    in input order, and only a small window of the source is held in
+    memory. Problems the journal marks as done are skipped.
+    """
+    workers = max(1, workers)
+    bucket = TokenBucket(rate_per_minute / 60.0, capacity=workers) if rate_per_minute else None
+    
+    def worker(record):
+        key = problem_key(record.index, record.problem)
+        if bucket:
+            bucket.acquire()
+        try:
+            best = process_problem(record.problem, generations=generations,
+                                   leaderboard_file=leaderboard_file,
+                                   journal=journal, key=key)
+        except Exception as e:
+            print(f"Processing failed for '{record.problem}': {e}")
+            return None
+        if journal:
+            journal.record_done(key, record.index, best.fitness if best else 0,
+                                best.to_dict() if best else None,
+                                next_offset=record.next_offset)
+        return best
+    
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for record in records:
+            if journal and journal.is_done(problem_key(record.index, record.problem)):
+                continue
+            pending.append((record, pool.submit(worker, record)))
+            if len(pending) >= 2 * workers:
+                record, future = pending.popleft()
+                yield record, future.result()
+        while pending:
+            record, future = pending.popleft()
+            yield record, future.result()
+
+def run_problems(problems, workers=1, rate_per_minute=12, generations=3,
+                 leaderboard_file=DEFAULT_LEADERBOARD, journal=None, collect=True):
+    """Process problems (strings or ProblemRecords) and report throughput.
+
+    Returns the best solution per problem in input order, or just the number
+    of problems processed when collect is False (for unbounded streams).
+    """
+    records = (
+        problem if isinstance(problem, ProblemRecord) else ProblemRecord(index, problem, None)
+        for index, problem in enumerate(problems)
+    )
+    results = []
+    count = 0
+    start = time.perf_counter()
+    for _, best in iter_results(records, workers, rate_per_minute, generations,
+                                leaderboard_file, journal):
+        count += 1
+        if collect:
+            results.append(best)
+    elapsed = time.perf_counter() - start
+    
+    throughput = count / (elapsed / 60.0) if elapsed > 0 else 0.0
+    print(f"\nProcessed {count} problems in {elapsed:.1f}s "
+          f"({throughput:.2f} problems/min, {max(1, workers)} workers)")
+    return results if collect else count
+
+def enqueue_problems(queue, records, generations=3, queued=None):
+    """Queues one problem job per ProblemRecord (or string); returns how many were read.
+
+    Jobs are keyed like checkpoint entries, so re-running the coordinator
+    on the same source doesn't queue a problem twice. queued, if given,
+    collects job id -> problem.
+    """
+    count = 0
+    for index, record in enumerate(records):
+        if not isinstance(record, ProblemRecord):
+            record = ProblemRecord(index, record, None)
+        job_id = queue.put("problem", {"index": record.index, "problem": record.problem,
+                                       "generations": generations},
+                           key=problem_key(record.index, record.problem))
+        if queued is not None:
+            queued[job_id] = record.problem
+        count += 1
+    return count
+
+def collect_results(queue, queued, leaderboard_file=DEFAULT_LEADERBOARD):
+    """Records the winners workers reported for queued problems; returns how many.
+
+    Workers on other hosts write their own leaderboard and archive, so the
+    coordinator archives and ranks every winner again from the job results.
+    """
+    recorded = 0
+    for job_id, problem in queued.items():
+        status, result = queue.result(job_id)
+        if status == DONE and result["best_solution"]:
+            record_best(problem, result["best_fitness"], Candidate.from_dict(result["best_solution"]),
+                        leaderboard_file)
+            recorded += 1
+    return recorded
+
+def wait_for_queue(queue, poll_interval=5.0):
+    """Blocks until no problem job is pending or leased, printing progress; returns the counts."""
+    last = None
+    while True:
+        counts = queue.counts("problem")
+        if counts != last:
+            print("Queue: " + ", ".join(f"{counts.get(status, 0)} {status}"
+                                        for status in (PENDING, LEASED, DONE, FAILED)))
+            last = counts
+        if not counts.get(PENDING) and not counts.get(LEASED):
+            return counts
+        time.sleep(poll_interval)
+
+def run_job(job, leaderboard_file=DEFAULT_LEADERBOARD):
+    """Runs one queued job and returns its JSON result."""
+    if job.kind == "evaluate":
+        return {"metrics": measure(job.payload["code"], job.payload["problem"])}
+    best = process_problem(job.payload["problem"], generations=job.payload["generations"],
+                           leaderboard_file=leaderboard_file)
+    return {"best_fitness": best.fitness if best else 0,
+            "best_solution": best.to_dict() if best else None}
+
+def _keep_leased(queue, job, stop):
+    while not stop.wait(queue.lease_seconds / 3):
+        if not queue.heartbeat(job):
+            print(f"Lost the lease on job {job.id}, another worker will retry it")
+            return
+
+def run_leased(queue, job, leaderboard_file=DEFAULT_LEADERBOARD):
+    """Runs a leased job, renewing its lease meanwhile; True if its result was stored.
+
+    A job that raises is released for another attempt. A transient
+    evaluation (timeout, sandbox failure) is handed to its waiters but not
+    kept under the job's key, like measure() keeps it out of the cache.
+    """
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_keep_leased, args=(queue, job, stop), daemon=True)
+    heartbeat.start()
+    try:
+        result = run_job(job, leaderboard_file)
+    except Exception as e:
+        print(f"Job {job.id} ({job.kind}) failed: {e}")
+        queue.fail(job, e)
+        return False
+    finally:
+        stop.set()
+        heartbeat.join()
+    transient = job.kind == "evaluate" and result["metrics"].get("transient", False)
+    return queue.complete(job, result, keep_key=not transient)
+
+def run_worker(queue, workers=1, leaderboard_file=DEFAULT_LEADERBOARD, poll_interval=1.0,
+               exit_when_idle=True):
+    """Leases and runs queued jobs on `workers` threads; returns the number completed.
+
+    Evaluation jobs are taken before problem jobs, since other workers are
+    waiting on them. Each running job's lease is renewed by a heartbeat;
+    a job that raises is released for another attempt. With exit_when_idle
+    the worker stops once nothing is pending or leased anywhere, so it
+    also picks up jobs orphaned by crashed workers when their lease expires.
+    """
+    def loop():
+        completed = 0
+        while True:
+            job = queue.lease(worker_name(), kinds=("evaluate", "problem"))
+            if job is None:
+                counts = queue.counts()
+                if exit_when_idle and not counts.get(PENDING) and not counts.get(LEASED):
+                    return completed
+                time.sleep(poll_interval)
+                continue
+            completed += run_leased(queue, job, leaderboard_file)
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        completed = sum(future.result() for future in [pool.submit(loop) for _ in range(max(1, workers))])
+    print(f"\nWorker completed {completed} jobs in {time.perf_counter() - start:.1f}s")
+    return completed
+
+DEFAULT_FITNESS_CACHE_PATH = ".cache/fitness.db"
+DEFAULT_CHECKPOINT_PATH = ".cache/checkpoint.jsonl"
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Evolve solutions for a problems file.")
+    parser.add_argument("--problems", default="problems/problems.txt",
+                        help="Problems source: text file (one per line), .jsonl file, or - for stdin")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of problems evolved concurrently")
+    parser.add_argument("--rate", type=float, default=12,
+                        help="Maximum problem starts per minute (0 disables pacing)")
+    parser.add_argument("--generations", type=int, default=3)
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT_PATH,
+                        help="Checkpoint journal recording per-problem and per-generation progress")
+    parser.add_argument("--resume", action="store_true",
+                        help="Resume from the checkpoint journal instead of starting over")
+    parser.add_argument("--leaderboard", default=DEFAULT_LEADERBOARD,
+                        help="Leaderboard store (SQLite)")
+    parser.add_argument("--archive", default=DEFAULT_ARCHIVE,
+                        help="SQLite archive holding every generation's survivors and the winners")
+    parser.add_argument("--export-yaml", default="leaderboard.yaml",
+                        help="Export the leaderboard to this YAML file after the run (empty to skip)")
+    parser.add_argument("--queue", default=None,
+                        help="Job queue: SQLite file shared by processes on this host, or the "
+                             "http://host:port of a queue server (cli.py serve-queue) for several hosts")
+    parser.add_argument("--role", choices=("coordinator", "worker"), default=None,
+                        help="With --queue: coordinator queues the problems and waits, worker runs jobs")
+    parser.add_argument("--lease", type=float, default=60,
+                        help="Seconds a queued job stays leased without a heartbeat before it is retried")
+    parser.add_argument("--remote-eval", action="store_true",
+                        help="Workers also spread population evaluations over the queue")
+    parser.add_argument("--sandbox", choices=sorted(BACKENDS), default="docker-pool",
+                        help="Execution backend for candidate code")
+    parser.add_argument("--pool-size", type=int, default=None,
+                        help="Warm containers in the docker-pool sandbox (default: one per 0.5 CPU)")
+    parser.add_argument("--llm-backend", choices=sorted(LLM_BACKENDS),
+                        default=os.getenv("LLM_BACKEND", "azure"),
+                        help="LLM backend: azure, openai (any compatible server) or local (offline stand-in)")
+    parser.add_argument("--cache", choices=CACHE_MODES, default=os.getenv("LLM_CACHE", "on"),
+                        help="LLM response cache: off, on, or replay (offline, cache only)")
+    parser.add_argument("--cache-path", default=os.getenv("LLM_CACHE_PATH", DEFAULT_CACHE_PATH))
+    parser.add_argument("--no-prescreen", action="store_true",
+                        help="Send every candidate to the sandbox without static checks or AST dedup")
+    parser.add_argument("--prescreen-dry-run", action="store_true",
+                        help="Also dry-run candidates on the host under tight rlimits before the sandbox")
+    parser.add_argument("--no-batch", action="store_true",
+                        help="Request population candidates one at a time instead of with `n`")
+    parser.add_argument("--speculation", type=int, default=0,
+                        help="Mutation requests kept in flight while earlier mutants run in the sandbox "
+                             "(0 generates and evaluates in phased rounds)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream single-solution requests and abandon them as soon as the code goes wrong")
+    parser.add_argument("--fitness-weights", default=os.getenv("FITNESS_WEIGHTS", "length"),
+                        help="Fitness weights: a preset (length, kolmogorov, fast, efficient) or "
+                             "metric=weight,... over length, compressed, success, runtime, cpu_time, "
+                             "peak_rss, output_bytes, output_ok")
+    parser.add_argument("--reuse", type=int, default=0,
+                        help="Show up to N archived solutions of similar problems as examples when generating")
+    parser.add_argument("--timing-runs", type=int, default=1,
+                        help="Runs per working candidate; timing metrics use the median")
+    parser.add_argument("--selection", choices=SELECTIONS, default="truncate",
+                        help="Survivor selection: top-k, tournament, or NSGA-style multi-objective")
+    parser.add_argument("--trace-file", default=None,
+                        help="Append one JSON line per pipeline span to this file")
+    parser.add_argument("--metrics-file", default=None,
+                        help="Write Prometheus text-format metrics here at the end of the run")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Serve live Prometheus metrics on this port")
+    parser.add_argument("--fitness-cache", default=os.getenv("FITNESS_CACHE_PATH", DEFAULT_FITNESS_CACHE_PATH),
+                        help="Persistent fitness cache file (empty string keeps it in memory)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    load_environment()  # Before parsing: option defaults come from the environment
+    args = parse_args(argv)
+    if bool(args.role) != bool(args.queue):
+        raise SystemExit("--queue and --role (coordinator or worker) go together")
+    if args.role != "worker" and args.export_yaml:
+        import_legacy_leaderboard(args.leaderboard, args.export_yaml)
+    queue = open_queue(args.queue, lease_seconds=args.lease) if args.queue else None
+    
+    if args.role == "coordinator":
+        queued = {}
+        count = enqueue_problems(queue, stream_problems(args.problems), args.generations, queued)
+        print(f"Queued {count} problems in {args.queue}")
+        counts = wait_for_queue(queue)
+        configure_archive(args.archive)
+        try:
+            collect_results(queue, queued, args.leaderboard)
+        finally:
+            queue.close()
+            _archive.close()
+        if args.export_yaml:
+            export_leaderboard(args.leaderboard, args.export_yaml)
+        return counts
+    
+    # Check Docker status first
+    sandbox_backend = args.sandbox
+    if sandbox_backend != "subprocess":
+        docker_available = check_docker_status()
+        if docker_available and build_docker_image():
+            print("Docker environment ready")
+        else:
+            if docker_available:
+                print("WARNING: Docker available but build failed, using subprocess fallback")
+            else:
+                print("WARNING: Docker not available, using subprocess fallback")
+            sandbox_backend = "subprocess"
+    options = {}
+    if sandbox_backend == "docker-pool":
+        options["size"] = args.pool_size
+    configure_sandbox(sandbox_backend, **options)
+    
+    if args.trace_file:
+        tracer.open_trace(args.trace_file)
+    if args.metrics_port:
+        tracer.serve_prometheus(args.metrics_port)
+    set_client(create_client(args.llm_backend))
+    configure_cache(args.cache, args.cache_path)
+    set_batch_generation(not args.no_batch)
+    set_streaming(args.stream)
+    configure_speculation(args.speculation)
+    configure_fitness_cache(args.fitness_cache)
+    configure_scoring(args.fitness_weights, args.selection)
+    configure_timing(args.timing_runs)
+    configure_archive(args.archive)
+    configure_reuse(args.reuse)
+    configure_prescreen(not args.no_prescreen, dry_run=args.prescreen_dry_run)
+    
+    if args.role == "worker":
+        if args.remote_eval:
+            configure_remote_evaluation(queue)
+        try:
+            results = run_worker(queue, workers=args.workers, leaderboard_file=args.leaderboard)
+        finally:
+            close_sandbox()
+            queue.close()
+            _archive.close()
+    else:
+        journal = CheckpointJournal(args.checkpoint, source=args.problems, resume=args.resume)
+        start = journal.resume_point()
+        if start[0]:
+            print(f"Resuming after {start[0]} finished problems")
+        records = stream_problems(args.problems, start=start)
+        try:
+            results = run_problems(records, workers=args.workers, rate_per_minute=args.rate,
+                                   generations=args.generations, leaderboard_file=args.leaderboard,
+                                   journal=journal, collect=False)
+        finally:
+            close_sandbox()
+            journal.close()
+            _archive.close()
+    
+    if args.export_yaml:
+        export_leaderboard(args.leaderboard, args.export_yaml)
+    
+    stats = cache_stats()
+    if stats:
+        print(f"Response cache: {stats['hits']} hits, {stats['misses']} misses "
+              f"({stats['hit_rate']:.0%} hit rate, {stats['entries']} entries)")
+    stats = _fitness_cache.stats()
+    print(f"Fitness cache: {stats['hits']} container runs avoided "
+          f"({stats['hit_rate']:.0%} hit rate, {stats['entries']} entries)")
+    if _prescreener:
+        print(_prescreener.summary())
+    
+    print("\nHottest stages (inclusive time):")
+    print(tracer.format_summary())
+    if args.metrics_file:
+        tracer.write_prometheus(args.metrics_file)
+    tracer.close()
+    return results
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,430 @@
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from rate_limit import AdaptiveRateLimiter, CircuitBreaker, RequestScheduler
+from telemetry import annotate, incr
+
+SYSTEM_PROMPT = """You are an expert Python programmer focused on generating clean, correct code.
+Rules:
+1. Always use 4-space indentation
+2. Initialize all variables
+3. Include complete function definitions
+4. Test the code with example inputs
+5. Return only valid Python code
+6. No explanatory text or comments
+7. No markdown formatting"""
+
+# Built once and shared by every payload
+SYSTEM_MESSAGE = {"role": "system", "content": [{"type": "text", "text": SYSTEM_PROMPT}]}
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_TIMEOUT = (5, 60)  # (connect, read) seconds
+STREAM_CHUNK_CHARS = 16  # Roughly four tokens per streamed delta from the local backend
+
+
+class LatencyStats:
+    """Thread-safe record of request latencies."""
+
+    def __init__(self, max_samples=10000):
+        self.max_samples = max_samples
+        self._samples = []
+        self._count = 0
+        self._total = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._count += 1
+            self._total += seconds
+            self._samples.append(seconds)
+            if len(self._samples) > self.max_samples:
+                del self._samples[:len(self._samples) - self.max_samples]
+
+    def summary(self):
+        """Returns count, mean, p50, p95 and max latency in seconds."""
+        with self._lock:
+            samples = sorted(self._samples)
+            count, total = self._count, self._total
+        if not samples:
+            return {"count": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+
+        def percentile(p):
+            return samples[min(len(samples) - 1, int(p * len(samples)))]
+
+        return {
+            "count": count,
+            "mean": total / count,
+            "p50": percentile(0.50),
+            "p95": percentile(0.95),
+            "max": samples[-1],
+        }
+
+
+class ChatClient:
+    """Keep-alive HTTP client for an Azure OpenAI chat-completions deployment.
+
+    This is the "azure" backend; other backends share its interface:
+    complete(), stream(), close() and a `stats` LatencyStats.
+    """
+
+    name = "azure"
+
+    def __init__(self, endpoint=None, api_key=None, pool_size=None, timeout=None, scheduler=None):
+        self.endpoint = endpoint or self.default_endpoint()
+        self.timeout = timeout or _env_timeout()
+        self.scheduler = scheduler or get_scheduler()
+        pool_size = pool_size or int(os.getenv("LLM_POOL_SIZE", DEFAULT_POOL_SIZE))
+
+        import requests  # Only HTTP backends pay for importing requests
+        from requests.adapters import HTTPAdapter
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["Content-Type"] = "application/json"
+        self.session.headers.update(self.auth_headers(api_key))
+        self.stats = LatencyStats()
+
+    def default_endpoint(self):
+        return os.getenv("AZURE_ENDPOINT")
+
+    def auth_headers(self, api_key):
+        return {"api-key": api_key or os.getenv("AZURE_API_KEY") or ""}
+
+    def build_payload(self, prompt, temperature=0.3, top_p=1, max_tokens=800, n=1):
+        payload = {
+            "messages": [
+                SYSTEM_MESSAGE,
+                {"role": "user", "content": [{"type": "text", "text": prompt}]}
+            ],
+            "temperature": temperature,
+            "top_p": top_p,
+            "max_tokens": max_tokens
+        }
+        if n > 1:
+            payload["n"] = n  # Several candidates in one round trip
+        return payload
+
+    def _post(self, payload):
+        start = time.perf_counter()
+        try:
+            return self.session.post(self.endpoint, json=payload, timeout=self.timeout)
+        finally:
+            self.stats.record(time.perf_counter() - start)
+
+    def complete(self, prompt, temperature=0.3, top_p=1, max_tokens=800, n=1, max_attempts=None):
+        """Sends a chat completion request, returns the decoded JSON body.
+
+        Rate limiting, retries and backoff are handled by the shared
+        scheduler; an error status left after the last attempt raises
+        requests.HTTPError.
+        """
+        payload = self.build_payload(prompt, temperature, top_p, max_tokens, n)
+        estimated_tokens = (len(SYSTEM_PROMPT) + len(prompt)) // 4 + max_tokens * n
+        response = self.scheduler.execute(lambda: self._post(payload), tokens=estimated_tokens,
+                                          max_attempts=max_attempts)
+        response.raise_for_status()
+        return response.json()
+
+    def stream(self, prompt, temperature=0.3, top_p=1, max_tokens=800, max_attempts=None):
+        """Yields the completion text delta by delta as server-sent events arrive.
+
+        Closing the generator early closes the connection, so the endpoint
+        stops generating (and billing) the rest of the completion.
+        """
+        payload = self.build_payload(prompt, temperature, top_p, max_tokens)
+        payload["stream"] = True
+        estimated_tokens = (len(SYSTEM_PROMPT) + len(prompt)) // 4 + max_tokens
+        start = time.perf_counter()
+        response = self.scheduler.execute(
+            lambda: self.session.post(self.endpoint, json=payload, timeout=self.timeout, stream=True),
+            tokens=estimated_tokens, max_attempts=max_attempts)
+        try:
+            response.raise_for_status()
+            response.encoding = "utf-8"  # SSE is UTF-8; without a charset requests would assume ISO-8859-1
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                for choice in json.loads(data).get("choices", []):
+                    content = (choice.get("delta") or {}).get("content")
+                    if content:
+                        yield content
+        finally:
+            response.close()
+            self.stats.record(time.perf_counter() - start)
+
+    def close(self):
+        self.session.close()
+
+
+class OpenAIChatClient(ChatClient):
+    """The "openai" backend: any OpenAI-compatible /chat/completions server.
+
+    endpoint is the API base URL (OPENAI_BASE_URL, e.g. a local vLLM or
+    llama.cpp server); the model comes from OPENAI_MODEL.
+    """
+
+    name = "openai"
+
+    def __init__(self, endpoint=None, api_key=None, model=None, **options):
+        self.model = model or os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+        super().__init__(endpoint, api_key, **options)
+        if not self.endpoint.rstrip("/").endswith("/chat/completions"):
+            self.endpoint = self.endpoint.rstrip("/") + "/chat/completions"
+
+    def default_endpoint(self):
+        return os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+
+    def auth_headers(self, api_key):
+        return {"Authorization": f"Bearer {api_key or os.getenv('OPENAI_API_KEY') or ''}"}
+
+    def build_payload(self, prompt, temperature=0.3, top_p=1, max_tokens=800, n=1):
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": temperature,
+            "top_p": top_p,
+            "max_tokens": max_tokens
+        }
+        if n > 1:
+            payload["n"] = n
+        return payload
+
+
+def _numbers(text):
+    return [float(value) if "." in value else int(value) for value in re.findall(r"\d+(?:\.\d+)?", text)]
+
+
+# (keywords, [solution templates from verbose to terse]); {a}/{b} are numbers from the problem
+LOCAL_TEMPLATES = [
+    (("prime",), [
+        "def largest_prime(limit):\n    for candidate in range(limit - 1, 1, -1):\n"
+        "        is_prime = True\n        for divisor in range(2, int(candidate ** 0.5) + 1):\n"
+        "            if candidate % divisor == 0:\n                is_prime = False\n                break\n"
+        "        if is_prime:\n            print(candidate)\n            return\n\nlargest_prime({a})",
+        "print(max(i for i in range(2, {a}) if all(i % d for d in range(2, i))))",
+    ]),
+    (("celsius",), [
+        "def celsius_to_fahrenheit(celsius):\n    fahrenheit = celsius * 9 / 5 + 32\n    print(fahrenheit)\n\n"
+        "celsius_to_fahrenheit({a})",
+        "print({a} * 9 / 5 + 32)",
+    ]),
+    (("circle",), [
+        "import math\n\ndef circle_area(radius):\n    area = math.pi * radius ** 2\n    print(area)\n\ncircle_area({a})",
+        "print(3.14159 * {a} ** 2)",
+    ]),
+    (("cube", "volume"), [
+        "def cube_volume(side):\n    volume = side ** 3\n    print(volume)\n\ncube_volume({a})",
+        "print({a} ** 3)",
+    ]),
+    (("x +", "equation"), [
+        "def solve_equation(addend, total):\n    x = total - addend\n    print(x)\n\nsolve_equation({a}, {b})",
+        "print({b} - {a})",
+    ]),
+]
+LOCAL_FALLBACK = [
+    "def solve_problem(value):\n    result = value\n    print(result)\n\nsolve_problem({a})",
+    "print({a})",
+]
+LOCAL_REPHRASE = "Write a program that solves the following task and prints the result: {problem} Example: run it with no input and it prints the answer."
+
+
+class LocalChatClient:
+    """The "local" backend: an in-process, deterministic stand-in model.
+
+    Solutions are synthesized from keyword templates filled with numbers
+    from the problem, picked by a generator seeded from the request, so the
+    same request always gets the same answer and no network is touched.
+    latency (+ up to jitter) seconds are slept per request to emulate a
+    real endpoint; error_rate is the share of choices returned as invalid
+    Python, to exercise validation.
+    """
+
+    name = "local"
+
+    def __init__(self, latency=None, jitter=0.0, error_rate=0.0, seed=0, sleep=time.sleep):
+        self.latency = float(os.getenv("LLM_LOCAL_LATENCY", 0)) if latency is None else latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.seed = seed
+        self.requests = 0
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self.stats = LatencyStats()
+
+    def _rng(self, prompt, temperature, top_p, n):
+        digest = hashlib.sha256(f"{self.seed}|{temperature}|{top_p}|{n}|{prompt}".encode("utf-8")).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    def synthesize(self, prompt, rng):
+        """One completion for prompt."""
+        match = re.search(r'"([^"]*)"', prompt)
+        problem = match.group(1) if match else prompt
+        if prompt.startswith("Rephrase"):
+            return LOCAL_REPHRASE.format(problem=problem)
+        if rng.random() < self.error_rate:
+            return "def solve(:\n    print("
+        lowered = problem.lower()
+        templates = next((options for keywords, options in LOCAL_TEMPLATES
+                          if any(keyword in lowered for keyword in keywords)), LOCAL_FALLBACK)
+        numbers = _numbers(problem) + [2, 10]
+        return rng.choice(templates).format(a=numbers[0], b=numbers[1])
+
+    def complete(self, prompt, temperature=0.3, top_p=1, max_tokens=800, n=1, max_attempts=None):
+        """Returns a chat-completions shaped body with n choices."""
+        start = time.perf_counter()
+        rng = self._rng(prompt, temperature, top_p, n)
+        contents = [self.synthesize(prompt, rng) for _ in range(n)]
+        delay = self.latency + (rng.uniform(0, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            self._sleep(delay)
+        with self._lock:
+            self.requests += 1
+        self.stats.record(time.perf_counter() - start)
+        prompt_tokens = (len(SYSTEM_PROMPT) + len(prompt)) // 4
+        completion_tokens = sum(len(content) for content in contents) // 4
+        return {
+            "choices": [
+                {"index": index, "message": {"role": "assistant", "content": content},
+                 "finish_reason": "stop"}
+                for index, content in enumerate(contents)
+            ],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+    def stream(self, prompt, temperature=0.3, top_p=1, max_tokens=800, max_attempts=None):
+        """Yields the same completion complete() would give, in small deltas.
+
+        The request latency is spread over the deltas, so abandoning a
+        stream early also saves the remaining simulated time.
+        """
+        start = time.perf_counter()
+        rng = self._rng(prompt, temperature, top_p, 1)
+        content = self.synthesize(prompt, rng)
+        delay = self.latency + (rng.uniform(0, self.jitter) if self.jitter else 0)
+        pieces = [content[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(content), STREAM_CHUNK_CHARS)]
+        with self._lock:
+            self.requests += 1
+        try:
+            for piece in pieces:
+                if delay > 0:
+                    self._sleep(delay / len(pieces))
+                yield piece
+        finally:
+            self.stats.record(time.perf_counter() - start)
+
+    def close(self):
+        pass
+
+
+BACKENDS = {
+    "azure": ChatClient,
+    "openai": OpenAIChatClient,
+    "local": LocalChatClient,
+}
+
+_environment_loaded = False
+
+def load_environment():
+    """Loads variables from a .env file into os.environ, once per process."""
+    global _environment_loaded
+    if not _environment_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _environment_loaded = True
+
+def create_client(backend=None, **options):
+    """Builds a client for backend (default: LLM_BACKEND, else azure)."""
+    load_environment()
+    backend = backend or os.getenv("LLM_BACKEND") or "azure"
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend '{backend}', expected one of {sorted(BACKENDS)}")
+    return BACKENDS[backend](**options)
+
+
+def _env_timeout():
+    """Reads LLM_CONNECT_TIMEOUT / LLM_READ_TIMEOUT, falling back to defaults."""
+    connect = float(os.getenv("LLM_CONNECT_TIMEOUT", DEFAULT_TIMEOUT[0]))
+    read = float(os.getenv("LLM_READ_TIMEOUT", DEFAULT_TIMEOUT[1]))
+    return (connect, read)
+
+
+def _record_retry(attempt, reason, delay):
+    annotate(retries=attempt)
+    incr(reason)
+    if reason == "rate_limited":
+        print(f"Rate limited. Waiting {delay:.2f} seconds...")
+
+
+def _env_number(name, default=None):
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler():
+    """Returns the scheduler shared by every client in this process.
+
+    Budgets come from LLM_REQUESTS_PER_MINUTE / LLM_TOKENS_PER_MINUTE; set
+    LLM_RATE_STATE to a file path to share them across processes.
+    """
+    import requests
+
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            limiter = AdaptiveRateLimiter(
+                requests_per_minute=_env_number("LLM_REQUESTS_PER_MINUTE", 600),
+                tokens_per_minute=_env_number("LLM_TOKENS_PER_MINUTE"),
+                state_path=os.getenv("LLM_RATE_STATE") or None,
+            )
+            _scheduler = RequestScheduler(limiter, CircuitBreaker(),
+                                          max_attempts=int(_env_number("LLM_MAX_ATTEMPTS", 5)),
+                                          retry_exceptions=(requests.exceptions.ConnectionError,
+                                                            requests.exceptions.Timeout),
+                                          on_retry=_record_retry)
+        return _scheduler
+
+def set_scheduler(scheduler):
+    """Replaces the shared scheduler used by clients created afterwards."""
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = scheduler
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Returns the process-wide shared client, creating it on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = create_client()
+        return _client
+
+def set_client(client):
+    """Replaces the shared client (e.g. to change backend, pool size or endpoint)."""
+    global _client
+    with _client_lock:
+        if _client is not None and _client is not client:
+            _client.close()
+        _client = client
+
+def latency_stats():
+    """Latency summary for requests made through the shared client."""
+    return get_client().stats.summary()
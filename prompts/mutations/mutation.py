@@ -1,136 +1,373 @@
-import os
-import time
-import requests
-import random
-from dotenv import load_dotenv
+import io
+import tokenize
+import warnings
+from functools import lru_cache
+from cache import CacheMiss, DiskCache, make_key
+from complexity import MAX_REASONABLE_LENGTH, clean_code
+from prompts.mutations.client import SYSTEM_PROMPT, get_client
+from rate_limit import CircuitOpenError
+from telemetry import annotate, incr, span, traced
 
-# Load environment variables from .env file
-load_dotenv()
-API_KEY = os.getenv("AZURE_API_KEY")
-ENDPOINT = os.getenv("AZURE_ENDPOINT")
+DEFAULT_CACHE_PATH = ".cache/llm_responses.db"
+CACHE_MODES = ("off", "on", "replay")
 
+_response_cache = None
+_cache_mode = "off"
+
+def configure_cache(mode="on", path=DEFAULT_CACHE_PATH, **options):
+    """Enables the response cache.
+
+    mode is "off", "on" (read-through, store new responses) or "replay"
+    (serve only from the cache, never touch the network). Extra options
+    (max_entries, max_bytes, ttl) are passed to DiskCache.
+    """
+    global _response_cache, _cache_mode
+    if mode not in CACHE_MODES:
+        raise ValueError(f"Unknown cache mode '{mode}', expected one of {CACHE_MODES}")
+    if _response_cache is not None:
+        _response_cache.close()
+    _response_cache = DiskCache(path, **options) if mode != "off" else None
+    _cache_mode = mode
+    return _response_cache
+
+def cache_stats():
+    """Hit/miss counters for the response cache, or None when disabled."""
+    return _response_cache.stats() if _response_cache is not None else None
+
+def request_errors():
+    """Failures left over once the shared scheduler has exhausted its retries.
+
+    Evaluated in except clauses only when something was raised, so requests
+    is never imported by runs whose backend doesn't use it.
+    """
+    import requests
+    return (requests.exceptions.RequestException, CircuitOpenError)
+
+def http_error():
+    import requests
+    return requests.exceptions.HTTPError
+
+def _cache_key(prompt, mutation_type, temperature, n, top_p, max_tokens, sample):
+    fields = {"n": n} if n > 1 else {}
+    return make_key(SYSTEM_PROMPT, prompt, backend=get_client().name, mutation_type=mutation_type,
+                    temperature=round(temperature, 6), top_p=top_p,
+                    max_tokens=max_tokens, sample=sample, **fields)
+
+def request_completions(prompt, mutation_type, temperature, n=1, top_p=1, max_tokens=800, sample=0,
+                        max_attempts=None):
+    """Returns n completion texts from one request, served from the response cache when possible."""
+    with span("llm_request", mutation_type=mutation_type, n=n) as request_span:
+        if _response_cache is not None:
+            key = _cache_key(prompt, mutation_type, temperature, n, top_p, max_tokens, sample)
+            cached = _response_cache.get(key)
+            request_span.set(cache_hit=cached is not None)
+            if cached is not None:
+                return cached if n > 1 else [cached]
+            if _cache_mode == "replay":
+                raise CacheMiss(f"No cached response for {mutation_type} prompt (key {key[:12]})")
+
+        completion = get_client().complete(prompt, temperature=temperature, top_p=top_p,
+                                           max_tokens=max_tokens, n=n, max_attempts=max_attempts)
+        request_span.set(tokens=completion.get('usage', {}).get('total_tokens', 0))
+        contents = [choice['message']['content'] for choice in completion['choices']]
+        if _response_cache is not None:
+            _response_cache.set(key, contents if n > 1 else contents[0])
+        return contents
+
+def request_completion(prompt, mutation_type, temperature, top_p=1, max_tokens=800, sample=0,
+                       max_attempts=None):
+    """Returns the completion text, served from the response cache when possible."""
+    return request_completions(prompt, mutation_type, temperature, 1, top_p, max_tokens, sample,
+                               max_attempts)[0]
+
+@lru_cache(maxsize=None)
 def load_prompt(mutation_type="solve"):
     """Loads a mutation template prompt from the prompts folder."""
     prompt_path = f"prompts/mutations/{mutation_type}.txt"
     with open(prompt_path, "r") as file:
         return file.read()
 
-def mutate_problem(problem, mutation_type="rephrase", max_retries=5):
-    """Mutates a problem with exponential backoff for API calls."""
+@traced()
+def mutate_problem(problem, mutation_type="rephrase", max_retries=5, sample=0):
+    """Mutates a problem, with up to max_retries attempts through the shared scheduler.
+
+    `sample` distinguishes otherwise identical requests in the response cache.
+    """
     prompt_template = load_prompt(mutation_type)
     prompt = prompt_template.format(problem=problem)
 
-    headers = {
-        "Content-Type": "application/json",
-        "api-key": API_KEY,
-    }
-
-    payload = {
-        "messages": [
-            {"role": "system", "content": [{"type": "text", "text": """You are an expert Python programmer focused on generating clean, correct code.
-Rules:
-1. Always use 4-space indentation
-2. Initialize all variables
-3. Include complete function definitions
-4. Test the code with example inputs
-5. Return only valid Python code
-6. No explanatory text or comments
-7. No markdown formatting"""}]},
-            {"role": "user", "content": [{"type": "text", "text": prompt}]}
-        ],
-        "temperature": 0.7,  # Allow dynamic temperature
-        "top_p": 0.95,
-        "max_tokens": 800  # Allow dynamic max_tokens
-    }
-
-    for attempt in range(max_retries):
-        try:
-            response = requests.post(ENDPOINT, headers=headers, json=payload)
-            response.raise_for_status()
-            return response.json()['choices'][0]['message']['content'].strip(), mutation_type
-            
-        except requests.exceptions.HTTPError as e:
-            if e.response.status_code == 429:  # Too Many Requests
-                wait_time = (2 ** attempt) + random.uniform(0, 1)  # Add jitter
-                print(f"Rate limited. Waiting {wait_time:.2f} seconds...")
-                time.sleep(wait_time)
+    try:
+        content = request_completion(prompt, mutation_type, temperature=0.7, top_p=0.95,
+                                     sample=sample, max_attempts=max_retries)
+        return content.strip(), mutation_type
+        
+    except CacheMiss as e:
+        print(f"Replay cache miss: {e}")
+    except request_errors() as e:
+        print(f"API request failed: {e}")
+    return None, mutation_type
+
+def extract_code(content):
+    """Strips markdown from a completion and validates it as Python.
+
+    Raises SyntaxError or IndentationError for unusable code.
+    """
+    code = content.strip()
+    
+    # Remove markdown formatting if present
+    if "```python" in code or "```" in code:
+        code = code.replace("```python", "").replace("```", "").strip()
+
+    # Try to compile the code
+    compile(code, '<string>', 'exec')
+    
+    # Check indentation
+    lines = code.split('\n')
+    for i, line in enumerate(lines):
+        if line.strip():
+            # Skip top-level definitions
+            if line.startswith('def ') or line.startswith('import ') or line.startswith('from '):
                 continue
+                
+            # Check if line needs indentation
+            prev_line = lines[i-1] if i > 0 else ''
+            if prev_line.strip().endswith(':'):
+                if not line.startswith('    '):
+                    raise IndentationError(f"Missing indentation after '{prev_line.strip()}'")
+    return code
+
+class StreamAborted(ValueError):
+    """A streamed completion was abandoned because it could not score."""
+
+_LAYOUT_TOKENS = {tokenize.NEWLINE, tokenize.NL, tokenize.COMMENT, tokenize.INDENT,
+                  tokenize.DEDENT, tokenize.ENDMARKER}
+
+def check_prefix(source):
+    """Raises SyntaxError if source cannot be the start of a valid program.
+
+    Unfinished constructs pass: open brackets or strings, a block header
+    still waiting for its body, a decorator or a try without its handler.
+    """
+    try:
+        tokens = [token for token in tokenize.generate_tokens(io.StringIO(source).readline)
+                  if token.type not in _LAYOUT_TOKENS]
+    except tokenize.TokenError:
+        return  # Open bracket or string, wait for more lines
+    if not tokens or tokens[-1].line.lstrip().startswith("@"):
+        return
+    last = tokens[-1]
+    if last.type == tokenize.OP and last.string == ":":
+        indent = len(last.line) - len(last.line.lstrip())
+        source += " " * (indent + 4) + "pass\n"
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            compile(source, "<stream>", "exec")
+    except SyntaxError as e:
+        if "expected 'except' or 'finally'" not in (e.msg or ""):
             raise
-    return None, mutation_type
 
-def generate_solution(problem, mutation_type="solve", temperature=0.3, max_attempts=3):
-    """Generates a Python solution for a problem using Azure OpenAI API."""
-    for attempt in range(max_attempts):
-        prompt_template = load_prompt(mutation_type)
-        prompt = prompt_template.format(problem=problem)
-        
-        headers = {
-            "Content-Type": "application/json",
-            "api-key": API_KEY,
-        }
-
-        payload = {
-            "messages": [
-                {"role": "system", "content": [{"type": "text", "text": """You are an expert Python programmer focused on generating clean, correct code.
-Rules:
-1. Always use 4-space indentation
-2. Initialize all variables
-3. Include complete function definitions
-4. Test the code with example inputs
-5. Return only valid Python code
-6. No explanatory text or comments
-7. No markdown formatting"""}]},
-                {"role": "user", "content": [{"type": "text", "text": prompt}]}
-            ],
-            "temperature": temperature,  # Use the passed temperature parameter
-            "top_p": 1,
-            "max_tokens": 800
-        }
+class StreamValidator:
+    """Validates a completion line by line while it streams in.
+
+    feed() returns True once the code is complete (its ``` block closed)
+    and raises as soon as the finished lines can no longer be valid Python
+    (SyntaxError: prose, broken syntax, bad indentation) or the code is
+    already too long to earn any length score (StreamAborted; never when
+    max_length is None).
+    """
+
+    def __init__(self, max_length=MAX_REASONABLE_LENGTH):
+        self.max_length = max_length
+        self.text = ""
+        self.complete = False
+        self._checked = 0  # Characters of text already split into lines
+        self._code_lines = []
+        self._fenced = False
 
+    def feed(self, delta):
+        self.text += delta
+        end = self.text.rfind("\n") + 1
+        if end <= self._checked:
+            return False
+        lines = self.text[self._checked:end].split("\n")[:-1]
+        self._checked = end
+        for line in lines:
+            if line.strip().startswith("```"):
+                if self._fenced or any(code.strip() for code in self._code_lines):
+                    self.complete = True  # Closing fence, the rest is commentary
+                    break
+                self._fenced = True
+            else:
+                self._code_lines.append(line)
+        code = "\n".join(self._code_lines) + "\n"
+        if self.max_length and len(clean_code(code)) >= self.max_length:
+            raise StreamAborted(f"Code already exceeds {self.max_length} characters")
+        check_prefix(code)
+        return self.complete
+
+    def finish(self):
+        """The received code, validated like a complete response."""
+        lines = list(self._code_lines)
+        tail = self.text[self._checked:]
+        if not self.complete and not tail.strip().startswith("```"):
+            lines.append(tail)
+        return extract_code("\n".join(lines))
+
+def stream_completion(prompt, mutation_type, temperature, top_p=1, max_tokens=800, sample=0,
+                      max_attempts=None):
+    """Returns validated code from a streamed completion, abandoning it early when it can't be used.
+
+    Raises SyntaxError (or IndentationError) and StreamAborted like
+    extract_code does, usually long before the completion would have ended.
+    Accepted code shares the response cache with non-streamed requests.
+    """
+    with span("llm_request", mutation_type=mutation_type, n=1, stream=True) as request_span:
+        key = None
+        if _response_cache is not None:
+            key = _cache_key(prompt, mutation_type, temperature, 1, top_p, max_tokens, sample)
+            cached = _response_cache.get(key)
+            request_span.set(cache_hit=cached is not None)
+            if cached is not None:
+                return extract_code(cached)
+            if _cache_mode == "replay":
+                raise CacheMiss(f"No cached response for {mutation_type} prompt (key {key[:12]})")
+
+        validator = StreamValidator(max_length=_stream_max_length)
+        chunks = get_client().stream(prompt, temperature=temperature, top_p=top_p,
+                                     max_tokens=max_tokens, max_attempts=max_attempts)
         try:
-            response = requests.post(ENDPOINT, headers=headers, json=payload)
-            response.raise_for_status()
-            
-            completion = response.json()
-            code = completion['choices'][0]['message']['content'].strip()
-            
-            # Remove markdown formatting if present
-            if "```python" in code or "```" in code:
-                code = code.replace("```python", "").replace("```", "").strip()
+            for delta in chunks:
+                if validator.feed(delta):
+                    break
+        except (SyntaxError, StreamAborted):
+            request_span.set(aborted=True, streamed_chars=len(validator.text))
+            incr("stream_aborted")
+            raise
+        finally:
+            chunks.close()
+        request_span.set(aborted=False, streamed_chars=len(validator.text))
+        code = validator.finish()
+        if key is not None:
+            _response_cache.set(key, code)
+        return code
 
-            # Validate code
-            try:
-                # Try to compile the code
-                compile(code, '<string>', 'exec')
-                
-                # Check indentation
-                lines = code.split('\n')
-                for i, line in enumerate(lines):
-                    if line.strip():
-                        # Skip top-level definitions
-                        if line.startswith('def ') or line.startswith('import ') or line.startswith('from '):
-                            continue
-                            
-                        # Check if line needs indentation
-                        prev_line = lines[i-1] if i > 0 else ''
-                        if prev_line.strip().endswith(':'):
-                            if not line.startswith('    '):
-                                raise IndentationError(f"Missing indentation after '{prev_line.strip()}'")
-                
-                # If we get here, code is valid
-                return code
+_streaming = False
+_stream_max_length = MAX_REASONABLE_LENGTH
 
-            except (SyntaxError, IndentationError) as e:
-                print(f"Validation failed on attempt {attempt + 1}: {e}")
-                if attempt == max_attempts - 1:
-                    print("All attempts failed to generate valid code")
-                    return None
-                continue
+def set_streaming(enabled):
+    """Turns streamed, incrementally validated single-solution requests on or off."""
+    global _streaming
+    _streaming = enabled
 
-        except requests.exceptions.RequestException as e:
-            print(f"API request failed: {e}")
+def set_stream_length_limit(max_length):
+    """Cleaned length at which a streamed completion is abandoned (None never abandons on length)."""
+    global _stream_max_length
+    _stream_max_length = max_length
+
+def streaming_enabled():
+    return _streaming
+
+@traced()
+def generate_solution(problem, mutation_type="solve", temperature=0.3, max_attempts=3, sample=0):
+    """Generates a Python solution for a problem through the configured LLM backend.
+
+    `sample` only distinguishes otherwise identical requests in the response
+    cache, so repeated calls can still yield different candidates. In
+    streaming mode a bad completion is rejected as soon as it goes wrong.
+    """
+    prompt_template = load_prompt(mutation_type)
+    prompt = prompt_template.format(problem=problem)
+
+    for attempt in range(max_attempts):
+        try:
+            if _streaming:
+                return stream_completion(prompt, mutation_type, temperature=temperature,
+                                         top_p=1, sample=(sample, attempt))
+            content = request_completion(prompt, mutation_type, temperature=temperature,
+                                         top_p=1, sample=(sample, attempt))
+
+            # Validate code
+            return extract_code(content)
+
+        except (SyntaxError, IndentationError, StreamAborted) as e:
+            print(f"Validation failed on attempt {attempt + 1}: {e}")
+            annotate(retries=attempt + 1)
             if attempt == max_attempts - 1:
+                print("All attempts failed to generate valid code")
                 return None
-            time.sleep(2 ** attempt)  # Exponential backoff
+            continue
+
+        except CacheMiss as e:
+            print(f"Replay cache miss: {e}")
+            return None
+
+        except request_errors() as e:
+            # Rate limits and transient errors were already retried by the scheduler
+            print(f"API request failed: {e}")
+            return None
 
     return None
+
+_batch_generation = True
+
+def set_batch_generation(enabled):
+    """Turns multi-candidate (`n`) requests on or off."""
+    global _batch_generation
+    _batch_generation = enabled
+
+def batch_generation_enabled():
+    return _batch_generation
+
+@traced()
+def generate_solutions(problem, n, mutation_type="solve", temperature=0.5, max_attempts=3, sample=0):
+    """Generates up to n validated solutions with one request per attempt.
+
+    Uses the API's `n` parameter so a whole population costs one round trip;
+    later attempts only ask for the candidates that failed validation. If
+    the endpoint rejects or ignores `n`, batching is switched off for the
+    rest of the run and whatever valid candidates arrived are returned, so
+    callers can fall back to generate_solution for the rest.
+    """
+    if n <= 1 or not _batch_generation:
+        solution = generate_solution(problem, mutation_type, temperature, max_attempts, sample)
+        return [solution] if solution else []
+
+    prompt_template = load_prompt(mutation_type)
+    prompt = prompt_template.format(problem=problem)
+    solutions = []
+
+    for attempt in range(max_attempts):
+        missing = n - len(solutions)
+        try:
+            contents = request_completions(prompt, mutation_type, temperature, n=missing,
+                                           sample=(sample, attempt))
+        except CacheMiss as e:
+            print(f"Replay cache miss: {e}")
+            break
+        except http_error() as e:
+            if e.response is not None and e.response.status_code == 400:
+                print("Endpoint rejected batched generation, falling back to single requests")
+                set_batch_generation(False)
+            else:
+                print(f"API request failed: {e}")
+            break
+        except request_errors() as e:
+            print(f"API request failed: {e}")
+            break
+
+        for content in contents:
+            try:
+                solutions.append(extract_code(content))
+            except (SyntaxError, IndentationError) as e:
+                print(f"Validation failed on attempt {attempt + 1}: {e}")
+
+        if len(contents) < missing:
+            print("Endpoint ignored batched generation, falling back to single requests")
+            set_batch_generation(False)
+            break
+        if len(solutions) >= n:
+            break
+        annotate(retries=attempt + 1)
+
+    return solutions[:n]
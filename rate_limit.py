@@ -0,0 +1,366 @@
+import email.utils
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: file-backed buckets only coordinate within a process
+    fcntl = None
+
+
+class TokenBucket:
+    """Thread-safe token bucket used to pace work instead of fixed sleeps."""
+
+    def __init__(self, rate, capacity=1, clock=time.monotonic, sleep=time.sleep):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)  # Tokens added per second
+        self.capacity = max(1.0, float(capacity))
+        self._tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens=1):
+        """Take tokens if available, without blocking."""
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1):
+        """Block until the requested tokens are available, returns seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            self._sleep(delay)
+            waited += delay
+
+    def set_rate(self, rate):
+        """Changes the refill rate, keeping tokens accrued so far."""
+        with self._lock:
+            self._refill()
+            self.rate = max(1e-6, float(rate))
+
+    def pause(self, seconds):
+        """Makes every caller wait at least `seconds` before the next token."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, 0.0) - seconds * self.rate
+
+
+class FileTokenBucket:
+    """Token bucket whose state lives in a file, shared by every process that opens it.
+
+    Each operation takes an exclusive flock on the state file, refills from
+    wall-clock time and writes the new state back. Where flock is not
+    available the bucket still works, but only within one process.
+    """
+
+    def __init__(self, path, rate, capacity=1, sleep=time.sleep):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.path = path
+        self.capacity = max(1.0, float(capacity))
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._locked() as state:
+            state.setdefault("rate", float(rate))
+            state.setdefault("tokens", self.capacity)
+            state.setdefault("updated", time.time())
+
+    @property
+    def rate(self):
+        with self._locked() as state:
+            return state["rate"]
+
+    @contextmanager
+    def _locked(self):
+        with self._lock, open(self.path, "a+", encoding="utf-8") as file:
+            if fcntl:
+                fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                file.seek(0)
+                raw = file.read()
+                state = json.loads(raw) if raw.strip() else {}
+                if "tokens" in state:
+                    now = time.time()
+                    state["tokens"] = min(self.capacity,
+                                          state["tokens"] + (now - state["updated"]) * state["rate"])
+                    state["updated"] = now
+                yield state
+                file.seek(0)
+                file.truncate()
+                file.write(json.dumps(state))
+                file.flush()
+            finally:
+                if fcntl:
+                    fcntl.flock(file, fcntl.LOCK_UN)
+
+    def try_acquire(self, tokens=1):
+        with self._locked() as state:
+            if state["tokens"] >= tokens:
+                state["tokens"] -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1):
+        waited = 0.0
+        while True:
+            with self._locked() as state:
+                if state["tokens"] >= tokens:
+                    state["tokens"] -= tokens
+                    return waited
+                delay = (tokens - state["tokens"]) / state["rate"]
+            self._sleep(delay)
+            waited += delay
+
+    def set_rate(self, rate):
+        with self._locked() as state:
+            state["rate"] = max(1e-6, float(rate))
+
+    def pause(self, seconds):
+        with self._locked() as state:
+            state["tokens"] = min(state["tokens"], 0.0) - seconds * state["rate"]
+
+
+def parse_retry_after(headers, default=None):
+    """Seconds to wait according to Retry-After style response headers."""
+    for name, scale in (("retry-after-ms", 0.001), ("x-ms-retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(name)
+        if value is None:
+            continue
+        try:
+            return max(0.0, float(value) * scale)
+        except ValueError:
+            try:
+                moment = email.utils.parsedate_to_datetime(value)
+            except (TypeError, ValueError):
+                continue
+            return max(0.0, moment.timestamp() - time.time())
+    return default
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of sending a request while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Stops sending requests after repeated server errors.
+
+    After `failure_threshold` consecutive failures the circuit opens for
+    `cooldown` seconds, then a single trial request is let through
+    (half-open). Success closes the circuit again, failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold=5, cooldown=30, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._clock = clock
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self._clock() - self._opened_at >= self.cooldown:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._clock() - self._opened_at >= self.cooldown and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+                self._trial = False
+
+
+class AdaptiveRateLimiter:
+    """Request and token budgets for one endpoint, tuned from its responses.
+
+    Starts at `requests_per_minute` and adjusts additive-increase /
+    multiplicative-decrease style: each success nudges the rate up towards
+    the ceiling (the endpoint's advertised limit once seen), each 429 halves
+    it and pauses every caller for the Retry-After period. Pass state_path
+    to share the budget between processes.
+    """
+
+    def __init__(self, requests_per_minute=60, tokens_per_minute=None, state_path=None,
+                 min_requests_per_minute=1, max_requests_per_minute=None):
+        self.min_rpm = min_requests_per_minute
+        self.max_rpm = max_requests_per_minute
+        self._rpm = float(requests_per_minute)
+        self._lock = threading.Lock()
+        if state_path:
+            self.requests = FileTokenBucket(state_path + ".requests", self._rpm / 60.0, capacity=max(1, self._rpm / 60.0))
+            self.tokens = (FileTokenBucket(state_path + ".tokens", tokens_per_minute / 60.0, capacity=tokens_per_minute / 6.0)
+                           if tokens_per_minute else None)
+        else:
+            self.requests = TokenBucket(self._rpm / 60.0, capacity=max(1, self._rpm / 60.0))
+            self.tokens = (TokenBucket(tokens_per_minute / 60.0, capacity=tokens_per_minute / 6.0)
+                           if tokens_per_minute else None)
+
+    @property
+    def requests_per_minute(self):
+        return self._rpm
+
+    def _set_rpm(self, rpm):
+        if self.max_rpm:
+            rpm = min(rpm, self.max_rpm)
+        self._rpm = max(self.min_rpm, rpm)
+        self.requests.set_rate(self._rpm / 60.0)
+
+    def acquire(self, tokens=0):
+        """Blocks until a request (and its estimated tokens) fits the budget."""
+        waited = self.requests.acquire()
+        if self.tokens and tokens:
+            waited += self.tokens.acquire(min(tokens, self.tokens.capacity))
+        return waited
+
+    def on_success(self, headers=None):
+        headers = headers or {}
+        with self._lock:
+            limit = _int_header(headers, "x-ratelimit-limit-requests")
+            if limit:
+                self.max_rpm = limit
+            remaining = _int_header(headers, "x-ratelimit-remaining-requests")
+            if remaining == 0:
+                self.requests.pause(parse_retry_after(headers, default=1.0))
+            else:
+                self._set_rpm(self._rpm + 1)
+            remaining_tokens = _int_header(headers, "x-ratelimit-remaining-tokens")
+            if self.tokens and remaining_tokens is not None and remaining_tokens < self.tokens.capacity / 10:
+                self.tokens.pause(1.0)
+
+    def on_rate_limited(self, retry_after):
+        with self._lock:
+            self._set_rpm(self._rpm / 2)
+            self.requests.pause(retry_after)
+
+
+def _int_header(headers, name):
+    value = headers.get(name)
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _release(response):
+    """Returns a retried response's connection to the pool (streamed bodies are still open)."""
+    close = getattr(response, "close", None)
+    if close:
+        close()
+
+
+class RequestScheduler:
+    """Single retry policy for every call to an endpoint.
+
+    execute() waits for the shared budget, sends, and retries 429s after the
+    endpoint's Retry-After and 5xx / transport errors with jittered
+    exponential backoff, feeding the circuit breaker. It returns the final
+    response (the caller decides how to report an error status) or re-raises
+    the last transport error. Any other exception from send counts as a
+    failure for the breaker and propagates.
+    """
+
+    def __init__(self, limiter=None, breaker=None, max_attempts=5, backoff_base=1.0,
+                 backoff_max=60.0, retry_exceptions=(OSError,), sleep=time.sleep, on_retry=None):
+        self.limiter = limiter or AdaptiveRateLimiter()
+        self.breaker = breaker or CircuitBreaker()
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_exceptions = retry_exceptions
+        self._sleep = sleep
+        self._on_retry = on_retry
+
+    def backoff(self, attempt):
+        return min(self.backoff_max, self.backoff_base * (2 ** attempt)) * random.uniform(0.5, 1.0)
+
+    def _retry(self, attempt, reason, delay):
+        if self._on_retry:
+            self._on_retry(attempt, reason, delay)
+
+    def execute(self, send, tokens=0, max_attempts=None):
+        attempts = max_attempts or self.max_attempts
+        for attempt in range(attempts):
+            if not self.breaker.allow():
+                raise CircuitOpenError("Endpoint circuit is open after repeated server errors")
+            self.limiter.acquire(tokens)
+            last = attempt == attempts - 1
+            try:
+                response = send()
+            except self.retry_exceptions:
+                self.breaker.record_failure()
+                if last:
+                    raise
+                delay = self.backoff(attempt)
+                self._retry(attempt + 1, "error", delay)
+                self._sleep(delay)
+                continue
+            except BaseException:
+                # Not retried, but must still settle a half-open trial or the circuit never closes
+                self.breaker.record_failure()
+                raise
+
+            status = response.status_code
+            if status == 429:
+                self.breaker.record_success()  # The endpoint is healthy, just busy
+                delay = parse_retry_after(response.headers, default=self.backoff(attempt))
+                self.limiter.on_rate_limited(delay)
+                if last:
+                    return response
+                _release(response)
+                self._retry(attempt + 1, "rate_limited", delay)
+                continue  # acquire() waits out the pause
+            if status >= 500:
+                self.breaker.record_failure()
+                if last:
+                    return response
+                _release(response)
+                delay = self.backoff(attempt)
+                self._retry(attempt + 1, "server_error", delay)
+                self._sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            self.limiter.on_success(response.headers)
+            return response
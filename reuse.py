@@ -0,0 +1,91 @@
+import math
+import re
+import threading
+from collections import Counter
+
+# Score the leaderboard counts as solved; weaker winners are not worth reusing
+SOLVED_FITNESS = 80
+
+_STOPWORDS = frozenset((
+    "a an and are as at be by calculate check compute convert determine find for from get given "
+    "how in is it list of on or print program python return show solve that the this to using "
+    "what whether which with write"
+).split())
+
+
+def terms(text):
+    """Lower-cased words of a problem statement, minus stopwords."""
+    return [word for word in re.findall(r"[a-z0-9]+", text.lower()) if word not in _STOPWORDS]
+
+
+class ReuseIndex:
+    """TF-IDF index from solved problems to their best solution.
+
+    Problems are matched by cosine similarity of their term weights; an
+    inverted index keeps a query to the problems sharing at least one term.
+    IDF comes from the problems indexed so far, so weights improve as the
+    run solves more problems. Only solutions scoring min_fitness or more
+    are indexed, and each problem keeps its best one.
+    """
+
+    def __init__(self, min_fitness=SOLVED_FITNESS):
+        self.min_fitness = min_fitness
+        self._lock = threading.Lock()
+        self._entries = {}  # problem -> (term counts, best entry)
+        self._postings = {}  # term -> set of problems
+
+    @classmethod
+    def from_archive(cls, archive, min_fitness=SOLVED_FITNESS):
+        """Index of every winner in a SolutionArchive."""
+        index = cls(min_fitness)
+        for entry in archive.solutions(role="winner"):
+            index.add(entry["problem"], entry["code"], entry["fitness"])
+        return index
+
+    def add(self, problem, code, fitness):
+        """Indexes code as problem's solution unless a fitter one is known; returns whether it was kept."""
+        if fitness < self.min_fitness:
+            return False
+        counts = Counter(terms(problem))
+        if not counts:
+            return False
+        with self._lock:
+            known = self._entries.get(problem)
+            if known and known[1]["fitness"] >= fitness:
+                return False
+            self._entries[problem] = (counts, {"problem": problem, "code": code, "fitness": fitness})
+            for term in counts:
+                self._postings.setdefault(term, set()).add(problem)
+        return True
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _weights(self, counts):
+        total = len(self._entries)
+        return {
+            term: count * (math.log((1 + total) / (1 + len(self._postings.get(term, ())))) + 1)
+            for term, count in counts.items()
+        }
+
+    def related(self, problem, k=2, min_similarity=0.15):
+        """Up to k (similarity, entry) pairs for other problems, most similar first."""
+        query_counts = Counter(terms(problem))
+        with self._lock:
+            candidates = set()
+            for term in query_counts:
+                candidates |= self._postings.get(term, set())
+            candidates.discard(problem)
+            query = self._weights(query_counts)
+            query_norm = math.sqrt(sum(weight * weight for weight in query.values()))
+            matches = []
+            for other in candidates:
+                counts, entry = self._entries[other]
+                weights = self._weights(counts)
+                norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+                dot = sum(weight * weights.get(term, 0.0) for term, weight in query.items())
+                similarity = dot / (query_norm * norm) if query_norm and norm else 0.0
+                if similarity >= min_similarity:
+                    matches.append((similarity, entry))
+        matches.sort(key=lambda match: (-match[0], -match[1]["fitness"], match[1]["problem"]))
+        return matches[:k]
@@ -0,0 +1,413 @@
+import atexit
+import os
+import queue
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from telemetry import span
+
+IMAGE = "code-runner"
+CPU_LIMIT = 0.5  # CPUs per container
+
+# Writable scratch space of pool containers; their root filesystem is read-only
+SCRATCH_DIR = "/scratch"
+
+# Same lockdown as the original one-shot `docker run`
+CONTAINER_LIMITS = [
+    "--network", "none",  # No network access
+    "--memory", "100m",  # Limited memory
+    "--cpus", str(CPU_LIMIT),  # Limited CPU
+    "--pids-limit", "50",  # Limited processes
+    "--ulimit", "nofile=64:64",  # Limited file descriptors
+    "--security-opt", "no-new-privileges",  # No privilege escalation
+]
+
+
+def default_parallelism():
+    """Concurrent sandbox slots that saturate the host given the per-container CPU cap."""
+    return max(1, int((os.cpu_count() or 1) / CPU_LIMIT))
+
+
+class ExecutionResult:
+    """Outcome of running one candidate.
+
+    duration is the wall time seen from the host, including interpreter and
+    container overhead; wall_time, cpu_time (user + system seconds) and
+    peak_rss (bytes) are measured around the candidate inside the sandbox.
+    sandbox_error marks runs where the sandbox itself failed, so the
+    outcome says nothing about the candidate.
+    """
+
+    __slots__ = ("stdout", "stderr", "returncode", "duration", "timed_out",
+                 "wall_time", "cpu_time", "peak_rss", "output_bytes", "sandbox_error")
+
+    def __init__(self, stdout="", stderr="", returncode=-1, duration=0.0, timed_out=False,
+                 wall_time=0.0, cpu_time=0.0, peak_rss=0, output_bytes=0, sandbox_error=False):
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode = returncode
+        self.duration = duration
+        self.timed_out = timed_out
+        self.wall_time = wall_time
+        self.cpu_time = cpu_time
+        self.peak_rss = peak_rss
+        self.output_bytes = output_bytes
+        self.sandbox_error = sandbox_error
+
+    @property
+    def transient(self):
+        """Whether another run could turn out differently (timeouts under load, sandbox failures)."""
+        return self.timed_out or self.sandbox_error
+
+    @property
+    def success(self):
+        return self.returncode == 0 and not self.timed_out
+
+    def __repr__(self):
+        return (f"ExecutionResult(returncode={self.returncode}, timed_out={self.timed_out}, "
+                f"duration={self.duration:.3f}, cpu_time={self.cpu_time:.3f}, "
+                f"peak_rss={self.peak_rss})")
+
+
+USAGE_MARKER = "__pmp_usage__"
+
+# Exit statuses of docker itself (daemon error, command not executable, not found)
+DOCKER_ERROR_CODES = (125, 126, 127)
+
+# Runs the candidate read from stdin and reports its resource usage on stderr.
+# The getrusage deltas exclude interpreter start-up. Peak memory comes from
+# VmHWM where /proc exists, since Linux carries ru_maxrss over from the
+# forking parent across exec. Given a scratch directory as its argument,
+# the candidate runs there and the directory is emptied afterwards.
+HARNESS = f"""
+import os, resource, sys, time
+scratch = sys.argv[1] if len(sys.argv) > 1 else None
+del sys.argv[1:]
+if scratch:
+    os.chdir(scratch)
+    os.environ["TMPDIR"] = scratch
+def wipe(directory):
+    import shutil
+    for entry in os.listdir(directory):
+        path = os.path.join(directory, entry)
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+def peak_rss():
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss * (1 if sys.platform == "darwin" else 1024)
+code = sys.stdin.read()
+before = resource.getrusage(resource.RUSAGE_SELF)
+start = time.perf_counter()
+try:
+    exec(compile(code, "<candidate>", "exec"), {{"__name__": "__main__"}})
+finally:
+    wall = time.perf_counter() - start
+    after = resource.getrusage(resource.RUSAGE_SELF)
+    cpu = after.ru_utime + after.ru_stime - before.ru_utime - before.ru_stime
+    if scratch:
+        wipe(scratch)
+    sys.stdout.flush()
+    sys.stderr.write("\\n{USAGE_MARKER} %r %r %d\\n" % (wall, cpu, peak_rss()))
+"""
+PYTHON_ARGS = ["python", "-I", "-c", HARNESS]
+
+
+def _split_usage(stderr):
+    """Separates the harness report from the candidate's own stderr.
+
+    The harness writes its report after the candidate has finished, so the
+    last marker line is the real one; earlier ones were printed by the
+    candidate and stay in its stderr.
+    """
+    lines = stderr.split("\n")
+    for index in reversed(range(len(lines))):
+        line = lines[index]
+        if line.startswith(USAGE_MARKER):
+            wall, cpu, rss = line.split()[1:4]
+            rest = lines[:index] + lines[index + 1:]
+            if index and not lines[index - 1]:
+                del rest[index - 1]  # Separator the harness wrote before its report
+            return "\n".join(rest), float(wall), float(cpu), int(rss)
+    return stderr, 0.0, 0.0, 0
+
+
+def _run(cmd, code, timeout, cwd=None):
+    """Runs cmd feeding code on stdin, never raises for candidate failures."""
+    start = time.perf_counter()
+    try:
+        result = subprocess.run(cmd, input=code, capture_output=True, text=True,
+                                timeout=timeout, cwd=cwd)
+        reported = USAGE_MARKER in result.stderr
+        stderr, wall_time, cpu_time, peak_rss = _split_usage(result.stderr)
+        return ExecutionResult(result.stdout.strip(), stderr, result.returncode,
+                               time.perf_counter() - start, wall_time=wall_time,
+                               cpu_time=cpu_time, peak_rss=peak_rss,
+                               output_bytes=len(result.stdout.encode("utf-8")),
+                               # The harness never started: docker or the interpreter failed
+                               sandbox_error=not reported and result.returncode in DOCKER_ERROR_CODES)
+    except subprocess.TimeoutExpired:
+        print("Execution timed out.")
+        return ExecutionResult("", "Timed out", -1, time.perf_counter() - start, timed_out=True,
+                               wall_time=timeout)
+
+
+def run_repeated(sandbox, code, repeat=1, timeout=None):
+    """Runs code up to `repeat` times for stable timings.
+
+    Returns the first run's result with wall and CPU time replaced by the
+    medians over the runs (and the highest peak RSS). Stops repeating as
+    soon as a run fails, since failed runs are not worth timing.
+    """
+    result = sandbox.run(code, timeout)
+    if repeat <= 1 or not result.success:
+        return result
+    runs = [result]
+    for _ in range(repeat - 1):
+        run = sandbox.run(code, timeout)
+        if not run.success:
+            break
+        runs.append(run)
+    result.wall_time = statistics.median(run.wall_time for run in runs)
+    result.cpu_time = statistics.median(run.cpu_time for run in runs)
+    result.peak_rss = max(run.peak_rss for run in runs)
+    return result
+
+
+class SubprocessSandbox:
+    """Stand-in backend for machines without Docker: isolated-mode Python in a scratch dir."""
+
+    name = "subprocess"
+
+    def __init__(self, python=None, timeout=2):
+        self.python = python or sys.executable
+        self.timeout = timeout
+        self.slots = os.cpu_count() or 1  # No CPU cap, so one run per core
+
+    def run(self, code, timeout=None):
+        with tempfile.TemporaryDirectory(prefix="code_runner_") as workdir:
+            return _run([self.python, *PYTHON_ARGS[1:]], code, timeout or self.timeout, cwd=workdir)
+
+    def close(self):
+        pass
+
+
+class DockerRunSandbox:
+    """One fresh `docker run --rm` container per candidate (cold start every time)."""
+
+    name = "docker-run"
+
+    def __init__(self, image=IMAGE, timeout=10):
+        self.image = image
+        self.timeout = timeout
+        self.slots = default_parallelism()
+
+    def run(self, code, timeout=None):
+        cmd = ["docker", "run", "--rm", "-i", *CONTAINER_LIMITS, self.image, *PYTHON_ARGS]
+        return _run(cmd, code, timeout or self.timeout)
+
+    def close(self):
+        pass
+
+
+class DockerPoolSandbox:
+    """Pool of pre-started, locked-down containers that run candidates via `docker exec`.
+
+    Code is sent on stdin to a fresh interpreter inside a warm container, so
+    the container start cost is paid once per `max_runs` evaluations.
+    Containers are recycled after `max_runs` runs or after any failure, and
+    replacements that fail to start are retried with backoff. Their root
+    filesystem is read-only; each candidate runs in a tmpfs scratch
+    directory that is emptied before the next one. When no container is
+    free within acquire_timeout seconds, the candidate gets a one-off
+    `docker run` instead of waiting on a slot that may never come back.
+    close() waits for replacements still starting, so none outlive the pool.
+    """
+
+    name = "docker-pool"
+
+    def __init__(self, size=None, image=IMAGE, max_runs=50, timeout=10, acquire_timeout=None,
+                 refill_attempts=5, refill_delay=1.0):
+        self.size = max(1, size or default_parallelism())
+        self.slots = self.size
+        self.image = image
+        self.max_runs = max_runs
+        self.timeout = timeout
+        self.acquire_timeout = timeout if acquire_timeout is None else acquire_timeout
+        self.refill_attempts = refill_attempts
+        self.refill_delay = refill_delay
+        self._idle = queue.Queue()
+        self._runs = {}
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._refills = []
+        self.started = 0
+        self.recycled = 0
+        self.lost = 0  # Slots whose replacement could not be started
+        self.fallbacks = 0
+        try:
+            for _ in range(self.size):
+                self._idle.put(self._start_container())
+        except BaseException:
+            self.close()  # Don't leak the containers that did start
+            raise
+
+    def _start_container(self):
+        name = f"code_runner_{uuid.uuid4().hex}"
+        with span("container_start"):
+            subprocess.run(
+                ["docker", "run", "-d", "--name", name, *CONTAINER_LIMITS, "--read-only",
+                 "--tmpfs", f"{SCRATCH_DIR}:rw,size=16m,mode=1777", self.image,
+                 "sleep", "infinity"],
+                check=True, capture_output=True, text=True
+            )
+        with self._lock:
+            self._runs[name] = 0
+            self.started += 1
+        return name
+
+    def _remove_container(self, name):
+        with self._lock:
+            self._runs.pop(name, None)
+        subprocess.Popen(["docker", "rm", "-f", name],
+                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def _refill(self):
+        """Starts a replacement container, retrying with exponential backoff."""
+        delay = self.refill_delay
+        for attempt in range(1, self.refill_attempts + 1):
+            if self._closed.is_set():
+                return
+            try:
+                name = self._start_container()
+            except (subprocess.CalledProcessError, OSError) as e:
+                print(f"Failed to start sandbox container (attempt {attempt}): "
+                      f"{getattr(e, 'stderr', None) or e}")
+            else:
+                if self._closed.is_set():  # The pool closed while it was starting
+                    self._remove_container(name)
+                else:
+                    self._idle.put(name)
+                return
+            if attempt < self.refill_attempts and self._closed.wait(delay):
+                return
+            delay *= 2
+        with self._lock:
+            self.lost += 1
+
+    def _start_refill(self):
+        thread = threading.Thread(target=self._refill, daemon=True)
+        with self._lock:
+            self._refills = [refill for refill in self._refills if refill.is_alive()]
+            self._refills.append(thread)
+        thread.start()
+
+    def _replace(self, name):
+        """Removes a spent container and starts its replacement off the hot path."""
+        with self._lock:
+            self.recycled += 1
+        self._remove_container(name)
+        self._start_refill()
+
+    def _run_fallback(self, code, timeout):
+        """Runs code in a one-off container while the pool has none to spare."""
+        with self._lock:
+            self.fallbacks += 1
+            retry = self.lost > 0
+            if retry:
+                self.lost -= 1
+        if retry:  # Docker may have recovered since the slot was given up
+            self._start_refill()
+        cmd = ["docker", "run", "--rm", "-i", *CONTAINER_LIMITS, self.image, *PYTHON_ARGS]
+        try:
+            return _run(cmd, code, timeout or self.timeout)
+        except OSError as e:
+            return ExecutionResult("", f"Sandbox unavailable: {e}", -1, sandbox_error=True)
+
+    def run(self, code, timeout=None):
+        try:
+            name = self._idle.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            return self._run_fallback(code, timeout)
+        result = None
+        try:
+            result = _run(["docker", "exec", "-i", "-w", SCRATCH_DIR, name, *PYTHON_ARGS, SCRATCH_DIR],
+                          code, timeout or self.timeout)
+            return result
+        finally:
+            with self._lock:
+                self._runs[name] = self._runs.get(name, 0) + 1
+                spent = self._runs[name] >= self.max_runs
+            if self._closed.is_set():
+                self._remove_container(name)
+            elif result is None or not result.success or spent:
+                self._replace(name)
+            else:
+                self._idle.put(name)
+
+    def close(self):
+        self._closed.set()
+        with self._lock:
+            refills = list(self._refills)
+        for refill in refills:
+            refill.join()
+        with self._lock:
+            names = list(self._runs)
+        for name in names:
+            self._remove_container(name)
+
+
+BACKENDS = {
+    "subprocess": SubprocessSandbox,
+    "docker-run": DockerRunSandbox,
+    "docker-pool": DockerPoolSandbox,
+}
+
+_sandbox = None
+_sandbox_lock = threading.Lock()
+
+def configure_sandbox(backend="docker-pool", **options):
+    """Selects the execution backend, falling back to subprocess if Docker fails."""
+    global _sandbox
+    try:
+        sandbox = BACKENDS[backend](**options)
+    except (subprocess.CalledProcessError, FileNotFoundError) as e:
+        print(f"Sandbox backend '{backend}' unavailable ({e}), falling back to subprocess")
+        sandbox = SubprocessSandbox()
+    with _sandbox_lock:
+        if _sandbox is not None:
+            _sandbox.close()
+        _sandbox = sandbox
+    return sandbox
+
+def get_sandbox():
+    """Returns the configured sandbox, the subprocess stand-in if none was set."""
+    global _sandbox
+    with _sandbox_lock:
+        if _sandbox is None:
+            _sandbox = SubprocessSandbox()
+        return _sandbox
+
+def close_sandbox():
+    global _sandbox
+    with _sandbox_lock:
+        if _sandbox is not None:
+            _sandbox.close()
+            _sandbox = None
+
+atexit.register(close_sandbox)
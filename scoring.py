@@ -0,0 +1,211 @@
+import zlib
+import numpy as np
+from complexity import MAX_REASONABLE_LENGTH, clean_code
+
+# Columns of a generation's metrics
+METRICS = ("length", "compressed", "success", "runtime", "cpu_time", "peak_rss", "output_bytes",
+           "output_ok")
+
+# Compressed size (bytes) at which the compression term reaches zero
+MAX_COMPRESSED_SIZE = 300
+# Runtime (seconds) at which the runtime term reaches zero
+RUNTIME_BUDGET = 2.0
+# Peak resident memory (bytes) at which the memory term reaches zero: the container limit
+MEMORY_BUDGET = 100 * 1024 * 1024
+# Output size (bytes) at which the output term reaches zero
+OUTPUT_BUDGET = 4096
+
+# Today's fitness: 70 for brevity plus 30 for running and printing something
+DEFAULT_WEIGHTS = {"length": 70.0, "success": 30.0}
+WEIGHT_PRESETS = {
+    "length": DEFAULT_WEIGHTS,
+    # zlib size is a far better Kolmogorov proxy than raw length
+    "kolmogorov": {"compressed": 70.0, "success": 20.0, "output_ok": 10.0},
+    "fast": {"compressed": 50.0, "success": 20.0, "output_ok": 10.0, "runtime": 20.0},
+    "efficient": {"compressed": 50.0, "success": 20.0, "output_ok": 10.0, "cpu_time": 10.0,
+                  "peak_rss": 10.0},
+}
+SELECTIONS = ("truncate", "tournament", "nsga")
+
+_NUMERIC_KEYWORDS = ("prime", "celsius", "area")
+
+
+def parse_weights(spec):
+    """Weights from a preset name or "metric=weight,..." (e.g. "compressed=60,success=40")."""
+    if spec in WEIGHT_PRESETS:
+        return dict(WEIGHT_PRESETS[spec])
+    weights = {}
+    for part in spec.split(","):
+        name, _, value = part.partition("=")
+        name = name.strip()
+        if name not in METRICS:
+            raise ValueError(f"Unknown fitness metric '{name}', expected one of {METRICS}")
+        weights[name] = float(value)
+    return weights
+
+
+def check_output(problem, stdout):
+    """Whether the output looks like an answer: present, no errors, numeric where expected."""
+    output = (stdout or "").strip()
+    if not output or "error" in output.lower() or "exception" in output.lower():
+        return False
+    if any(keyword in problem.lower() for keyword in _NUMERIC_KEYWORDS):
+        return any(char.isdigit() for char in output)
+    return True
+
+
+def code_metrics(code):
+    """Static metrics of a source: cleaned length and zlib-compressed size."""
+    cleaned = clean_code(code)
+    return {"length": len(cleaned), "compressed": len(zlib.compress(cleaned.encode("utf-8"), 9))}
+
+
+def metrics_arrays(records):
+    """Column arrays (one per metric) from a list of metric dicts."""
+    return {
+        name: np.fromiter((record.get(name, 0) for record in records), dtype=np.float64,
+                          count=len(records))
+        for name in METRICS
+    }
+
+
+class ScoringEngine:
+    """Weighted fitness over a whole generation's metrics in one vectorized pass.
+
+    Each metric becomes a term in [0, 1] (shorter, smaller, faster and
+    working is better); fitness is the weighted sum of the terms, so the
+    default weights reproduce the original 0-100 score.
+    """
+
+    def __init__(self, weights=None, max_length=MAX_REASONABLE_LENGTH,
+                 max_compressed=MAX_COMPRESSED_SIZE, runtime_budget=RUNTIME_BUDGET,
+                 memory_budget=MEMORY_BUDGET, output_budget=OUTPUT_BUDGET):
+        self.weights = {name: weight for name, weight in (weights or DEFAULT_WEIGHTS).items() if weight}
+        unknown = set(self.weights) - set(METRICS)
+        if unknown:
+            raise ValueError(f"Unknown fitness metrics {sorted(unknown)}, expected some of {METRICS}")
+        self.max_length = max_length
+        self.max_compressed = max_compressed
+        self.runtime_budget = runtime_budget
+        self.memory_budget = memory_budget
+        self.output_budget = output_budget
+
+    @property
+    def length_limit(self):
+        """Cleaned length past which code earns no length points, or None when length isn't scored."""
+        return self.max_length if "length" in self.weights else None
+
+    def terms(self, arrays):
+        """Normalized [0, 1] term per weighted metric."""
+        terms = {}
+        for name in self.weights:
+            if name == "length":
+                term = 1 - arrays["length"] / self.max_length
+            elif name == "compressed":
+                term = 1 - arrays["compressed"] / self.max_compressed
+            elif name in ("runtime", "cpu_time"):
+                # Only working code earns speed points
+                term = arrays["success"] * (1 - arrays[name] / self.runtime_budget)
+            elif name == "peak_rss":
+                term = arrays["success"] * (1 - arrays["peak_rss"] / self.memory_budget)
+            elif name == "output_bytes":
+                term = arrays["success"] * (1 - arrays["output_bytes"] / self.output_budget)
+            else:
+                term = arrays[name]
+            terms[name] = np.clip(term, 0, 1)
+        return terms
+
+    def objectives(self, arrays):
+        """(n, k) matrix of weighted terms, one column per objective, higher is better."""
+        terms = self.terms(arrays)
+        if not terms:
+            return np.zeros((len(arrays["length"]), 1))
+        return np.column_stack([terms[name] * weight for name, weight in self.weights.items()])
+
+    def score(self, arrays):
+        return self.objectives(arrays).sum(axis=1)
+
+    def score_one(self, record):
+        return float(self.score(metrics_arrays([record]))[0])
+
+
+def select_top(fitness, k):
+    """Indices of the k fittest, best first, without sorting the whole generation."""
+    n = len(fitness)
+    k = min(k, n)
+    if k <= 0:
+        return np.array([], dtype=np.intp)
+    indices = np.arange(n) if k == n else np.argpartition(-fitness, k - 1)[:k]
+    # Stable within ties: earlier candidates first
+    return indices[np.lexsort((indices, -fitness[indices]))]
+
+
+def select_tournament(fitness, k, rng, size=3):
+    """k distinct winners of size-way tournaments among the remaining candidates."""
+    remaining = np.arange(len(fitness))
+    winners = []
+    for _ in range(min(k, len(fitness))):
+        entrants = rng.choice(len(remaining), size=min(size, len(remaining)), replace=False)
+        best = entrants[np.argmax(fitness[remaining[entrants]])]
+        winners.append(remaining[best])
+        remaining = np.delete(remaining, best)
+    return np.array(winners, dtype=np.intp)
+
+
+def pareto_fronts(objectives, limit=None):
+    """Non-dominated sorting: list of index arrays, best front first.
+
+    Stops once the fronts hold at least `limit` candidates.
+    """
+    n = len(objectives)
+    # dominates[i, j]: i is at least as good everywhere and better somewhere
+    at_least = np.ones((n, n), dtype=bool)
+    better = np.zeros((n, n), dtype=bool)
+    for column in objectives.T:
+        at_least &= column[:, None] >= column[None, :]
+        better |= column[:, None] > column[None, :]
+    dominates = at_least & better
+    dominated_by = dominates.sum(axis=0)  # How many candidates dominate each one
+    fronts = []
+    front = np.flatnonzero(dominated_by == 0)
+    assigned = len(front)
+    while len(front):
+        fronts.append(front)
+        if limit is not None and assigned >= limit:
+            break
+        dominated_by[front] = -1
+        dominated_by -= dominates[front].sum(axis=0)
+        front = np.flatnonzero(dominated_by == 0)
+        assigned += len(front)
+    return fronts
+
+
+def crowding_distance(objectives):
+    """NSGA-II crowding distance; boundary points get infinity."""
+    n, k = objectives.shape
+    distance = np.zeros(n)
+    if n <= 2:
+        return np.full(n, np.inf)
+    for column in range(k):
+        order = np.argsort(objectives[:, column], kind="stable")
+        values = objectives[order, column]
+        span = values[-1] - values[0]
+        distance[order[0]] = distance[order[-1]] = np.inf
+        if span > 0:
+            distance[order[1:-1]] += (values[2:] - values[:-2]) / span
+    return distance
+
+
+def select_nsga(objectives, k):
+    """NSGA-II style selection: whole fronts first, then the least crowded of the next front."""
+    chosen = []
+    for front in pareto_fronts(objectives, limit=k):
+        if len(chosen) + len(front) <= k:
+            chosen.extend(front.tolist())
+        else:
+            distance = crowding_distance(objectives[front])
+            order = np.argsort(-distance, kind="stable")
+            chosen.extend(front[order[:k - len(chosen)]].tolist())
+        if len(chosen) >= k:
+            break
+    return np.array(chosen, dtype=np.intp)
@@ -0,0 +1,238 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRIC_PREFIX = "pmp"
+
+
+class Span:
+    """One timed stage; attributes can be added while it is open."""
+
+    __slots__ = ("name", "attrs", "start", "duration", "error")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.start = time.time()
+        self.duration = 0.0
+        self.error = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+class _StageStats:
+    __slots__ = ("count", "total", "errors", "samples")
+
+    def __init__(self, max_samples):
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+        self.samples = deque(maxlen=max_samples)
+
+
+class Tracer:
+    """Collects spans and counters, exports them as JSONL traces and Prometheus text.
+
+    Span durations are inclusive, so a stage's time also counts towards the
+    stage that called it (e.g. execute_code inside evaluate_fitness).
+    """
+
+    def __init__(self, trace_file=None, max_samples=10000):
+        self.max_samples = max_samples
+        self.stages = {}
+        self.counters = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._trace = None
+        if trace_file:
+            self.open_trace(trace_file)
+
+    def open_trace(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._lock:
+            if self._trace:
+                self._trace.close()
+            self._trace = open(path, "a", encoding="utf-8")
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def current(self):
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    def span(self, name, **attrs):
+        return _SpanContext(self, name, attrs)
+
+    def annotate(self, **attrs):
+        """Adds attributes to the innermost open span on this thread."""
+        span = self.current()
+        if span is not None:
+            span.set(**attrs)
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def _finish(self, span):
+        with self._lock:
+            stats = self.stages.get(span.name)
+            if stats is None:
+                stats = self.stages[span.name] = _StageStats(self.max_samples)
+            stats.count += 1
+            stats.total += span.duration
+            stats.samples.append(span.duration)
+            if span.error:
+                stats.errors += 1
+            for key, value in span.attrs.items():
+                if isinstance(value, bool):
+                    value = int(value)
+                if isinstance(value, (int, float)):
+                    counter = f"{span.name}_{key}"
+                    self.counters[counter] = self.counters.get(counter, 0) + value
+            if self._trace:
+                self._trace.write(json.dumps({
+                    "name": span.name,
+                    "start": span.start,
+                    "duration_ms": span.duration * 1000,
+                    "thread": threading.current_thread().name,
+                    "error": span.error,
+                    "attrs": span.attrs,
+                }, default=str) + "\n")
+
+    def stage_summary(self):
+        """Per-stage count, total seconds, mean/p95 milliseconds and errors."""
+        with self._lock:
+            items = [(name, stats.count, stats.total, stats.errors, sorted(stats.samples))
+                     for name, stats in self.stages.items()]
+        summary = {}
+        for name, count, total, errors, samples in items:
+            summary[name] = {
+                "count": count,
+                "total_s": total,
+                "mean_ms": total / count * 1000 if count else 0.0,
+                "p95_ms": samples[min(len(samples) - 1, int(0.95 * len(samples)))] * 1000 if samples else 0.0,
+                "errors": errors,
+            }
+        return summary
+
+    def prometheus_text(self):
+        lines = [
+            f"# HELP {METRIC_PREFIX}_stage_seconds Time spent per pipeline stage.",
+            f"# TYPE {METRIC_PREFIX}_stage_seconds summary",
+        ]
+        summary = self.stage_summary()
+        for name, stats in sorted(summary.items()):
+            lines.append(f'{METRIC_PREFIX}_stage_seconds{{stage="{name}",quantile="0.95"}} {stats["p95_ms"] / 1000:.6f}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_sum{{stage="{name}"}} {stats["total_s"]:.6f}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_count{{stage="{name}"}} {stats["count"]}')
+        lines.append(f"# TYPE {METRIC_PREFIX}_stage_errors_total counter")
+        for name, stats in sorted(summary.items()):
+            lines.append(f'{METRIC_PREFIX}_stage_errors_total{{stage="{name}"}} {stats["errors"]}')
+        with self._lock:
+            counters = sorted(self.counters.items())
+        for name, value in counters:
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name}_total counter")
+            lines.append(f"{METRIC_PREFIX}_{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Writes the metrics in Prometheus text format, atomically."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+    def serve_prometheus(self, port, host="127.0.0.1"):
+        """Serves /metrics on a background thread, returns the server."""
+        tracer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                data = tracer.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    def format_summary(self, top=8):
+        """Table of the hottest stages by total time."""
+        summary = sorted(self.stage_summary().items(), key=lambda item: item[1]["total_s"], reverse=True)
+        lines = [f"{'stage':<26} {'count':>6} {'total s':>9} {'mean ms':>9} {'p95 ms':>9} {'errors':>6}"]
+        for name, stats in summary[:top]:
+            lines.append(f"{name:<26} {stats['count']:>6} {stats['total_s']:>9.2f} {stats['mean_ms']:>9.1f} "
+                         f"{stats['p95_ms']:>9.1f} {stats['errors']:>6}")
+        with self._lock:
+            counters = sorted(self.counters.items())
+        if counters:
+            lines.append("counters: " + ", ".join(f"{name}={value:g}" for name, value in counters))
+        return "\n".join(lines)
+
+    def close(self):
+        with self._lock:
+            if self._trace:
+                self._trace.close()
+                self._trace = None
+
+
+class _SpanContext:
+    __slots__ = ("tracer", "span", "_t0")
+
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.span = Span(name, attrs)
+
+    def __enter__(self):
+        self.span.start = time.time()
+        self._t0 = time.perf_counter()
+        self.tracer._stack().append(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        self.span.duration = time.perf_counter() - self._t0
+        if exc_type is not None:
+            self.span.error = exc_type.__name__
+        self.tracer._stack().pop()
+        self.tracer._finish(self.span)
+        return False
+
+
+tracer = Tracer()
+
+def span(name, **attrs):
+    """Times a block as a named stage on the shared tracer."""
+    return tracer.span(name, **attrs)
+
+def annotate(**attrs):
+    tracer.annotate(**attrs)
+
+def incr(name, value=1):
+    tracer.incr(name, value)
+
+def traced(name=None):
+    """Decorator that records every call of a function as a span."""
+    def decorator(func):
+        stage = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
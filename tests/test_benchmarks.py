@@ -0,0 +1,46 @@
+import unittest
+import requests
+from benchmarks.mock_server import MockChatServer, CANNED_SOLUTIONS
+from benchmarks.bench_pipeline import percentile
+from prompts.mutations.client import ChatClient
+
+
+class TestMockServer(unittest.TestCase):
+
+    def test_chat_completion_shape(self):
+        """Test that the stand-in answers like the chat-completions API."""
+        with MockChatServer() as server:
+            client = ChatClient(endpoint=server.url, api_key="test")
+            completion = client.complete("Write code", temperature=0.5)
+            client.close()
+        self.assertIn(completion['choices'][0]['message']['content'], CANNED_SOLUTIONS)
+        self.assertEqual(server.requests, 1)
+
+    def test_rate_limited_responses(self):
+        """Test that configured 429s carry a Retry-After header."""
+        with MockChatServer(rate_429=1.0, retry_after=3) as server:
+            response = requests.post(server.url, json={"messages": []}, timeout=5)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers["Retry-After"], "3")
+
+    def test_streamed_completion(self):
+        """Test that streamed chunks reassemble into the non-streamed content."""
+        with MockChatServer() as server:
+            client = ChatClient(endpoint=server.url, api_key="test")
+            whole = client.complete("Write code", temperature=0.5)['choices'][0]['message']['content']
+            streamed = "".join(client.stream("Write code", temperature=0.5))
+            client.close()
+        self.assertEqual(streamed, whole)
+
+
+class TestBenchHelpers(unittest.TestCase):
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles used in reports."""
+        samples = [i / 100 for i in range(100)]
+        self.assertEqual(percentile(samples, 0.5), 0.5)
+        self.assertEqual(percentile(samples, 0.99), 0.99)
+        self.assertEqual(percentile([], 0.5), 0.0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import shutil
+import unittest
+from unittest.mock import patch
+from cache import DiskCache, make_key
+from prompts.mutations import mutation
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestDiskCache(unittest.TestCase):
+
+    def test_make_key_is_stable(self):
+        """Test that keys depend only on content, not argument order."""
+        self.assertEqual(make_key("p", a=1, b=2), make_key("p", b=2, a=1))
+        self.assertNotEqual(make_key("p", a=1), make_key("p", a=2))
+
+    def test_hit_rate(self):
+        """Test hit and miss counters."""
+        cache = DiskCache(":memory:")
+        self.assertIsNone(cache.get("k"))
+        cache.set("k", {"v": 1})
+        self.assertEqual(cache.get("k"), {"v": 1})
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["hit_rate"], 0.5)
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first."""
+        clock = FakeClock()
+        cache = DiskCache(":memory:", max_entries=2, clock=clock)
+        cache.set("a", 1)
+        clock.now += 1
+        cache.set("b", 2)
+        clock.now += 1
+        cache.get("a")
+        clock.now += 1
+        cache.set("c", 3)
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertIn("c", cache)
+
+    def test_ttl_expiry(self):
+        """Test that entries older than the TTL are treated as misses."""
+        clock = FakeClock()
+        cache = DiskCache(":memory:", ttl=10, clock=clock)
+        cache.set("k", "v")
+        clock.now += 11
+        self.assertIsNone(cache.get("k"))
+
+    def test_persists_across_instances(self):
+        """Test that a file-backed cache survives reopening."""
+        path = "cache_test/responses.db"
+        try:
+            cache = DiskCache(path)
+            cache.set("k", "v")
+            cache.close()
+            self.assertEqual(DiskCache(path).get("k"), "v")
+        finally:
+            shutil.rmtree("cache_test", ignore_errors=True)
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def tearDown(self):
+        mutation.configure_cache("off")
+
+    @patch('requests.Session.post')
+    def test_replay_serves_without_network(self, mock_post):
+        """Test that a recorded run can be replayed with zero network calls."""
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.headers = {}
+        mock_post.return_value.json.return_value = {
+            'choices': [{'message': {'content': 'print(8)'}}]
+        }
+        mutation.configure_cache("on", ":memory:")
+        self.assertEqual(mutation.generate_solution("x + 2 = 10", temperature=0.4), 'print(8)')
+        self.assertEqual(mock_post.call_count, 1)
+
+        # Reuse the populated in-memory cache in replay mode
+        cache = mutation._response_cache
+        mutation._cache_mode = "replay"
+        self.assertEqual(mutation.generate_solution("x + 2 = 10", temperature=0.4), 'print(8)')
+        self.assertIsNone(mutation.generate_solution("x + 3 = 10", temperature=0.4))
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_invalid_mode(self):
+        """Test that unknown cache modes are rejected."""
+        with self.assertRaises(ValueError):
+            mutation.configure_cache("sometimes")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+from checkpoint import CheckpointJournal, problem_key
+from population import Candidate
+from process_problems import stream_problems, run_problems, process_problem
+
+
+class TestProblemStream(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def write(self, name, content):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(content)
+        return path
+
+    def test_text_and_jsonl_sources(self):
+        """Test that text and JSONL sources yield the same problems."""
+        text = self.write("p.txt", "First\n\nSecond\n")
+        jsonl = self.write("p.jsonl", '{"problem": "First"}\n"Second"\n')
+        self.assertEqual([r.problem for r in stream_problems(text)], ["First", "Second"])
+        self.assertEqual([r.problem for r in stream_problems(jsonl)], ["First", "Second"])
+
+    def test_seek_to_offset(self):
+        """Test that a stream can restart from a recorded offset."""
+        path = self.write("p.txt", "First\nSecond\nThird\n")
+        records = list(stream_problems(path))
+        resumed = list(stream_problems(path, start=(1, records[0].next_offset)))
+        self.assertEqual(resumed, records[1:])
+
+
+class TestCheckpointJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "checkpoint.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_resume_point_and_state(self):
+        """Test that a replayed journal knows finished and in-progress problems."""
+        journal = CheckpointJournal(self.path, source="p.txt")
+        journal.record_done(problem_key(0, "A"), 0, 95, {'code': 'print(1)'}, next_offset=2)
+        journal.record_generation(problem_key(1, "B"), 1, [{'code': 'print(2)'}], 50, None)
+        journal.record_done(problem_key(2, "C"), 2, 80, None, next_offset=6)
+        journal.close()
+
+        resumed = CheckpointJournal(self.path, source="p.txt", resume=True)
+        self.assertTrue(resumed.is_done(problem_key(0, "A")))
+        self.assertFalse(resumed.is_done(problem_key(1, "B")))
+        self.assertEqual(resumed.state(problem_key(1, "B"))['generation'], 1)
+        self.assertEqual(resumed.resume_point(), (1, 2))
+        resumed.close()
+
+        with self.assertRaises(ValueError):
+            CheckpointJournal(self.path, source="other.txt", resume=True)
+
+    def test_torn_write_ignored(self):
+        """Test that a partial final record from a crash is ignored."""
+        journal = CheckpointJournal(self.path)
+        journal.record_done(problem_key(0, "A"), 0, 95, None, next_offset=2)
+        journal.close()
+        with open(self.path, "a") as file:
+            file.write('{"type": "done", "key"')
+        resumed = CheckpointJournal(self.path, resume=True)
+        self.assertTrue(resumed.is_done(problem_key(0, "A")))
+        resumed.close()
+
+    @patch('process_problems.record_best')
+    @patch('process_problems.mutate_survivors')
+    @patch('process_problems.select_survivors')
+    @patch('process_problems.generate_population')
+    def test_process_problem_resumes_generation(self, mock_generate, mock_select, mock_mutate, _):
+        """Test that an unfinished problem restarts at its last recorded generation."""
+        candidate = {'code': 'print(1)', 'fitness': 60, 'generation': 1}
+        mock_select.side_effect = lambda population, problem: population
+        mock_mutate.side_effect = lambda survivors, problem, **kwargs: survivors
+
+        journal = CheckpointJournal(self.path)
+        key = problem_key(0, "A")
+        journal.record_generation(key, 2, [candidate], 60, candidate)
+        process_problem("A", generations=3, journal=journal, key=key)
+        journal.close()
+
+        mock_generate.assert_not_called()
+        self.assertEqual(mock_select.call_count, 1)
+
+    @patch('process_problems.process_problem')
+    def test_run_skips_finished_problems(self, mock_process):
+        """Test that problems already marked done are not processed again."""
+        mock_process.side_effect = lambda problem, **kwargs: Candidate(f"print({problem!r})", fitness=70)
+        journal = CheckpointJournal(self.path)
+        journal.record_done(problem_key(0, "A"), 0, 95, None)
+        run_problems(["A", "B"], rate_per_minute=0, journal=journal)
+        journal.close()
+        self.assertEqual([c.args[0] for c in mock_process.call_args_list], ["B"])
+
+if __name__ == "__main__":
+    unittest.main()
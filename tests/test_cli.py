@@ -0,0 +1,70 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+import yaml
+import cli
+import process_problems
+from leaderboard import close_store, update_leaderboard
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def loaded_modules(code, modules):
+    """Which of modules a fresh interpreter has imported after running code."""
+    check = f"{code}\nimport sys\nprint(' '.join(m for m in {modules!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", check], cwd=ROOT, capture_output=True, text=True,
+                            check=True)
+    return result.stdout.split()
+
+
+class TestCommands(unittest.TestCase):
+
+    @patch('process_problems.main')
+    def test_run_and_resume_pass_options_through(self, mock_main):
+        cli.main(["run", "--workers", "4", "--no-batch"])
+        self.assertEqual(mock_main.call_args.args[0], ["--workers", "4", "--no-batch"])
+        cli.main(["resume", "--checkpoint", "run.jsonl"])
+        self.assertEqual(mock_main.call_args.args[0], ["--resume", "--checkpoint", "run.jsonl"])
+
+    def test_export_leaderboard(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            store = os.path.join(tmpdir, "leaderboard.db")
+            output = os.path.join(tmpdir, "leaderboard.yaml")
+            update_leaderboard("Problem 1", 85, "solutions.db#abc", False, leaderboard_file=store)
+            close_store(store)
+            cli.main(["export-leaderboard", "--leaderboard", store, "--output", output])
+            with open(output) as file:
+                self.assertEqual(yaml.safe_load(file)["Problem 1"]["score"], 85)
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+class TestStartup(unittest.TestCase):
+
+    def test_heavy_imports_are_lazy(self):
+        """Test importing the pipeline leaves HTTP, YAML and dotenv unloaded until they're used."""
+        self.assertEqual(loaded_modules("import process_problems", ("requests", "yaml", "dotenv")), [])
+        self.assertEqual(loaded_modules("import cli", ("process_problems", "numpy")), [])
+
+    @patch('process_problems.subprocess.run')
+    def test_image_rebuilt_only_when_files_change(self, mock_run):
+        """Test an image labelled with the current fingerprint is reused without a build."""
+        mock_run.return_value = subprocess.CompletedProcess([], 0, process_problems.image_fingerprint() + "\n")
+        self.assertTrue(process_problems.build_docker_image())
+        self.assertEqual(mock_run.call_count, 1)
+        self.assertEqual(mock_run.call_args.args[0][:3], ["docker", "image", "inspect"])
+
+        mock_run.return_value = subprocess.CompletedProcess([], 0, "stale\n")
+        self.assertTrue(process_problems.build_docker_image())
+        build = mock_run.call_args.args[0]
+        self.assertEqual(build[:2], ["docker", "build"])
+        self.assertIn(f"pmp.fingerprint={process_problems.image_fingerprint()}", build)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import io
+import unittest
+from unittest.mock import patch
+import requests
+from prompts.mutations.client import (
+    ChatClient, LatencyStats, LocalChatClient, OpenAIChatClient, SYSTEM_MESSAGE, create_client,
+    set_client
+)
+from prompts.mutations import mutation
+
+
+class TestChatClient(unittest.TestCase):
+
+    def test_session_reused_with_pooled_adapter(self):
+        """Test that the client shares one session with a sized connection pool."""
+        client = ChatClient(endpoint="https://example.invalid/chat", api_key="key", pool_size=4)
+        adapter = client.session.get_adapter("https://example.invalid/chat")
+        self.assertEqual(adapter._pool_maxsize, 4)
+        self.assertEqual(client.session.headers["api-key"], "key")
+        client.close()
+
+    def test_payload_reuses_system_message(self):
+        """Test that payloads share the prebuilt system message."""
+        client = ChatClient(endpoint="https://example.invalid/chat", api_key="key")
+        payload = client.build_payload("Solve it", temperature=0.5)
+        self.assertIs(payload["messages"][0], SYSTEM_MESSAGE)
+        self.assertEqual(payload["temperature"], 0.5)
+        client.close()
+
+    @patch('requests.Session.post')
+    def test_complete_records_latency(self, mock_post):
+        """Test that every request passes a timeout and is timed."""
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.headers = {}
+        mock_post.return_value.json.return_value = {'choices': []}
+        client = ChatClient(endpoint="https://example.invalid/chat", api_key="key", timeout=(1, 2))
+        client.complete("Solve it")
+        self.assertEqual(mock_post.call_args.kwargs["timeout"], (1, 2))
+        self.assertEqual(client.stats.summary()["count"], 1)
+        client.close()
+
+    @patch('requests.Session.post')
+    def test_stream_decodes_utf8_without_charset(self, mock_post):
+        """Test non-ASCII code in an event stream without a charset arrives intact."""
+        response = requests.Response()
+        response.status_code = 200
+        response.headers["Content-Type"] = "text/event-stream"
+        response.raw = io.BytesIO('data: {"choices": [{"delta": {"content": "print(\'π ≈ 3.14\')"}}]}\n\n'
+                                  'data: [DONE]\n\n'.encode("utf-8"))
+        mock_post.return_value = response
+        client = ChatClient(endpoint="https://example.invalid/chat", api_key="key")
+        self.assertEqual(list(client.stream("Print pi")), ["print('π ≈ 3.14')"])
+        client.close()
+
+    def test_latency_percentiles(self):
+        """Test latency summary percentiles."""
+        stats = LatencyStats()
+        for ms in range(1, 101):
+            stats.record(ms / 1000)
+        summary = stats.summary()
+        self.assertEqual(summary["count"], 100)
+        self.assertAlmostEqual(summary["p95"], 0.096)
+        self.assertAlmostEqual(summary["max"], 0.1)
+
+
+class TestBackends(unittest.TestCase):
+
+    def test_openai_compatible_payload(self):
+        """Test bearer auth, model and plain-string messages for OpenAI-compatible servers."""
+        client = OpenAIChatClient(endpoint="http://localhost:8000/v1", api_key="key", model="m")
+        self.assertEqual(client.endpoint, "http://localhost:8000/v1/chat/completions")
+        self.assertEqual(client.session.headers["Authorization"], "Bearer key")
+        payload = client.build_payload("Solve it", n=2)
+        self.assertEqual(payload["model"], "m")
+        self.assertEqual(payload["messages"][1], {"role": "user", "content": "Solve it"})
+        self.assertEqual(payload["n"], 2)
+        client.close()
+
+    def test_local_backend_is_deterministic(self):
+        """Test the local stand-in answers the same request identically without sleeping for real."""
+        delays = []
+        client = LocalChatClient(latency=0.5, sleep=delays.append)
+        first = client.complete("Solve this problem: \"Convert 25 degrees Celsius to Fahrenheit.\"", n=3)
+        second = client.complete("Solve this problem: \"Convert 25 degrees Celsius to Fahrenheit.\"", n=3)
+        self.assertEqual(first, second)
+        self.assertEqual(len(first["choices"]), 3)
+        self.assertIn("25", first["choices"][0]["message"]["content"])
+        self.assertEqual(delays, [0.5, 0.5])
+
+    def test_generation_through_local_backend(self):
+        """Test the mutation layer dispatches through whichever backend is configured."""
+        set_client(create_client("local", latency=0))
+        try:
+            solution = mutation.generate_solution("Calculate the volume of a cube with side length 3.")
+            self.assertIn("3", solution)
+            compile(solution, "<solution>", "exec")
+            rephrased, _ = mutation.mutate_problem("Find the largest prime number less than 100.")
+            self.assertIn("largest prime", rephrased)
+        finally:
+            set_client(None)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            create_client("nope")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import yaml
+from leaderboard import LeaderboardStore, close_store, get_store, import_legacy_leaderboard
+
+
+class TestLeaderboardStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "leaderboard.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_top_k_ordering(self):
+        """Test that only the top k entries are kept, best first."""
+        store = LeaderboardStore(self.path)
+        for i, score in enumerate([40, 95, 70, 85]):
+            store.update(f"Problem {i}", score, f"s{i}.py", False, k=2)
+        self.assertEqual(list(store.top()), ["Problem 1", "Problem 3"])
+        self.assertEqual(store.top()["Problem 1"]["status"], "solved")
+        store.close()
+
+    def test_concurrent_updates(self):
+        """Test that concurrent writers from separate connections don't lose updates."""
+        def worker(offset):
+            store = LeaderboardStore(self.path)
+            for i in range(10):
+                store.update(f"Problem {offset + i}", offset + i, "s.py", False, k=100)
+            store.close()
+
+        LeaderboardStore(self.path).close()  # Create the schema once
+        threads = [threading.Thread(target=worker, args=(n * 10,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(LeaderboardStore(self.path).top()), 40)
+
+    def test_yaml_round_trip(self):
+        """Test exporting to and importing from the legacy YAML format."""
+        store = LeaderboardStore(self.path)
+        store.update("Problem 1", 90, "s1.py", True)
+        yaml_file = os.path.join(self.tmpdir, "leaderboard.yaml")
+        store.export_yaml(yaml_file)
+        with open(yaml_file) as file:
+            self.assertEqual(yaml.safe_load(file)["Problem 1"]["mutation_used"], True)
+
+        other = LeaderboardStore(os.path.join(self.tmpdir, "other.db"))
+        other.import_yaml(yaml_file)
+        self.assertEqual(other.top(), store.top())
+
+
+    def test_legacy_yaml_imported_into_empty_store(self):
+        """Test the YAML history of an older version is carried into a new store, and only once."""
+        yaml_file = os.path.join(self.tmpdir, "leaderboard.yaml")
+        with open(yaml_file, "w") as file:
+            yaml.dump({"Problem 1": {"score": 90, "solution_file": "output/a.py", "mutation_used": False}}, file)
+        try:
+            self.assertEqual(import_legacy_leaderboard(self.path, yaml_file), 1)
+            get_store(self.path).update("Problem 2", 70, "output/b.py", False)
+            self.assertEqual(import_legacy_leaderboard(self.path, yaml_file), 0)
+            self.assertEqual(list(get_store(self.path).top()), ["Problem 1", "Problem 2"])
+            self.assertEqual(import_legacy_leaderboard(os.path.join(self.tmpdir, "new.db"), None), 0)
+        finally:
+            close_store(self.path)
+            close_store(os.path.join(self.tmpdir, "new.db"))
+
+if __name__ == "__main__":
+    unittest.main()
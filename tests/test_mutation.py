@@ -0,0 +1,137 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import requests
+from prompts.mutations import mutation
+from prompts.mutations.client import set_client
+
+
+def completion(*contents):
+    return {'choices': [{'message': {'content': content}} for content in contents]}
+
+
+class TestBatchedGeneration(unittest.TestCase):
+
+    def tearDown(self):
+        mutation.set_batch_generation(True)
+
+    @patch('requests.Session.post')
+    def test_one_request_for_whole_population(self, mock_post):
+        """Test that n candidates arrive in a single request and are validated locally."""
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.headers = {}
+        mock_post.return_value.json.return_value = completion("print(1)", "```python\nprint(2)\n```", "print(3)")
+        solutions = mutation.generate_solutions("Print a number", 3)
+        self.assertEqual(solutions, ["print(1)", "print(2)", "print(3)"])
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual(mock_post.call_args.kwargs['json']['n'], 3)
+
+    @patch('requests.Session.post')
+    def test_retries_only_invalid_candidates(self, mock_post):
+        """Test that follow-up requests only ask for candidates that failed validation."""
+        first, second = MagicMock(status_code=200, headers={}), MagicMock(status_code=200, headers={})
+        first.json.return_value = completion("print(1)", "not python at all", "print(3)")
+        second.json.return_value = completion("print(4)")
+        mock_post.side_effect = [first, second]
+        solutions = mutation.generate_solutions("Print a number", 3)
+        self.assertEqual(solutions, ["print(1)", "print(3)", "print(4)"])
+        self.assertNotIn('n', mock_post.call_args.kwargs['json'])
+
+    @patch('requests.Session.post')
+    def test_ignored_n_disables_batching(self, mock_post):
+        """Test that an endpoint returning a single choice switches batching off."""
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.headers = {}
+        mock_post.return_value.json.return_value = completion("print(1)")
+        self.assertEqual(mutation.generate_solutions("Print a number", 3), ["print(1)"])
+        self.assertFalse(mutation.batch_generation_enabled())
+
+    @patch('requests.Session.post')
+    def test_rejected_n_disables_batching(self, mock_post):
+        """Test that a 400 for the batched request switches batching off."""
+        response = MagicMock(status_code=400)
+        mock_post.return_value.status_code = 400
+        mock_post.return_value.headers = {}
+        mock_post.return_value.raise_for_status.side_effect = requests.exceptions.HTTPError(response=response)
+        self.assertEqual(mutation.generate_solutions("Print a number", 3), [])
+        self.assertFalse(mutation.batch_generation_enabled())
+
+class FakeStreamClient:
+    """Streams canned chunks and records how many were consumed."""
+
+    name = "fake"
+
+    def __init__(self, *streams):
+        self.streams = list(streams)
+        self.consumed = []
+        self.closed = 0
+
+    def stream(self, prompt, **kwargs):
+        chunks = self.streams.pop(0)
+        self.consumed.append(0)
+        try:
+            for chunk in chunks:
+                self.consumed[-1] += 1
+                yield chunk
+        finally:
+            self.closed += 1
+
+    def close(self):
+        pass
+
+
+class TestStreaming(unittest.TestCase):
+
+    def setUp(self):
+        mutation.set_streaming(True)
+
+    def tearDown(self):
+        mutation.set_streaming(False)
+        set_client(None)
+
+    def test_check_prefix(self):
+        """Test unfinished code passes while prose and broken blocks fail."""
+        for source in ["def f(x):\n", "y = [1,\n", "s = '''\nprose\n", "try:\n    x = 1\n", "@dec\n"]:
+            mutation.check_prefix(source)
+        for source in ["Here is the solution:\n", "if x:\nprint(1)\n", "Sure! Here's the code\n"]:
+            with self.assertRaises(SyntaxError):
+                mutation.check_prefix(source)
+
+    def test_closing_fence_completes(self):
+        """Test a closed ``` block ends the stream and drops the trailing explanation."""
+        validator = mutation.StreamValidator()
+        self.assertFalse(validator.feed("```python\nprint("))
+        self.assertTrue(validator.feed("1)\n```\nThis prints 1."))
+        self.assertEqual(validator.finish(), "print(1)")
+
+    def test_too_long_aborts(self):
+        """Test code past the length that zeroes the complexity score is abandoned."""
+        validator = mutation.StreamValidator(max_length=40)
+        with self.assertRaises(mutation.StreamAborted):
+            for index in range(10):
+                validator.feed(f"value_{index} = {index}\n")
+
+    def test_length_limit_follows_scoring_weights(self):
+        """Test long code streams to the end when the active weights don't score length."""
+        from process_problems import configure_scoring
+        lines = [f"value_{index} = {index}\n" for index in range(40)] + ["print(value_0)\n"]
+        try:
+            configure_scoring("kolmogorov")
+            set_client(FakeStreamClient(lines))
+            self.assertEqual(mutation.generate_solution("Print 0", max_attempts=1), "".join(lines).strip())
+            configure_scoring("length")
+            set_client(FakeStreamClient(lines))
+            self.assertIsNone(mutation.generate_solution("Print 0", max_attempts=1))
+        finally:
+            configure_scoring()
+
+    def test_bad_stream_abandoned_early(self):
+        """Test a prose answer is dropped after its first line and the next attempt is used."""
+        prose = ["Here is the", " solution:\n", "```python\n"] + ["x = 1\n"] * 50
+        client = FakeStreamClient(prose, ["print(", "8)\n"])
+        set_client(client)
+        self.assertEqual(mutation.generate_solution("Print 8"), "print(8)")
+        self.assertEqual(client.consumed, [2, 2])
+        self.assertEqual(client.closed, 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import threading
+import time
+import unittest
+from unittest.mock import patch
+from pipeline import pipelined
+from population import Candidate
+from process_problems import configure_speculation, mutate_survivors
+
+
+class TestPipelined(unittest.TestCase):
+
+    def test_generation_overlaps_evaluation(self):
+        """Test the next request goes out while the previous candidate is still being evaluated."""
+        second_requested = threading.Event()
+
+        def generate(item):
+            if item == 2:
+                second_requested.set()
+            return item * 10
+
+        def evaluate(value):
+            if value == 10:
+                self.assertTrue(second_requested.wait(timeout=5))
+            return value + 1
+
+        results = list(pipelined([1, 2, 3], generate, evaluate, depth=2, workers=1))
+        self.assertEqual(results, [(1, 11), (2, 21), (3, 31)])
+
+    def test_results_in_item_order_and_none_skips_evaluation(self):
+        evaluated = []
+
+        def generate(item):
+            time.sleep(0.05 * (3 - item))  # Later items arrive first
+            return None if item == 2 else item
+
+        def evaluate(value):
+            evaluated.append(value)
+            return value
+
+        self.assertEqual(list(pipelined([1, 2, 3], generate, evaluate, depth=3)),
+                         [(1, 1), (2, None), (3, 3)])
+        self.assertEqual(sorted(evaluated), [1, 3])
+
+    def test_closing_cancels_pending_work(self):
+        """Test breaking out stops requests that have not started yet."""
+        started = []
+        release = threading.Event()
+
+        def generate(item):
+            started.append(item)
+            if item == 2:
+                release.wait(timeout=5)  # Still in flight when the consumer stops
+            return item
+
+        results = pipelined(range(10), generate, lambda value: value, depth=1)
+        for item, _ in results:
+            if item == 1:
+                break
+        results.close()
+        release.set()
+        time.sleep(0.1)
+        self.assertIn(started, ([0, 1], [0, 1, 2]))
+
+
+    def test_closing_cancels_queued_evaluations(self):
+        """Test evaluations waiting for a worker are dropped on close, without shutdown(cancel_futures)."""
+        evaluated = []
+        busy, release = threading.Event(), threading.Event()
+
+        def evaluate(value):
+            evaluated.append(value)
+            if value == 1:
+                busy.set()
+                release.wait(timeout=5)
+            return value
+
+        results = pipelined(range(4), lambda item: item, evaluate, depth=4, workers=1)
+        self.assertEqual(next(results), (0, 0))
+        self.assertTrue(busy.wait(timeout=5))
+        time.sleep(0.05)  # Items 2 and 3 are generated and queued behind item 1
+        results.close()
+        release.set()
+        time.sleep(0.1)
+        self.assertEqual(evaluated, [0, 1])
+
+class TestSpeculativeMutation(unittest.TestCase):
+
+    def tearDown(self):
+        configure_speculation(0)
+
+    @patch('process_problems.mutate_problem', return_value=("Print any number", "rephrase"))
+    @patch('process_problems.generate_solution')
+    @patch('process_problems.measure')
+    def test_stops_at_early_stop_fitness(self, mock_measure, mock_generate, *_):
+        """Test mutants are accepted in attempt order and the rest are dropped once one scores 90+."""
+        configure_speculation(3)
+        mock_generate.side_effect = lambda prompt, temperature, sample: f"print({int(temperature * 10)})"
+        mock_measure.side_effect = lambda code, problem: {'length': len(code), 'success': True}
+        parent = Candidate('print("a longer parent solution")', fitness=50)
+        population = mutate_survivors([parent], "Print a number", target_population_size=3)
+        self.assertEqual([c.code for c in population], [parent.code, "print(4)"])
+        self.assertEqual(population[1].generation, 2)
+
+    @patch('process_problems.mutate_problem', return_value=("Print any number", "rephrase"))
+    @patch('process_problems.generate_solution')
+    @patch('process_problems.measure')
+    def test_depth_limited_to_open_slots_and_duplicates_skipped(self, mock_measure, mock_generate, *_):
+        """Test one open slot means one request in flight, and a mutant already present isn't evaluated."""
+        configure_speculation(3)
+        parent = Candidate('print("a longer parent solution")', fitness=50)
+        other = Candidate('print("another survivor")', fitness=40)
+        lock = threading.Lock()
+        in_flight = [0, 0]  # Current, peak
+
+        def generate(prompt, temperature, sample):
+            with lock:
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight)
+            time.sleep(0.05)
+            with lock:
+                in_flight[0] -= 1
+            return other.code if temperature < 0.45 else f"print({int(temperature * 10)})"
+
+        mock_generate.side_effect = generate
+        mock_measure.side_effect = lambda code, problem: {'length': len(code), 'success': True}
+        population = mutate_survivors([parent, other], "Print a number", target_population_size=3)
+        self.assertEqual(in_flight[1], 1)
+        self.assertNotIn(other.code, [c.args[0] for c in mock_measure.call_args_list])
+        self.assertEqual([c.code for c in population], [parent.code, other.code, "print(5)"])
+
+
+if __name__ == "__main__":
+    unittest.main()
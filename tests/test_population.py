@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+import unittest
+from archive import SolutionArchive
+from population import Candidate, Population
+
+
+class TestPopulation(unittest.TestCase):
+
+    def test_candidate_has_no_dict(self):
+        """Test that candidates use slots instead of a per-instance dict."""
+        candidate = Candidate("print(1)")
+        self.assertFalse(hasattr(candidate, "__dict__"))
+        with self.assertRaises(AttributeError):
+            candidate.file_path = "a.py"
+
+    def test_population_dedupes_sources(self):
+        """Test identical sources are kept once, in insertion order."""
+        population = Population([Candidate("print(1)"), Candidate("print(2)"), Candidate("print(1)\n")])
+        self.assertEqual([c.code for c in population], ["print(1)", "print(2)"])
+        self.assertFalse(population.add(Candidate("print(2)", fitness=90)))
+
+    def test_sort_and_slice(self):
+        """Test ordering by fitness and that slices stay populations."""
+        population = Population([Candidate("a", 10), Candidate("b", 30), Candidate("c", 20)])
+        population.sort()
+        top = population[:2]
+        self.assertIsInstance(top, Population)
+        self.assertEqual([c.code for c in top], ["b", "c"])
+        self.assertEqual(population.best().code, "b")
+
+    def test_dict_round_trip(self):
+        candidate = Candidate.from_dict({"code": "print(1)", "fitness": 60, "generation": 2,
+                                         "file_path": "legacy.py"})
+        self.assertEqual(Candidate.from_dict(candidate.to_dict()).to_dict(), candidate.to_dict())
+
+
+class TestSolutionArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.archive = SolutionArchive(os.path.join(self.tmpdir, "solutions.db"))
+
+    def tearDown(self):
+        self.archive.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_survivors_stored_once(self):
+        """Test a survivor carried across generations keeps one row with its best fitness."""
+        survivor = Candidate("print(1)", fitness=40)
+        self.archive.store("P", [survivor])
+        survivor.fitness = 60
+        self.archive.store("P", [survivor, Candidate("print(2)", fitness=50)])
+        entries = self.archive.solutions(problem="P")
+        self.assertEqual([(e["code"], e["fitness"]) for e in entries], [("print(1)", 60), ("print(2)", 50)])
+
+    def test_winner_reference(self):
+        """Test winners resolve from their leaderboard reference and are not demoted."""
+        winner = Candidate("print(3)", fitness=95)
+        ref, = self.archive.store("P", [winner], role="winner")
+        self.archive.store("P", [winner])
+        self.assertEqual(self.archive.get(ref), "print(3)")
+        self.assertEqual(len(self.archive.solutions(role="winner")), 1)
+        paths = self.archive.export(os.path.join(self.tmpdir, "out"))
+        with open(paths[0]) as file:
+            self.assertEqual(file.read(), "print(3)")
+
+
+if __name__ == "__main__":
+    unittest.main()
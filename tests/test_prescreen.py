@@ -0,0 +1,73 @@
+import ast
+import sys
+import unittest
+from prescreen import Prescreener, canonical_ast, static_check
+from sandbox import ExecutionResult
+
+
+class TestStaticCheck(unittest.TestCase):
+
+    def check(self, code):
+        return static_check(ast.parse(code))
+
+    def test_accepts_plausible_code(self):
+        """Test that ordinary solutions pass."""
+        code = "import math\n\ndef area(r):\n    return math.pi * r ** 2\n\nprint(area(2))"
+        self.assertIsNone(self.check(code))
+        self.assertIsNone(self.check("[print(i) for i in range(3)]"))
+
+    def test_indirect_output_accepted(self):
+        """Test print used without a direct call, or stdout written through an alias, counts as output."""
+        for code in ["list(map(print, [1, 2]))", "p = print\np(1)",
+                     "import sys\nout = sys.stdout.write\nout('1\\n')",
+                     "from sys import stdout\nw = stdout.write\nw('1')"]:
+            self.assertIsNone(self.check(code), code)
+
+    @unittest.skipIf(sys.version_info < (3, 10), "Pattern matching needs Python 3.10")
+    def test_match_captures_are_bound(self):
+        """Test names captured by star and mapping-rest patterns aren't reported as undefined."""
+        code = ("match [1, 2, 3]:\n    case [first, *rest]:\n        print(first, rest)\n"
+                "match {'a': 1}:\n    case {'a': 1, **others}:\n        print(others)")
+        self.assertIsNone(self.check(code))
+
+    def test_rejects_silent_code(self):
+        """Test that code that prints nothing is rejected."""
+        self.assertEqual(self.check("def f(x):\n    return x\n\nf(1)"), "prints nothing")
+
+    def test_rejects_undefined_names(self):
+        """Test that references to names bound nowhere are rejected."""
+        self.assertEqual(self.check("print(radius * 2)"), "undefined names: radius")
+
+    def test_dynamic_namespaces_skip_name_check(self):
+        """Test that star imports don't cause false positives."""
+        self.assertIsNone(self.check("from math import *\nprint(pi)"))
+
+
+class TestPrescreener(unittest.TestCase):
+
+    def test_canonical_ast_ignores_formatting(self):
+        """Test that comments and spacing don't change the canonical AST."""
+        self.assertEqual(canonical_ast(ast.parse("x=1\nprint(x)")),
+                         canonical_ast(ast.parse("# set x\nx = 1\n\nprint( x )")))
+
+    def test_duplicates_reuse_results(self):
+        """Test that AST-identical candidates skip the sandbox."""
+        screen = Prescreener()
+        self.assertIsNone(screen.check("x = 1\nprint(x)"))
+        screen.remember("x = 1\nprint(x)", ExecutionResult("1", "", 0))
+        result = screen.check("x=1  # again\nprint(x)")
+        self.assertEqual(result.stdout, "1")
+        self.assertIsInstance(screen.check("print(undefined_thing)"), ExecutionResult)
+        self.assertIsInstance(screen.check("def broken(:"), ExecutionResult)
+        self.assertEqual(screen.container_runs_avoided, 3)
+
+    def test_dry_run_rejects_failures(self):
+        """Test that the optional dry run stops crashing or hanging code."""
+        screen = Prescreener(dry_run=True)
+        self.assertIsNone(screen.check("print(6 * 7)"))
+        self.assertFalse(screen.check("print(1)\nraise ValueError('bad')").success)
+        self.assertTrue(screen.check("while True:\n    print(1, end='')").timed_out)
+        self.assertEqual(screen.counters["rejected_dry_run"], 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,18 @@
 import unittest
 from unittest.mock import patch
 import os
+import shutil
+import tempfile
 import yaml
-from process_problems import load_problems, evaluate_solution, save_solution, update_leaderboard
+from process_problems import (
+    load_problems, evaluate_solution, save_solution, update_leaderboard, run_problems,
+    evaluate_fitness, configure_fitness_cache, clean_code, evaluate_population, mutate_survivors,
+    configure_prescreen, configure_archive, record_best
+)
+from sandbox import ExecutionResult
+from population import Candidate
+from leaderboard import export_leaderboard, close_store, get_store
+from prompts.mutations import mutation
 from prompts.mutations.mutation import generate_solution
 
 class TestProcessProblems(unittest.TestCase):
@@ -26,16 +36,19 @@ class TestProcessProblems(unittest.TestCase):
         with self.assertRaises(FileNotFoundError):
             load_problems("problems/non_existent_file.txt")
 
-    @patch('prompts.mutations.mutation.requests.post')
+    @patch('requests.Session.post')
     def test_generate_solution(self, mock_post):
         """Test if a solution is generated for a sample problem with mocked response."""
         problem = "Solve the equation x + 2 = 10."
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.headers = {}
         mock_post.return_value.json.return_value = {
-            'choices': [{'message': {'content': 'The solution is x = 8.'}}]
+            'choices': [{'message': {'content': 'x = 10 - 2\nprint(x)'}}]
         }
         solution = generate_solution(problem)
         self.assertIsNotNone(solution, "Failed to generate a solution for the problem")
-        self.assertEqual(solution, 'The solution is x = 8.', "Generated solution does not match expected value.")
+        self.assertEqual(solution, 'x = 10 - 2\nprint(x)', "Generated solution does not match expected value.")
+        self.assertIn('timeout', mock_post.call_args.kwargs, "Requests must always carry a timeout.")
 
     def test_evaluate_solution(self):
         """Test if the solution evaluation function works as expected."""
@@ -59,10 +72,12 @@ class TestProcessProblems(unittest.TestCase):
 
     def test_update_leaderboard(self):
         """Test updating the leaderboard."""
-        update_leaderboard("Problem 1", 100, "solution1.txt", False, "leaderboard_test.yaml", k=3)
-        update_leaderboard("Problem 2", 80, "solution2.txt", False, "leaderboard_test.yaml", k=3)
-        update_leaderboard("Problem 3", 90, "solution3.txt", False, "leaderboard_test.yaml", k=3)
-        update_leaderboard("Problem 4", 70, "solution4.txt", False, "leaderboard_test.yaml", k=3)
+        update_leaderboard("Problem 1", 100, "solution1.txt", False, "leaderboard_test.db", k=3)
+        update_leaderboard("Problem 2", 80, "solution2.txt", False, "leaderboard_test.db", k=3)
+        update_leaderboard("Problem 3", 90, "solution3.txt", False, "leaderboard_test.db", k=3)
+        update_leaderboard("Problem 4", 70, "solution4.txt", False, "leaderboard_test.db", k=3)
+        export_leaderboard("leaderboard_test.db", "leaderboard_test.yaml")
+        close_store("leaderboard_test.db")
 
         with open("leaderboard_test.yaml", "r") as file:
             leaderboard = yaml.safe_load(file)
@@ -73,6 +88,119 @@ class TestProcessProblems(unittest.TestCase):
         self.assertNotIn("Problem 4", leaderboard, "Problem 4 should not be in the leaderboard.")
 
         os.remove("leaderboard_test.yaml")  # Cleanup
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists("leaderboard_test.db" + suffix):
+                os.remove("leaderboard_test.db" + suffix)
+
+    @patch('process_problems.save_solution', return_value="output/winner.py")
+    def test_in_memory_archive_not_referenced(self, mock_save):
+        """Test a winner archived only in memory goes on the leaderboard as a saved file."""
+        configure_archive()
+        tmpdir = tempfile.mkdtemp()
+        store = os.path.join(tmpdir, "leaderboard.db")
+        try:
+            record_best("Problem 1", 95, Candidate("print(8)", fitness=95), leaderboard_file=store)
+            self.assertEqual(mock_save.call_args.args[0], "print(8)")
+            self.assertEqual(get_store(store).top()["Problem 1"]["solution_file"], "output/winner.py")
+        finally:
+            close_store(store)
+            shutil.rmtree(tmpdir)
+
+    @patch('process_problems.process_problem')
+    def test_run_problems_concurrent_order(self, mock_process):
+        """Test that concurrent runs return results in input order."""
+        mock_process.side_effect = lambda problem, **kwargs: {'problem': problem}
+        problems = [f"Problem {i}" for i in range(8)]
+        results = run_problems(problems, workers=4, rate_per_minute=0)
+        self.assertEqual([r['problem'] for r in results], problems)
+
+    @patch('process_problems.execute_code')
+    def test_evaluate_fitness_memoized(self, mock_execute):
+        """Test that identical normalized code is only executed once."""
+        mock_execute.return_value = ExecutionResult("8", "", 0)
+        configure_fitness_cache()
+        configure_prescreen(enabled=False)
+        first = "x = 10 - 2\nprint(x)"
+        second = "# comment\nx  =  10 - 2\n\nprint(x)\n"
+        try:
+            score = evaluate_fitness(first, "x + 2 = 10")
+            self.assertEqual(evaluate_fitness(second, "x + 2 = 10"), score)
+            self.assertEqual(mock_execute.call_count, 1)
+            evaluate_fitness(first, "x + 3 = 11")  # Different problem, new entry
+            self.assertEqual(mock_execute.call_count, 2)
+        finally:
+            configure_prescreen()
+
+    @patch('process_problems.execute_code')
+    def test_timeouts_and_sandbox_failures_not_memoized(self, mock_execute):
+        """Test a run that timed out or lost its sandbox is executed again next time."""
+        code = "x = 10 - 2\nprint(x)"
+        try:
+            for failed in (ExecutionResult("", "Timed out", -1, timed_out=True),
+                           ExecutionResult("", "Sandbox unavailable", -1, sandbox_error=True)):
+                configure_fitness_cache()
+                configure_prescreen()  # Fresh memo of earlier runs as well
+                mock_execute.reset_mock()
+                mock_execute.return_value = failed
+                failed_score = evaluate_fitness(code, "x + 2 = 10")
+                mock_execute.return_value = ExecutionResult("8", "", 0)
+                self.assertGreater(evaluate_fitness(code, "x + 2 = 10"), failed_score)
+                self.assertEqual(mock_execute.call_count, 2)
+        finally:
+            configure_prescreen()
+
+    def test_clean_code_keeps_indent(self):
+        """Test that the cache normalization keeps block structure."""
+        in_loop = "for i in range(3):\n    print(i)"
+        after_loop = "for i in range(3):\n    pass\nprint(i)"
+        self.assertEqual(clean_code(in_loop), "for i in range(3):\nprint(i)")
+        self.assertEqual(clean_code(in_loop, keep_indent=True), in_loop)
+        self.assertNotEqual(clean_code(in_loop, keep_indent=True), clean_code(after_loop, keep_indent=True))
+
+    @patch('process_problems.measure')
+    def test_evaluate_population_dedupes(self, mock_measure):
+        """Test batch evaluation runs each unique source once and yields every member."""
+        mock_measure.side_effect = lambda code, problem: {'length': len(code), 'success': True}
+        population = [Candidate('print(1)'), Candidate('print(1)\n# again'), Candidate('print(22)')]
+        results = list(evaluate_population(population, "problem", parallelism=2))
+        self.assertEqual(len(results), 3)
+        self.assertEqual(mock_measure.call_count, 2)
+        self.assertEqual(population[0].fitness, population[1].fitness)
+        self.assertEqual(population[2].metrics['length'], 9)
+        self.assertAlmostEqual(population[2].fitness, 70 * (1 - 9 / 500) + 30)
+
+    @patch('process_problems.mutate_problem', return_value=("Print any number", "rephrase"))
+    @patch('process_problems.generate_solution')
+    @patch('process_problems.measure')
+    def test_mutate_survivors_only_generates_missing(self, mock_measure, mock_generate, *_):
+        """Test mutants are batched and API calls stop once the population is full."""
+        mock_generate.side_effect = ["print(1)", "print(2)", "print(3)"]
+        mock_measure.return_value = {'length': 10, 'success': True}
+        parent = Candidate('print(0)', fitness=50)
+        population = mutate_survivors([parent], "Print a number", target_population_size=3)
+        self.assertEqual(len(population), 3)
+        self.assertEqual(mock_generate.call_count, 2)
+        self.assertEqual(population[1].generation, 2)
+
+    @patch('requests.Session.post')
+    @patch('process_problems.measure')
+    def test_stalled_generations_sample_afresh(self, mock_measure, mock_post):
+        """Test a generation that kept its parent doesn't get the last generation's cached mutants."""
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.headers = {}
+        mock_post.return_value.json.return_value = {'choices': [{'message': {'content': 'print(1)'}}]}
+        mock_measure.return_value = {'length': 10, 'success': True}
+        parent = Candidate('print(0)', fitness=1000)  # No mutant beats it
+        mutation.configure_cache("on", ":memory:")
+        try:
+            mutate_survivors([parent], "Print a number", generation=2)
+            first = mock_post.call_count
+            mutate_survivors([parent], "Print a number", generation=3)
+            self.assertEqual(mock_post.call_count, 2 * first)
+            mutate_survivors([parent], "Print a number", generation=3)  # Same generation replays
+            self.assertEqual(mock_post.call_count, 2 * first)
+        finally:
+            mutation.configure_cache("off")
 
 if __name__ == "__main__":
     unittest.main()
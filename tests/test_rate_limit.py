@@ -0,0 +1,170 @@
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from rate_limit import (
+    AdaptiveRateLimiter, CircuitBreaker, CircuitOpenError, FileTokenBucket, RequestScheduler,
+    TokenBucket, parse_retry_after
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_burst_then_throttle(self):
+        """Test that the bucket allows a burst up to capacity, then paces."""
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, capacity=2, clock=clock, sleep=clock.sleep)
+        self.assertTrue(bucket.try_acquire())
+        self.assertTrue(bucket.try_acquire())
+        self.assertFalse(bucket.try_acquire())
+        waited = bucket.acquire()
+        self.assertAlmostEqual(waited, 0.5)
+
+    def test_invalid_rate(self):
+        """Test that a non-positive rate is rejected."""
+        with self.assertRaises(ValueError):
+            TokenBucket(rate=0)
+
+    def test_pause_blocks_next_acquire(self):
+        """Test that a pause delays every caller."""
+        clock = FakeClock()
+        bucket = TokenBucket(rate=1, capacity=1, clock=clock, sleep=clock.sleep)
+        bucket.pause(5)
+        self.assertAlmostEqual(bucket.acquire(), 6)
+
+
+class TestFileTokenBucket(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_state_shared_between_instances(self):
+        """Test that two buckets on one file draw from the same budget."""
+        path = os.path.join(self.tmpdir, "bucket.json")
+        first = FileTokenBucket(path, rate=0.001, capacity=2)
+        second = FileTokenBucket(path, rate=0.001, capacity=2)
+        self.assertTrue(first.try_acquire())
+        self.assertTrue(second.try_acquire())
+        self.assertFalse(first.try_acquire())
+        second.set_rate(5)
+        self.assertEqual(first.rate, 5)
+
+
+def response(status, headers=None):
+    return SimpleNamespace(status_code=status, headers=headers or {})
+
+
+class StubLimiter:
+    def __init__(self):
+        self.paused = []
+        self.successes = 0
+
+    def acquire(self, tokens=0):
+        return 0.0
+
+    def on_success(self, headers=None):
+        self.successes += 1
+
+    def on_rate_limited(self, retry_after):
+        self.paused.append(retry_after)
+
+
+class TestRequestScheduler(unittest.TestCase):
+
+    def test_parse_retry_after(self):
+        """Test the Retry-After header variants."""
+        self.assertEqual(parse_retry_after({"retry-after": "3"}), 3.0)
+        self.assertEqual(parse_retry_after({"retry-after-ms": "1500"}), 1.5)
+        self.assertIsNone(parse_retry_after({}))
+
+    def test_honors_retry_after(self):
+        """Test that 429s pause the shared limiter for the advertised time."""
+        limiter = StubLimiter()
+        responses = iter([response(429, {"retry-after": "7"}), response(200)])
+        scheduler = RequestScheduler(limiter, sleep=lambda s: None)
+        self.assertEqual(scheduler.execute(lambda: next(responses)).status_code, 200)
+        self.assertEqual(limiter.paused, [7.0])
+        self.assertEqual(limiter.successes, 1)
+
+    def test_circuit_opens_on_repeated_server_errors(self):
+        """Test that repeated 5xx responses open the circuit."""
+        breaker = CircuitBreaker(failure_threshold=3, cooldown=60)
+        scheduler = RequestScheduler(StubLimiter(), breaker, max_attempts=3, sleep=lambda s: None)
+        self.assertEqual(scheduler.execute(lambda: response(503)).status_code, 503)
+        self.assertEqual(breaker.state, "open")
+        with self.assertRaises(CircuitOpenError):
+            scheduler.execute(lambda: response(200))
+
+    def test_breaker_half_open_trial(self):
+        """Test that one trial request is allowed after the cooldown."""
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, cooldown=10, clock=clock)
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+        clock.now += 10
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, "closed")
+
+    def test_unexpected_error_settles_half_open_trial(self):
+        """Test an exception outside retry_exceptions re-opens the circuit instead of wedging the trial."""
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, cooldown=10, clock=clock)
+        scheduler = RequestScheduler(StubLimiter(), breaker, max_attempts=3, sleep=lambda s: None)
+        breaker.record_failure()
+        clock.now += 10
+
+        def send():
+            raise ValueError("bad payload")
+
+        with self.assertRaises(ValueError):
+            scheduler.execute(send)
+        self.assertEqual(breaker.state, "open")
+        clock.now += 10
+        self.assertEqual(scheduler.execute(lambda: response(200)).status_code, 200)
+        self.assertEqual(breaker.state, "closed")
+
+    def test_transport_errors_retried_then_raised(self):
+        """Test that connection errors are retried and finally re-raised."""
+        calls = []
+
+        def send():
+            calls.append(1)
+            raise ConnectionError("down")
+
+        scheduler = RequestScheduler(StubLimiter(), CircuitBreaker(failure_threshold=10),
+                                     max_attempts=3, sleep=lambda s: None)
+        with self.assertRaises(ConnectionError):
+            scheduler.execute(send)
+        self.assertEqual(len(calls), 3)
+
+
+class TestAdaptiveRateLimiter(unittest.TestCase):
+
+    def test_aimd_and_advertised_ceiling(self):
+        """Test that 429s halve the rate and successes climb to the advertised limit."""
+        limiter = AdaptiveRateLimiter(requests_per_minute=100)
+        limiter.on_rate_limited(0)
+        self.assertEqual(limiter.requests_per_minute, 50)
+        limiter.on_success({"x-ratelimit-limit-requests": "51"})
+        limiter.on_success({})
+        self.assertEqual(limiter.requests_per_minute, 51)
+
+if __name__ == "__main__":
+    unittest.main()
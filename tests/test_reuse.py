@@ -0,0 +1,92 @@
+import unittest
+from unittest.mock import patch
+from archive import SolutionArchive
+from population import Candidate, Population
+from process_problems import configure_reuse, process_problem
+from reuse import ReuseIndex, terms
+
+PROBLEMS = [
+    "Determine the area of a circle with radius r.",
+    "Find the largest prime number less than 100.",
+    "Convert 25 degrees Celsius to Fahrenheit.",
+    "Calculate the volume of a cube with side length s.",
+]
+
+
+class TestReuseIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = ReuseIndex()
+        for number, problem in enumerate(PROBLEMS):
+            self.index.add(problem, f"print({number})", 90)
+
+    def test_terms_skip_stopwords(self):
+        self.assertEqual(terms("Find the largest prime below 50"), ["largest", "prime", "below", "50"])
+
+    def test_related_problems_ranked(self):
+        """Test near-duplicates match their solved counterpart and unrelated problems match nothing."""
+        similarity, entry = self.index.related("Convert 100 degrees Fahrenheit to Celsius")[0]
+        self.assertEqual(entry["problem"], PROBLEMS[2])
+        self.assertGreater(similarity, 0.5)
+        self.assertEqual(self.index.related("Find the largest prime below 50")[0][1]["code"], "print(1)")
+        self.assertEqual(self.index.related("Reverse the string hello"), [])
+        self.assertEqual(self.index.related(PROBLEMS[0]), [])  # Never its own solution
+
+    def test_keeps_best_solved_solution(self):
+        self.assertFalse(self.index.add(PROBLEMS[0], "print(9)", 40))
+        self.assertFalse(self.index.add(PROBLEMS[0], "print(9)", 85))
+        self.assertTrue(self.index.add(PROBLEMS[0], "print(3.14)", 95))
+        self.assertEqual(self.index.related("Area of a circle of radius 2")[0][1]["code"], "print(3.14)")
+        self.assertEqual(len(self.index), 4)
+
+    def test_from_archive_winners(self):
+        archive = SolutionArchive(":memory:")
+        archive.store(PROBLEMS[1], [Candidate("print(97)", fitness=92)], role="winner")
+        archive.store(PROBLEMS[2], [Candidate("print(77)", fitness=95)])  # Survivor only
+        index = ReuseIndex.from_archive(archive)
+        archive.close()
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index.related("Largest prime under 200")[0][1]["code"], "print(97)")
+
+
+class TestWarmStart(unittest.TestCase):
+
+    def tearDown(self):
+        configure_reuse(0)
+
+    @patch('process_problems.record_best')
+    @patch('process_problems.select_survivors')
+    @patch('process_problems.generate_population')
+    def test_related_solution_shown_as_example(self, mock_generate, mock_select, mock_record):
+        """Test a related solution goes into the prompt but never into the population or the leaderboard."""
+        index = ReuseIndex()
+        index.add(PROBLEMS[2], "print(25 * 9 / 5 + 32)", 92)
+        configure_reuse(2, index=index)
+        mock_generate.return_value = Population([Candidate("print(1)"), Candidate("print(2)")])
+        mock_select.side_effect = lambda population, problem: Population(
+            Candidate(c.code, fitness=95) for c in population)
+
+        process_problem("Convert 100 degrees Fahrenheit to Celsius", generations=1)
+
+        prompt = mock_generate.call_args.args[0]
+        self.assertTrue(prompt.startswith("Convert 100 degrees Fahrenheit to Celsius"))
+        self.assertIn("print(25 * 9 / 5 + 32)", prompt)
+        self.assertEqual([c.code for c in mock_select.call_args.args[0]], ["print(1)", "print(2)"])
+        self.assertEqual(mock_record.call_args.args[2].code, "print(1)")
+
+    @patch('process_problems.record_best')
+    @patch('process_problems.select_survivors', side_effect=lambda population, problem: Population())
+    @patch('process_problems.generate_population')
+    def test_seed_never_recorded_as_winner(self, mock_generate, _, mock_record):
+        """Test a problem whose own candidates all fail records nothing, even with a strong related solution."""
+        index = ReuseIndex()
+        index.add(PROBLEMS[0], "import math\nprint(math.pi * 2 ** 2)", 98)
+        configure_reuse(2, index=index)
+        mock_generate.return_value = Population([Candidate("print(0)")])
+
+        self.assertIsNone(process_problem("Determine the area of a square with side s.", generations=2))
+        self.assertIn("math.pi", mock_generate.call_args.args[0])
+        mock_record.assert_not_called()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+from sandbox import (
+    HARNESS, DockerPoolSandbox, ExecutionResult, SubprocessSandbox, _run, configure_sandbox,
+    close_sandbox, run_repeated
+)
+
+
+class TestSubprocessSandbox(unittest.TestCase):
+
+    def test_runs_code_from_stdin(self):
+        """Test that code is executed and its output captured."""
+        result = SubprocessSandbox().run("print(6 * 7)")
+        self.assertTrue(result.success)
+        self.assertEqual(result.stdout, "42")
+
+    def test_failure_and_timeout(self):
+        """Test that errors and timeouts are reported as failures."""
+        self.assertFalse(SubprocessSandbox().run("raise SystemExit(3)").success)
+        result = SubprocessSandbox(timeout=0.5).run("while True:\n    pass")
+        self.assertTrue(result.timed_out)
+        self.assertFalse(result.success)
+
+    def test_resource_usage(self):
+        """Test the harness reports CPU, memory and output size without touching the candidate's output."""
+        sandbox = SubprocessSandbox()
+        idle = sandbox.run("print('hi')")
+        busy = sandbox.run("data = [0] * 5_000_000\nprint(sum(i * i for i in range(300_000)))")
+        self.assertEqual((idle.stdout, idle.stderr, idle.output_bytes), ("hi", "", 3))
+        self.assertGreater(busy.cpu_time, idle.cpu_time)
+        self.assertGreater(busy.peak_rss, idle.peak_rss + 30_000_000)
+        self.assertGreater(busy.wall_time, 0)
+        failed = sandbox.run("raise ValueError('boom')")
+        self.assertTrue(failed.stderr.startswith("Traceback"))
+        self.assertNotIn("__pmp_usage__", failed.stderr)
+
+    def test_spoofed_usage_report_ignored(self):
+        """Test a candidate printing its own usage line can't replace the harness report."""
+        result = SubprocessSandbox().run(
+            "import sys\nsys.stderr.write('__pmp_usage__ 0.0 0.0 1\\n')\ndata = [0] * 5_000_000\nprint(1)")
+        self.assertGreater(result.peak_rss, 30_000_000)
+        self.assertEqual(result.stderr, "__pmp_usage__ 0.0 0.0 1\n")  # Left in the candidate's stderr
+
+    def test_scratch_directory_wiped_between_candidates(self):
+        """Test files a candidate writes in its scratch directory are gone before the next one runs."""
+        scratch = tempfile.mkdtemp()
+        try:
+            code = "import os\nos.mkdir('d')\nopen('d/f', 'w').write('x')\nopen('f', 'w').write('x')\nprint(os.getcwd())"
+            result = _run([sys.executable, "-I", "-c", HARNESS, scratch], code, 10)
+            self.assertEqual(result.stdout, scratch)
+            self.assertEqual(os.listdir(scratch), [])
+        finally:
+            shutil.rmtree(scratch)
+
+    def test_repeated_runs_keep_median_timings(self):
+        runs = iter([ExecutionResult("1", "", 0, 1.0, cpu_time=0.5, peak_rss=10),
+                     ExecutionResult("1", "", 0, 1.0, cpu_time=0.1, peak_rss=30),
+                     ExecutionResult("1", "", 0, 1.0, cpu_time=0.2, peak_rss=20)])
+        sandbox = SubprocessSandbox()
+        with patch.object(sandbox, "run", side_effect=lambda code, timeout=None: next(runs)):
+            result = run_repeated(sandbox, "print(1)", repeat=3)
+        self.assertEqual((result.cpu_time, result.peak_rss), (0.2, 30))
+
+
+class TestDockerPoolSandbox(unittest.TestCase):
+
+    @patch('sandbox.subprocess.Popen')
+    @patch('sandbox._run')
+    @patch('sandbox.subprocess.run')
+    def test_containers_reused_then_recycled(self, mock_docker, mock_exec, mock_popen):
+        """Test that warm containers are reused and recycled after max_runs or failure."""
+        mock_exec.return_value = ExecutionResult("ok", "", 0)
+        pool = DockerPoolSandbox(size=1, max_runs=2)
+        self.addCleanup(pool.close)  # Joins refills, so none reach the next test's mocks
+        self.assertEqual(pool.started, 1)
+
+        pool.run("print('ok')")
+        self.assertEqual(pool.recycled, 0)
+        pool.run("print('ok')")  # Second run reaches max_runs
+        self.assertEqual(pool.recycled, 1)
+
+        mock_exec.return_value = ExecutionResult("", "boom", 1)
+        pool.run("raise Exception('boom')")
+        self.assertEqual(pool.recycled, 2)
+        pool.close()
+
+        exec_cmd = mock_exec.call_args[0][0]
+        self.assertEqual(exec_cmd[:3], ["docker", "exec", "-i"])
+        self.assertEqual(exec_cmd[-1], "/scratch")
+        start_cmd = mock_docker.call_args_list[0][0][0]
+        self.assertIn("--network", start_cmd)
+        self.assertIn("none", start_cmd)
+        self.assertIn("--read-only", start_cmd)
+
+    @patch('sandbox.subprocess.Popen')
+    @patch('sandbox._run')
+    @patch('sandbox.subprocess.run')
+    def test_lost_containers_fall_back_instead_of_blocking(self, mock_docker, mock_exec, _):
+        """Test evaluations keep running when every replacement container fails to start."""
+        mock_exec.return_value = ExecutionResult("", "boom", 1)
+        pool = DockerPoolSandbox(size=1, acquire_timeout=0.2, refill_attempts=3, refill_delay=0)
+        self.addCleanup(pool.close)
+        mock_docker.side_effect = subprocess.CalledProcessError(125, "docker run", stderr="no space")
+        pool.run("raise Exception('boom')")  # Recycles the only container
+        for _ in range(50):
+            if pool.lost:
+                break
+            time.sleep(0.01)
+        self.assertEqual(pool.lost, 1)
+        self.assertEqual(mock_docker.call_count, 4)  # Initial start plus three refill attempts
+
+        mock_exec.return_value = ExecutionResult("ok", "", 0)
+        self.assertTrue(pool.run("print('ok')").success)
+        self.assertEqual(mock_exec.call_args[0][0][:3], ["docker", "run", "--rm"])
+        self.assertEqual(pool.fallbacks, 1)
+        pool.close()
+
+    @patch('sandbox.subprocess.Popen')
+    @patch('sandbox._run', return_value=ExecutionResult("", "boom", 1))
+    @patch('sandbox.subprocess.run')
+    def test_close_removes_replacement_still_starting(self, mock_docker, _, mock_popen):
+        """Test a container whose start was in flight when the pool closed is removed, not leaked."""
+        pool = DockerPoolSandbox(size=1)
+        starting, release = threading.Event(), threading.Event()
+
+        def slow_start(*args, **kwargs):
+            starting.set()
+            release.wait(timeout=5)
+
+        mock_docker.side_effect = slow_start
+        pool.run("raise Exception('boom')")  # Recycles the only container
+        self.assertTrue(starting.wait(timeout=5))
+        closer = threading.Thread(target=pool.close)
+        closer.start()
+        release.set()
+        closer.join(timeout=5)
+        self.assertFalse(closer.is_alive())
+        removed = {c.args[0][-1] for c in mock_popen.call_args_list}
+        self.assertEqual(removed, {c.args[0][4] for c in mock_docker.call_args_list})
+        self.assertEqual(len(removed), 2)
+        self.assertTrue(pool._idle.empty())
+
+    @patch('sandbox.subprocess.Popen')
+    @patch('sandbox.subprocess.run')
+    def test_failed_start_removes_started_containers(self, mock_docker, mock_popen):
+        """Test containers started before a later start fails are removed."""
+        mock_docker.side_effect = [None, subprocess.CalledProcessError(125, "docker run")]
+        with self.assertRaises(subprocess.CalledProcessError):
+            DockerPoolSandbox(size=2)
+        started = mock_docker.call_args_list[0].args[0][4]
+        self.assertEqual([c.args[0] for c in mock_popen.call_args_list], [["docker", "rm", "-f", started]])
+
+    @patch('sandbox.subprocess.run', side_effect=FileNotFoundError("docker"))
+    def test_falls_back_without_docker(self, _):
+        """Test that a missing Docker install falls back to the subprocess backend."""
+        self.assertIsInstance(configure_sandbox("docker-pool"), SubprocessSandbox)
+        close_sandbox()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+import numpy as np
+from complexity import calculate_kolmogorov_complexity
+from scoring import (
+    ScoringEngine, check_output, code_metrics, metrics_arrays, parse_weights, pareto_fronts,
+    select_nsga, select_top, select_tournament
+)
+
+
+class TestScoringEngine(unittest.TestCase):
+
+    def test_default_weights_match_original_score(self):
+        """Test the vectorized default score equals complexity plus the execution bonus."""
+        codes = ["print(8)", "def f(x):\n    print(x)\n\nf(8)", "x" * 600]
+        records = [dict(code_metrics(code), success=index != 1) for index, code in enumerate(codes)]
+        scores = ScoringEngine().score(metrics_arrays(records))
+        expected = [calculate_kolmogorov_complexity(code) + (30 if index != 1 else 0)
+                    for index, code in enumerate(codes)]
+        np.testing.assert_allclose(scores, expected)
+
+    def test_compressed_size_rewards_redundancy(self):
+        """Test zlib size favours repetitive code that raw length penalises."""
+        repetitive = code_metrics("print(1)\n" * 20)
+        varied = code_metrics("import math\nprint(math.factorial(12) // 7 + 3 ** 5 - len('abcdefghij'))")
+        self.assertGreater(repetitive["length"], varied["length"])
+        self.assertLess(repetitive["compressed"], varied["compressed"])
+
+    def test_resource_terms(self):
+        """Test CPU time and memory reward lean working code and give failures nothing."""
+        records = [{"success": True, "cpu_time": 0.1, "peak_rss": 10 * 2 ** 20},
+                   {"success": True, "cpu_time": 1.0, "peak_rss": 80 * 2 ** 20},
+                   {"success": False, "cpu_time": 0.0, "peak_rss": 0}]
+        engine = ScoringEngine({"cpu_time": 50, "peak_rss": 50})
+        np.testing.assert_allclose(engine.score(metrics_arrays(records)), [92.5, 35, 0])
+        self.assertIn("peak_rss", parse_weights("efficient"))
+
+    def test_parse_weights(self):
+        self.assertEqual(parse_weights("compressed=60, success=40"), {"compressed": 60.0, "success": 40.0})
+        self.assertIn("output_ok", parse_weights("kolmogorov"))
+        with self.assertRaises(ValueError):
+            parse_weights("speed=1")
+
+    def test_check_output(self):
+        self.assertTrue(check_output("Find the largest prime below 100", "97\n"))
+        self.assertFalse(check_output("Find the largest prime below 100", "ninety-seven"))
+        self.assertFalse(check_output("List categories", "Traceback: Error"))
+
+
+class TestSelection(unittest.TestCase):
+
+    def test_top_k_matches_full_sort(self):
+        """Test partial selection returns the same survivors as sorting everything."""
+        fitness = np.random.default_rng(1).random(5000)
+        expected = np.argsort(-fitness, kind="stable")[:50]
+        np.testing.assert_array_equal(select_top(fitness, 50), expected)
+
+    def test_top_k_keeps_earlier_ties(self):
+        np.testing.assert_array_equal(select_top(np.array([5.0, 9.0, 5.0, 1.0]), 2), [1, 0])
+
+    def test_tournament_picks_distinct_candidates(self):
+        fitness = np.arange(100, dtype=float)
+        chosen = select_tournament(fitness, 10, np.random.default_rng(0))
+        self.assertEqual(len(set(chosen.tolist())), 10)
+        self.assertGreater(fitness[chosen].mean(), fitness.mean())
+
+    def test_nsga_prefers_pareto_front(self):
+        """Test multi-objective selection keeps the non-dominated trade-offs first."""
+        objectives = np.array([[1.0, 0.0], [0.0, 1.0], [0.5, 0.5], [0.4, 0.4], [0.1, 0.1]])
+        fronts = pareto_fronts(objectives)
+        self.assertEqual(sorted(fronts[0].tolist()), [0, 1, 2])
+        self.assertEqual(sorted(select_nsga(objectives, 3).tolist()), [0, 1, 2])
+        self.assertEqual(select_nsga(objectives, 4).tolist()[-1], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from telemetry import Tracer
+
+
+class TestTracer(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_spans_and_attribute_counters(self):
+        """Test that spans aggregate durations and numeric attributes."""
+        tracer = Tracer()
+        with tracer.span("generate_solution"):
+            tracer.annotate(retries=2)
+            with tracer.span("llm_request") as request:
+                request.set(cache_hit=True, tokens=120)
+        with tracer.span("generate_solution"):
+            pass
+        summary = tracer.stage_summary()
+        self.assertEqual(summary["generate_solution"]["count"], 2)
+        self.assertEqual(tracer.counters["generate_solution_retries"], 2)
+        self.assertEqual(tracer.counters["llm_request_cache_hit"], 1)
+        self.assertEqual(tracer.counters["llm_request_tokens"], 120)
+
+    def test_errors_recorded_and_raised(self):
+        """Test that exceptions are counted and still propagate."""
+        tracer = Tracer()
+        with self.assertRaises(RuntimeError):
+            with tracer.span("execute_code"):
+                raise RuntimeError("boom")
+        self.assertEqual(tracer.stage_summary()["execute_code"]["errors"], 1)
+
+    def test_exports(self):
+        """Test JSONL trace and Prometheus text exports."""
+        trace_file = os.path.join(self.tmpdir, "trace.jsonl")
+        metrics_file = os.path.join(self.tmpdir, "metrics.prom")
+        tracer = Tracer(trace_file=trace_file)
+        with tracer.span("save_solution", path="a.py"):
+            pass
+        tracer.incr("rate_limited")
+        tracer.write_prometheus(metrics_file)
+        tracer.close()
+
+        with open(trace_file) as file:
+            record = json.loads(file.readline())
+        self.assertEqual(record["name"], "save_solution")
+        self.assertEqual(record["attrs"], {"path": "a.py"})
+        with open(metrics_file) as file:
+            metrics = file.read()
+        self.assertIn('pmp_stage_seconds_count{stage="save_solution"} 1', metrics)
+        self.assertIn("pmp_rate_limited_total 1", metrics)
+        self.assertIn("save_solution", tracer.format_summary())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,204 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+from population import Candidate
+import requests
+from process_problems import (
+    collect_results, configure_remote_evaluation, enqueue_problems, evaluate_population, run_worker
+)
+from work_queue import DONE, FAILED, PENDING, HttpQueue, MemoryQueue, QueueServer, SQLiteQueue
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class QueueContract:
+    """Behaviour shared by every queue backend."""
+
+    def make_queue(self, clock):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.queue = self.make_queue(self.clock)
+
+    def test_lease_and_complete(self):
+        job_id = self.queue.put("problem", {"problem": "A"})
+        job = self.queue.lease("w1")
+        self.assertEqual((job.id, job.payload, job.attempts), (job_id, {"problem": "A"}, 1))
+        self.assertIsNone(self.queue.lease("w2"))
+        self.assertTrue(self.queue.complete(job, {"best_fitness": 80}))
+        self.assertEqual(self.queue.result(job_id), (DONE, {"best_fitness": 80}))
+
+    def test_keys_dedupe_and_kind_priority(self):
+        """Test keyed jobs are queued once and kinds are leased in priority order."""
+        first = self.queue.put("problem", {"problem": "A"}, key="0:a")
+        self.assertEqual(self.queue.put("problem", {"problem": "A"}, key="0:a"), first)
+        self.queue.put("evaluate", {"code": "print(1)"})
+        self.assertEqual(self.queue.lease("w1", kinds=("evaluate", "problem")).kind, "evaluate")
+        self.assertEqual(self.queue.counts(), {PENDING: 1, "leased": 1})
+
+    def test_orphaned_job_is_retried(self):
+        """Test an expired lease goes back to the queue and the old owner can't complete it."""
+        self.queue.put("problem", {"problem": "A"})
+        orphan = self.queue.lease("crashed")
+        self.clock.now += 30
+        self.assertTrue(self.queue.heartbeat(orphan))
+        self.clock.now += 61
+        retry = self.queue.lease("w2")
+        self.assertEqual((retry.id, retry.attempts), (orphan.id, 2))
+        self.assertFalse(self.queue.complete(orphan, {}))
+        self.assertTrue(self.queue.complete(retry, {}))
+
+    def test_failed_after_max_attempts(self):
+        job_id = self.queue.put("problem", {"problem": "A"})
+        for _ in range(3):
+            self.queue.fail(self.queue.lease("w1"), "boom")
+        self.assertIsNone(self.queue.lease("w1"))
+        self.assertEqual(self.queue.result(job_id)[0], FAILED)
+
+    def test_failed_and_unkept_keys_queued_again(self):
+        """Test a failed keyed job is retried on the next put and a result stored without its key isn't reused."""
+        failed = self.queue.put("evaluate", {"code": "print(1)"}, key="a")
+        for _ in range(3):
+            self.queue.fail(self.queue.lease("w1"), "boom")
+        self.assertEqual(self.queue.put("evaluate", {"code": "print(1)"}, key="a"), failed)
+        self.assertEqual(self.queue.lease("w1").attempts, 1)
+
+        timed_out = self.queue.put("evaluate", {"code": "print(2)"}, key="b")
+        self.assertTrue(self.queue.complete(self.queue.lease("w1", kinds=("evaluate",)), {}, keep_key=False))
+        self.assertEqual(self.queue.result(timed_out)[0], DONE)
+        self.assertNotEqual(self.queue.put("evaluate", {"code": "print(2)"}, key="b"), timed_out)
+
+
+class TestSQLiteQueue(QueueContract, unittest.TestCase):
+
+    def make_queue(self, clock):
+        self.tmpdir = tempfile.mkdtemp()
+        return SQLiteQueue(os.path.join(self.tmpdir, "queue.db"), lease_seconds=60, clock=clock)
+
+    def tearDown(self):
+        self.queue.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_shared_between_connections(self):
+        """Test a second connection (another process) sees and leases the same jobs."""
+        other = SQLiteQueue(self.queue.path, clock=self.clock)
+        self.queue.put("problem", {"problem": "A"})
+        self.assertIsNotNone(other.lease("worker-2"))
+        self.assertIsNone(self.queue.lease("worker-1"))
+        other.close()
+
+    def test_rollback_journal(self):
+        """Test the queue file doesn't use WAL, whose shared-memory index is host-local."""
+        self.assertEqual(self.queue._conn.execute("PRAGMA journal_mode").fetchone()[0], "delete")
+
+
+class TestMemoryQueue(QueueContract, unittest.TestCase):
+
+    def make_queue(self, clock):
+        return MemoryQueue(lease_seconds=60, clock=clock)
+
+
+class TestHttpQueue(QueueContract, unittest.TestCase):
+
+    def make_queue(self, clock):
+        self.server = QueueServer(MemoryQueue(lease_seconds=60, clock=clock), token="secret").start()
+        return HttpQueue(self.server.url, token="secret")
+
+    def tearDown(self):
+        self.queue.close()
+        self.server.stop()
+
+    def test_token_required(self):
+        with self.assertRaises(requests.HTTPError):
+            HttpQueue(self.server.url, token="wrong")
+        self.assertEqual(self.queue.lease_seconds, 60)
+        with self.assertRaises(KeyError):
+            self.queue.result(99)
+
+
+class TestDistributedRun(unittest.TestCase):
+
+    def tearDown(self):
+        configure_remote_evaluation(None)
+
+    @patch('process_problems.process_problem')
+    def test_worker_drains_problem_jobs(self, mock_process):
+        """Test workers run every queued problem once and publish results to the queue."""
+        mock_process.side_effect = lambda problem, **kwargs: Candidate(f"print({problem!r})", fitness=70)
+        queue = MemoryQueue()
+        self.assertEqual(enqueue_problems(queue, ["A", "B", "C"]), 3)
+        enqueue_problems(queue, ["A", "B", "C"])  # Coordinator restarted
+        self.assertEqual(run_worker(queue, workers=2, poll_interval=0.01), 3)
+        self.assertEqual(sorted(c.args[0] for c in mock_process.call_args_list), ["A", "B", "C"])
+        self.assertEqual(queue.result(1), (DONE, {"best_fitness": 70,
+                                                  "best_solution": {"code": "print('A')", "fitness": 70,
+                                                                    "generation": 1}}))
+
+    @patch('process_problems.record_best')
+    @patch('process_problems.process_problem')
+    def test_workers_on_other_hosts_through_queue_server(self, mock_process, mock_record):
+        """Test a worker reaching the queue over HTTP runs the problems and the coordinator records the winners."""
+        mock_process.side_effect = lambda problem, **kwargs: Candidate(f"print({problem!r})", fitness=70)
+        server = QueueServer(SQLiteQueue(":memory:")).start()
+        try:
+            coordinator, worker = HttpQueue(server.url), HttpQueue(server.url)
+            queued = {}
+            enqueue_problems(coordinator, ["A", "B"], queued=queued)
+            self.assertEqual(run_worker(worker, workers=2, poll_interval=0.01), 2)
+            self.assertEqual(collect_results(coordinator, queued, leaderboard_file="lb.db"), 2)
+            self.assertEqual(sorted(c.args[0] for c in mock_record.call_args_list), ["A", "B"])
+            self.assertEqual(mock_record.call_args.args[2].fitness, 70)
+        finally:
+            server.stop()
+
+    @patch('process_problems.measure')
+    def test_remote_evaluation(self, mock_measure):
+        """Test population evaluation goes through queue jobs, once per normalized source."""
+        mock_measure.side_effect = lambda code, problem: {'length': len(code), 'success': True}
+        queue = MemoryQueue()
+        configure_remote_evaluation(queue, poll_interval=0.01)
+        population = [Candidate("print(1)"), Candidate("print(1)\n# again"), Candidate("print(22)")]
+        results = list(evaluate_population(population, "problem"))
+        self.assertEqual(len(results), 3)
+        self.assertEqual(mock_measure.call_count, 2)
+        self.assertEqual(queue.counts("evaluate"), {DONE: 2})
+        self.assertEqual(population[2].metrics['length'], 9)
+        self.assertAlmostEqual(population[2].fitness, 70 * (1 - 9 / 500) + 30)
+
+    def test_failed_evaluation_scores_zero_and_transient_result_not_kept(self):
+        """Test a FAILED evaluation job scores like a failed measurement, and a timeout is evaluated again."""
+        queue = MemoryQueue(max_attempts=1)
+        configure_remote_evaluation(queue, poll_interval=0.01)
+        with patch('process_problems.run_job', side_effect=RuntimeError("sandbox gone")):
+            candidate, fitness = next(evaluate_population([Candidate("print(1)")], "problem"))
+        self.assertEqual(fitness, 0)
+
+        timed_out = {'length': 8, 'success': False, 'transient': True}
+        with patch('process_problems.measure', return_value=timed_out) as mock_measure:
+            list(evaluate_population([Candidate("print(2)")], "problem"))
+            list(evaluate_population([Candidate("print(2)")], "problem"))
+        self.assertEqual(mock_measure.call_count, 2)
+
+    @patch('process_problems.run_job')
+    def test_inline_evaluation_failure_releases_job(self, mock_run_job):
+        """Test an evaluation the waiting thread runs itself is failed, not leaked, when it raises."""
+        mock_run_job.side_effect = RuntimeError("sandbox gone")
+        queue = MemoryQueue(max_attempts=2)
+        configure_remote_evaluation(queue, poll_interval=0.01)
+        results = list(evaluate_population([Candidate("print(1)")], "problem"))
+        self.assertEqual(len(results), 1)
+        self.assertEqual(mock_run_job.call_count, 2)
+        self.assertEqual(queue.counts("evaluate"), {FAILED: 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,427 @@
+import hmac
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PENDING, LEASED, DONE, FAILED = "pending", "leased", "done", "failed"
+
+# A leased job; pass it back to heartbeat(), complete() or fail()
+Job = namedtuple("Job", ["id", "kind", "payload", "attempts", "owner"])
+
+
+class SQLiteQueue:
+    """Job queue with leases, kept in one SQLite file.
+
+    Any number of processes on the host holding the file can lease jobs;
+    workers on other hosts go through a QueueServer in front of it rather
+    than opening the file over a network filesystem, where SQLite locking
+    is not reliable. The file uses a rollback journal, not WAL. A lease
+    is held until it expires; long jobs extend it with heartbeat().
+    Jobs whose lease lapsed because their worker died are handed out again,
+    up to max_attempts times, then marked failed. Every state change is one
+    IMMEDIATE transaction.
+    """
+
+    def __init__(self, path, lease_seconds=60, max_attempts=3, clock=time.time, timeout=30):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=timeout, isolation_level=None,
+                                     check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=DELETE")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT UNIQUE, kind TEXT NOT NULL,"
+            " payload TEXT NOT NULL, status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0,"
+            " owner TEXT, lease_expires REAL, result TEXT, error TEXT, updated REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs(kind, status, id)")
+
+    def _transaction(self, work):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                value = work(self._clock())
+                self._conn.execute("COMMIT")
+                return value
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def put(self, kind, payload, key=None):
+        """Queues a job and returns its id.
+
+        A key already queued returns the existing job's id; if that job had
+        failed, it is queued again with fresh attempts.
+        """
+        def work(now):
+            if key is not None:
+                row = self._conn.execute("SELECT id, status FROM jobs WHERE key = ?", (key,)).fetchone()
+                if row and row[1] == FAILED:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, attempts = 0, error = NULL, updated = ? WHERE id = ?",
+                        (PENDING, now, row[0])
+                    )
+                if row:
+                    return row[0]
+            return self._conn.execute(
+                "INSERT INTO jobs (key, kind, payload, status, updated) VALUES (?, ?, ?, ?, ?)",
+                (key, kind, json.dumps(payload), PENDING, now)
+            ).lastrowid
+        return self._transaction(work)
+
+    def _reap(self, now):
+        self._conn.execute(
+            "UPDATE jobs SET status = ?, error = 'lease expired', owner = NULL, updated = ?"
+            " WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+            (FAILED, now, LEASED, now, self.max_attempts)
+        )
+        self._conn.execute(
+            "UPDATE jobs SET status = ?, owner = NULL, updated = ?"
+            " WHERE status = ? AND lease_expires < ?",
+            (PENDING, now, LEASED, now)
+        )
+
+    def lease(self, owner, kinds=None):
+        """Leases the oldest pending job, trying kinds in priority order; None if there is none."""
+        def work(now):
+            self._reap(now)
+            for kind in kinds or (None,):
+                query = "SELECT id, kind, payload, attempts FROM jobs WHERE status = ?"
+                params = [PENDING]
+                if kind is not None:
+                    query += " AND kind = ?"
+                    params.append(kind)
+                row = self._conn.execute(query + " ORDER BY id LIMIT 1", params).fetchone()
+                if row:
+                    job_id, job_kind, payload, attempts = row
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, owner = ?, attempts = ?, lease_expires = ?,"
+                        " updated = ? WHERE id = ?",
+                        (LEASED, owner, attempts + 1, now + self.lease_seconds, now, job_id)
+                    )
+                    return Job(job_id, job_kind, json.loads(payload), attempts + 1, owner)
+            return None
+        return self._transaction(work)
+
+    def _owned(self, job):
+        row = self._conn.execute("SELECT status, owner FROM jobs WHERE id = ?", (job.id,)).fetchone()
+        return row == (LEASED, job.owner)
+
+    def heartbeat(self, job):
+        """Extends job's lease; False if the lease was lost to another worker."""
+        def work(now):
+            if not self._owned(job):
+                return False
+            self._conn.execute("UPDATE jobs SET lease_expires = ?, updated = ? WHERE id = ?",
+                               (now + self.lease_seconds, now, job.id))
+            return True
+        return self._transaction(work)
+
+    def complete(self, job, result=None, keep_key=True):
+        """Stores job's result; False (and nothing stored) if its lease was lost.
+
+        With keep_key=False the result is only kept for this job: a later
+        put() with the same key queues a new one.
+        """
+        def work(now):
+            if not self._owned(job):
+                return False
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, owner = NULL, updated = ?"
+                + ("" if keep_key else ", key = NULL") + " WHERE id = ?",
+                (DONE, json.dumps(result), now, job.id)
+            )
+            return True
+        return self._transaction(work)
+
+    def fail(self, job, error):
+        """Releases job for another attempt, or marks it failed when attempts are used up."""
+        def work(now):
+            if not self._owned(job):
+                return False
+            status = FAILED if job.attempts >= self.max_attempts else PENDING
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, owner = NULL, updated = ? WHERE id = ?",
+                (status, str(error), now, job.id)
+            )
+            return True
+        return self._transaction(work)
+
+    def result(self, job_id):
+        """(status, result) of a job."""
+        with self._lock:
+            row = self._conn.execute("SELECT status, result FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            raise KeyError(job_id)
+        return row[0], json.loads(row[1]) if row[1] is not None else None
+
+    def counts(self, kind=None):
+        """Number of jobs per status (expired leases count as pending)."""
+        def work(now):
+            self._reap(now)
+            query = "SELECT status, COUNT(*) FROM jobs"
+            params = ()
+            if kind is not None:
+                query += " WHERE kind = ?"
+                params = (kind,)
+            return dict(self._conn.execute(query + " GROUP BY status", params).fetchall())
+        return self._transaction(work)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class MemoryQueue:
+    """In-process queue with SQLiteQueue's semantics.
+
+    Useful for tests and for threads of a single process; jobs are lost when
+    the process exits.
+    """
+
+    def __init__(self, lease_seconds=60, max_attempts=3, clock=time.time):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._jobs = {}  # id -> mutable job record, in insertion order
+        self._keys = {}
+        self._next_id = 1
+
+    def put(self, kind, payload, key=None):
+        with self._lock:
+            if key is not None and key in self._keys:
+                record = self._jobs[self._keys[key]]
+                if record["status"] == FAILED:
+                    record.update(status=PENDING, attempts=0, error=None)
+                return self._keys[key]
+            job_id = self._next_id
+            self._next_id += 1
+            self._jobs[job_id] = {"kind": kind, "payload": json.loads(json.dumps(payload)),
+                                  "status": PENDING, "attempts": 0, "owner": None,
+                                  "lease_expires": None, "result": None, "error": None}
+            if key is not None:
+                self._keys[key] = job_id
+            return job_id
+
+    def _reap(self, now):
+        for record in self._jobs.values():
+            if record["status"] == LEASED and record["lease_expires"] < now:
+                expired = record["attempts"] >= self.max_attempts
+                record.update(status=FAILED if expired else PENDING, owner=None,
+                              error="lease expired" if expired else record["error"])
+
+    def lease(self, owner, kinds=None):
+        with self._lock:
+            now = self._clock()
+            self._reap(now)
+            for kind in kinds or (None,):
+                for job_id, record in self._jobs.items():
+                    if record["status"] == PENDING and kind in (None, record["kind"]):
+                        record.update(status=LEASED, owner=owner, attempts=record["attempts"] + 1,
+                                      lease_expires=now + self.lease_seconds)
+                        return Job(job_id, record["kind"], record["payload"], record["attempts"], owner)
+            return None
+
+    def _owned(self, job):
+        record = self._jobs.get(job.id)
+        return record is not None and record["status"] == LEASED and record["owner"] == job.owner
+
+    def heartbeat(self, job):
+        with self._lock:
+            if not self._owned(job):
+                return False
+            self._jobs[job.id]["lease_expires"] = self._clock() + self.lease_seconds
+            return True
+
+    def complete(self, job, result=None, keep_key=True):
+        with self._lock:
+            if not self._owned(job):
+                return False
+            self._jobs[job.id].update(status=DONE, result=result, owner=None)
+            if not keep_key:
+                self._keys = {key: job_id for key, job_id in self._keys.items() if job_id != job.id}
+            return True
+
+    def fail(self, job, error):
+        with self._lock:
+            if not self._owned(job):
+                return False
+            status = FAILED if job.attempts >= self.max_attempts else PENDING
+            self._jobs[job.id].update(status=status, error=str(error), owner=None)
+            return True
+
+    def result(self, job_id):
+        with self._lock:
+            record = self._jobs[job_id]
+            return record["status"], record["result"]
+
+    def counts(self, kind=None):
+        with self._lock:
+            self._reap(self._clock())
+            counts = {}
+            for record in self._jobs.values():
+                if kind in (None, record["kind"]):
+                    counts[record["status"]] = counts.get(record["status"], 0) + 1
+            return counts
+
+    def close(self):
+        pass
+
+
+class QueueServer:
+    """Serves a queue over HTTP, so workers on any host can share it.
+
+    Every queue method is a POST to /<method> with its arguments as a JSON
+    object, answered with {"value": ...}; GET /info returns the lease
+    settings. With a token, requests must carry it in X-Queue-Token.
+    """
+
+    METHODS = ("put", "lease", "heartbeat", "complete", "fail", "result", "counts")
+
+    def __init__(self, queue, host="127.0.0.1", port=0, token=None):
+        self.queue = queue
+        self.token = token
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if not self._authorized():
+                    return
+                if self.path != "/info":
+                    return self._send(404, {"error": f"Unknown path {self.path}"})
+                self._send(200, {"lease_seconds": server.queue.lease_seconds,
+                                 "max_attempts": server.queue.max_attempts})
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if not self._authorized():
+                    return
+                method = self.path.strip("/")
+                if method not in QueueServer.METHODS:
+                    return self._send(404, {"error": f"Unknown queue method {method}"})
+                args = json.loads(body or b"{}")
+                if "job" in args:
+                    args["job"] = Job(*args["job"])
+                try:
+                    value = getattr(server.queue, method)(**args)
+                except KeyError as e:
+                    return self._send(404, {"error": f"Unknown job {e}"})
+                except Exception as e:
+                    return self._send(500, {"error": str(e)})
+                self._send(200, {"value": value})
+
+            def _authorized(self):
+                token = self.headers.get("X-Queue-Token", "")
+                if server.token and not hmac.compare_digest(token, server.token):
+                    self._send(403, {"error": "Missing or wrong queue token"})
+                    return False
+                return True
+
+            def _send(self, status, payload):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        """Serves on a background thread; returns self."""
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class HttpQueue:
+    """Client of a QueueServer, with SQLiteQueue's interface.
+
+    Lease length and attempts are the server's. The token defaults to the
+    QUEUE_TOKEN environment variable.
+    """
+
+    def __init__(self, url, token=None, timeout=30):
+        import requests  # Only distributed runs talk to a queue server
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self._session = requests.Session()
+        token = token or os.getenv("QUEUE_TOKEN")
+        if token:
+            self._session.headers["X-Queue-Token"] = token
+        response = self._session.get(self.url + "/info", timeout=timeout)
+        response.raise_for_status()
+        info = response.json()
+        self.lease_seconds = info["lease_seconds"]
+        self.max_attempts = info["max_attempts"]
+
+    def _call(self, method, **args):
+        response = self._session.post(f"{self.url}/{method}", json=args, timeout=self.timeout)
+        if response.status_code == 404 and method == "result":
+            raise KeyError(args["job_id"])
+        response.raise_for_status()
+        return response.json()["value"]
+
+    def put(self, kind, payload, key=None):
+        return self._call("put", kind=kind, payload=payload, key=key)
+
+    def lease(self, owner, kinds=None):
+        value = self._call("lease", owner=owner, kinds=list(kinds) if kinds else None)
+        return Job(*value) if value else None
+
+    def heartbeat(self, job):
+        return self._call("heartbeat", job=list(job))
+
+    def complete(self, job, result=None, keep_key=True):
+        return self._call("complete", job=list(job), result=result, keep_key=keep_key)
+
+    def fail(self, job, error):
+        return self._call("fail", job=list(job), error=str(error))
+
+    def result(self, job_id):
+        status, result = self._call("result", job_id=job_id)
+        return status, result
+
+    def counts(self, kind=None):
+        return self._call("counts", kind=kind)
+
+    def close(self):
+        self._session.close()
+
+
+def open_queue(spec, **options):
+    """HttpQueue for an http(s):// URL, a MemoryQueue for "memory", otherwise an SQLiteQueue at path spec.
+
+    Options configure local queues; a queue server has its own settings.
+    """
+    if spec.startswith(("http://", "https://")):
+        return HttpQueue(spec)
+    if spec == "memory":
+        return MemoryQueue(**options)
+    return SQLiteQueue(spec, **options)